@@ -1,19 +1,39 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+
 class CorsMiddleware:
     """Add CORS header Access-Control-Allow-Origin: * to all responses."""
+    sync_capable = True
+    async_capable = True
 
     def __init__(self, get_response):
         self.get_response = get_response
+        self._async = iscoroutinefunction(get_response)
+        if self._async:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if self._async:
+            return self.__acall__(request)
         if request.method == "OPTIONS":
-            from django.http import HttpResponse
-            response = HttpResponse(status=200)
-            self._add_cors_headers(response)
-            return response
+            return self._preflight()
         response = self.get_response(request)
         self._add_cors_headers(response)
         return response
 
+    async def __acall__(self, request):
+        if request.method == "OPTIONS":
+            return self._preflight()
+        response = await self.get_response(request)
+        self._add_cors_headers(response)
+        return response
+
+    def _preflight(self):
+        from django.http import HttpResponse
+        response = HttpResponse(status=200)
+        self._add_cors_headers(response)
+        return response
+
     def _add_cors_headers(self, response):
         response["Access-Control-Allow-Origin"] = "*"
         response["Access-Control-Allow-Methods"] = "GET, OPTIONS"
@@ -1,36 +1,122 @@
 import os
+import threading
 from functools import lru_cache
 from typing import Optional
 
 from pymongo import MongoClient
 from gridfs import GridFSBucket
 
+try:
+    from pymongo import AsyncMongoClient
+    from gridfs import AsyncGridFSBucket
+except ImportError:  # pymongo < 4.13: the async views read GridFS in worker threads
+    AsyncMongoClient = None
+    AsyncGridFSBucket = None
+
+# Pool/timeout options read from Django settings (see MONGODB_* in settings.py) -> MongoClient kwargs
+_CLIENT_OPTIONS = {
+    'MONGODB_MAX_POOL_SIZE': 'maxPoolSize',
+    'MONGODB_MIN_POOL_SIZE': 'minPoolSize',
+    'MONGODB_MAX_IDLE_TIME_MS': 'maxIdleTimeMS',
+    'MONGODB_CONNECT_TIMEOUT_MS': 'connectTimeoutMS',
+    'MONGODB_SOCKET_TIMEOUT_MS': 'socketTimeoutMS',
+    'MONGODB_SERVER_SELECTION_TIMEOUT_MS': 'serverSelectionTimeoutMS',
+    'MONGODB_WAIT_QUEUE_TIMEOUT_MS': 'waitQueueTimeoutMS',
+    'MONGODB_COMPRESSORS': 'compressors',
+}
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+_async_clients = {}  # event loop -> AsyncMongoClient
+
+
+def client_options() -> dict:
+    """MongoClient keyword arguments for the configured pool sizing, timeouts and compressors."""
+    try:
+        from django.conf import settings
+        configured = {name: getattr(settings, name, None) for name in _CLIENT_OPTIONS}
+    except Exception:
+        configured = {}
+    return {
+        _CLIENT_OPTIONS[name]: value
+        for name, value in configured.items()
+        if value not in (None, '')
+    }
+
+
 # This new file will handle MongoDB connection and GridFS bucket access
 @lru_cache(maxsize=1)
 def get_client() -> MongoClient:
-    
+
     #Connect to MongoDB with URI from .env
     uri = os.getenv("MONGODB_URI")
-    
-    # Let pymongo validate/parse options to keep defaults simple here
-    return MongoClient(uri)
+
+    # Let pymongo validate/parse options; pool sizing and timeouts come from settings
+    return MongoClient(uri, **client_options())
 
 
 def get_db(name: Optional[str] = None):
-    """This was optional to do, but to make it clean, 
-    
+    """This was optional to do, but to make it clean,
+
     I set the name "oink" for the database as default"""
     db_name = name or os.getenv("MONGODB_DB_NAME")
     return get_client()[db_name]
 
 
 def get_bucket(db_name: Optional[str] = None, bucket_name: Optional[str] = None) -> GridFSBucket:
-    """Same here, this was optional to do, but to make it clean, 
-    
-    I set the name "files" for the bucket inside the database as default"""
+    """Same here, this was optional to do, but to make it clean,
+
+    I set the name "files" for the bucket inside the database as default.
+
+    Buckets are cached per client/database/bucket name so callers share one handle
+    (GridFSBucket is thread-safe); new files use MONGODB_GRIDFS_CHUNK_SIZE."""
     _db = get_db(db_name)
     _bucket = bucket_name or os.getenv("MONGODB_BUCKET")
-    return GridFSBucket(_db, bucket_name=_bucket)
+    client = _db.client
+    key = (id(client), _db.name, _bucket)
+    with _buckets_lock:
+        cached = _buckets.get(key)
+        if cached is None or cached[0] is not client:
+            cached = (client, GridFSBucket(_db, bucket_name=_bucket, chunk_size_bytes=_chunk_size()))
+            _buckets[key] = cached
+    return cached[1]
+
+
+def _chunk_size() -> int:
+    try:
+        from django.conf import settings
+        return int(getattr(settings, 'MONGODB_GRIDFS_CHUNK_SIZE', 0) or 255 * 1024)
+    except Exception:
+        return 255 * 1024
+
+
+def get_async_db(name: Optional[str] = None):
+    """Database on an AsyncMongoClient for the running event loop (ASGI views), or None.
+
+    None without the async driver, or when ``get_client()`` is not a pymongo client
+    (e.g. mongomock in tests), so callers fall back to the sync client in a worker thread.
+    """
+    import asyncio
+
+    if AsyncMongoClient is None or not isinstance(get_client(), MongoClient):
+        return None
+    loop = asyncio.get_running_loop()
+    with _buckets_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            for stale in [l for l in _async_clients if l.is_closed()]:
+                del _async_clients[stale]
+            client = _async_clients[loop] = AsyncMongoClient(os.getenv("MONGODB_URI"), **client_options())
+    return client[name or os.getenv("MONGODB_DB_NAME")]
+
+
+def get_async_bucket(db_name: Optional[str] = None, bucket_name: Optional[str] = None):
+    """AsyncGridFSBucket on ``get_async_db()``, or None when that is unavailable."""
+    _db = get_async_db(db_name)
+    if _db is None:
+        return None
+    return AsyncGridFSBucket(_db, bucket_name=bucket_name or os.getenv("MONGODB_BUCKET"),
+                             chunk_size_bytes=_chunk_size())
 
 
 def get_collection(collection_name: str, db_name: Optional[str] = None):
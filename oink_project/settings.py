@@ -57,7 +57,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'oink_project.cors_middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'packages.cache_bus.CacheBusMiddleware',
+    'oink_project.static_middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -85,14 +86,82 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'oink_project.wsgi.application'
+ASGI_APPLICATION = 'oink_project.asgi.application'
+# Serving over ASGI (e.g. uvicorn oink_project.asgi:application) turns on ASYNC_VIEWS: the Drive image
+# proxy and /files/<id>/ become async views using pymongo's async driver and httpx for Drive, so slow
+# reads do not block other requests. DRIVE_HTTP_TIMEOUT / DRIVE_HTTP_MAX_CONNECTIONS tune the client.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', '0') == '1'
+DRIVE_HTTP_TIMEOUT = float(os.getenv('DRIVE_HTTP_TIMEOUT', '30'))
+DRIVE_HTTP_MAX_CONNECTIONS = int(os.getenv('DRIVE_HTTP_MAX_CONNECTIONS', '100'))
 
 
-DATABASES = {
+# Database: DB_ENGINE=sqlite (default, small installs) or postgres (production: concurrent fetch
+# jobs writing packages and versions do not queue on SQLite's single writer lock).
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite').strip().lower()
+if DB_ENGINE in ('postgres', 'postgresql'):
+    # Persistent connections (DB_CONN_MAX_AGE seconds, checked before reuse), or with DB_POOL=1 a
+    # psycopg connection pool per process (needs psycopg[pool]; Django then closes nothing itself)
+    DB_POOL = os.getenv('DB_POOL', '0') == '1'
+    _db_options = {'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '5'))}
+    if DB_POOL:
+        _db_options['pool'] = {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        }
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB', 'oink'),
+            'USER': os.getenv('POSTGRES_USER', 'oink'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+            'PORT': os.getenv('POSTGRES_PORT', '5432'),
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': _db_options,
+        }
+    }
+else:
+    # WAL lets readers run during a write; IMMEDIATE transactions take the write lock up front
+    # (no deadlocked lock upgrades) and wait up to SQLITE_TIMEOUT seconds for it
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', '') or BASE_DIR / 'db.sqlite3',
+            'OPTIONS': {
+                'timeout': float(os.getenv('SQLITE_TIMEOUT', '20')),
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA cache_size=-16000;',
+            },
+        }
+    }
+
+# Cache backend: CACHE_BACKEND=locmem (default, per process), file (shared by the workers of one
+# host, under CACHE_DIR), redis (shared by every host, CACHE_URL; needs the redis package) or dummy.
+# Entries are tagged per package/category and invalidated on change (packages/cache.py).
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem').strip().lower()
+CACHE_TIMEOUT = int(os.getenv('CACHE_TIMEOUT', '600'))
+_cache_backends = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'oink'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', os.getenv('CACHE_DIR', str(BASE_DIR / '.cache'))),
+    'redis': ('django.core.cache.backends.redis.RedisCache', os.getenv('CACHE_URL', 'redis://localhost:6379/0')),
+    'dummy': ('django.core.cache.backends.dummy.DummyCache', ''),
+}
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': _cache_backends[CACHE_BACKEND][0],
+        'LOCATION': _cache_backends[CACHE_BACKEND][1],
+        'TIMEOUT': CACHE_TIMEOUT,
+        'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', 'oink'),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '5000'))} if CACHE_BACKEND in ('locmem', 'file') else {},
     }
 }
+# With a per-process cache (locmem) each worker applies the others' invalidations from a DB event
+# table, polled at most every CACHE_BUS_POLL_INTERVAL seconds. CACHE_BUS=auto|db|off.
+CACHE_BUS = os.getenv('CACHE_BUS', 'auto').strip().lower()
+CACHE_BUS_POLL_INTERVAL = float(os.getenv('CACHE_BUS_POLL_INTERVAL', '1.0'))
+CACHE_BUS_RETENTION = int(os.getenv('CACHE_BUS_RETENTION', '3600'))
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -138,6 +207,71 @@ GOOGLE_SHARE_DOMAIN = os.getenv('GOOGLE_SHARE_DOMAIN', '')
 REPOSITORY_FOLDER_ID = os.getenv('REPOSITORY_FOLDER_ID', '')
 GOOGLE_DRIVE_ROOT = os.getenv('GOOGLE_DRIVE_ROOT', 'https://drive.google.com/drive/folders')
 
+# Drive backend: 'google' (default) or 'fake' for the offline directory-backed Drive in
+# packages/drive_fake.py (load testing and deterministic fetch tests without network).
+# In the fake, top-level folders under DRIVE_FAKE_ROOT are package folders named by their Drive id.
+DRIVE_BACKEND = os.getenv('DRIVE_BACKEND', 'google').strip().lower()
+DRIVE_FAKE_ROOT = os.getenv('DRIVE_FAKE_ROOT', str(BASE_DIR / 'fake_drive'))
+DRIVE_FAKE_LATENCY_MS = float(os.getenv('DRIVE_FAKE_LATENCY_MS', '0'))
+DRIVE_FAKE_ERROR_RATE = float(os.getenv('DRIVE_FAKE_ERROR_RATE', '0'))
+DRIVE_FAKE_RATE_LIMIT = int(os.getenv('DRIVE_FAKE_RATE_LIMIT', '0'))
+# Fetch lists a package folder and its subfolders (breadth-first, DRIVE_CRAWL_WORKERS folders at
+# a time) down to DRIVE_CRAWL_MAX_DEPTH levels below the package folder.
+DRIVE_CRAWL_WORKERS = int(os.getenv('DRIVE_CRAWL_WORKERS', '4'))
+DRIVE_CRAWL_MAX_DEPTH = int(os.getenv('DRIVE_CRAWL_MAX_DEPTH', '5'))
+# Images are downloaded in ranged chunks of this size and streamed into GridFS (peak memory per
+# transfer is about one chunk). DRIVE_STREAM_TO_S3=1 also streams each original into an S3
+# multipart upload (parts are at least 5 MiB) keyed by the Drive md5Checksum.
+DRIVE_DOWNLOAD_CHUNK_SIZE = int(os.getenv('DRIVE_DOWNLOAD_CHUNK_SIZE', str(8 * 1024 * 1024)))
+DRIVE_STREAM_TO_S3 = os.getenv('DRIVE_STREAM_TO_S3', '0') == '1'
+# New packages get their Drive folder and article.aml doc in the background: DRIVE_PROVISION_WORKERS
+# threads per process pick them up after the create request commits. With 0, run
+# `manage.py provision_packages` (e.g. from cron) instead; it also retries failures (--retry-failed).
+DRIVE_PROVISION_WORKERS = int(os.getenv('DRIVE_PROVISION_WORKERS', '2'))
+# Spare folder + article.aml pairs kept under REPOSITORY_FOLDER_ID so a new package gets its folder
+# with a single rename. Refilled by the provisioning threads after each claim and by
+# provision_packages; 0 disables the pool.
+DRIVE_FOLDER_POOL_SIZE = int(os.getenv('DRIVE_FOLDER_POOL_SIZE', '5'))
+
+# Image processing (resizes, derivatives) runs in a process pool: IMAGE_POOL_WORKERS processes
+# (default: one per core, 0 runs inline), each capped at IMAGE_POOL_MEMORY_LIMIT_MB of address
+# space and recycled after IMAGE_POOL_MAX_TASKS_PER_CHILD tasks. Larger images than
+# IMAGE_MAX_PIXELS are rejected as decompression bombs.
+IMAGE_POOL_WORKERS = int(os.getenv('IMAGE_POOL_WORKERS', str(os.cpu_count() or 1)))
+IMAGE_POOL_MEMORY_LIMIT_MB = int(os.getenv('IMAGE_POOL_MEMORY_LIMIT_MB', '1024'))
+IMAGE_POOL_MAX_TASKS_PER_CHILD = int(os.getenv('IMAGE_POOL_MAX_TASKS_PER_CHILD', '200'))
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', '50000000'))
+
+# Resized variants served for ?w=/?h=/?fmt= on /files/<id>/ and the Drive image proxy. Only these
+# sizes/formats are rendered (anything else is a 400) so the variant store cannot grow unbounded.
+# Variants are stored in GridFS when the file store is enabled, else under IMAGE_VARIANT_DIR
+# (force with IMAGE_VARIANT_STORE=gridfs|disk). The gallery requests IMAGE_THUMBNAIL_WIDTH thumbnails.
+IMAGE_VARIANT_WIDTHS = [160, 320, 640, 1024, 1600, 2048]
+IMAGE_VARIANT_HEIGHTS = [160, 320, 640, 1024]
+IMAGE_VARIANT_FORMATS = ['jpeg', 'webp', 'png']
+IMAGE_VARIANT_STORE = os.getenv('IMAGE_VARIANT_STORE', '').strip().lower()
+IMAGE_VARIANT_DIR = os.getenv('IMAGE_VARIANT_DIR', str(BASE_DIR / 'image_variants'))
+IMAGE_VARIANT_PROXY_MAX_AGE = int(os.getenv('IMAGE_VARIANT_PROXY_MAX_AGE', '3600'))
+IMAGE_VARIANT_TIMEOUT = int(os.getenv('IMAGE_VARIANT_TIMEOUT', '30'))
+IMAGE_THUMBNAIL_WIDTH = int(os.getenv('IMAGE_THUMBNAIL_WIDTH', '320'))
+# Fetch records width, height, bytes, dominant color and an IMAGE_LQIP_SIZE px placeholder for each
+# image (cached by content hash in IMAGE_METADATA_COLLECTION when the file store is enabled).
+# Each pending render holds a whole original, so a fetch queues at most IMAGE_METADATA_MAX_IN_FLIGHT.
+IMAGE_METADATA_ENABLED = os.getenv('IMAGE_METADATA_ENABLED', '1') == '1'
+IMAGE_METADATA_COLLECTION = os.getenv('IMAGE_METADATA_COLLECTION', 'image_metadata')
+IMAGE_METADATA_MAX_IN_FLIGHT = int(os.getenv('IMAGE_METADATA_MAX_IN_FLIGHT', '4'))
+IMAGE_LQIP_SIZE = int(os.getenv('IMAGE_LQIP_SIZE', '16'))
+
+# Concurrent requests for the same Drive image, GridFS file, image variant or package fetch are
+# coalesced into one upstream call per process. Variant renders and package fetches also take a
+# per-key file lock under SINGLEFLIGHT_LOCK_DIR (default: <tmp>/oink-singleflight) so other worker
+# processes reuse the result; waiting gives up after SINGLEFLIGHT_LOCK_TIMEOUT seconds.
+# Drive image metadata is cached for DRIVE_METADATA_CACHE_TIMEOUT seconds.
+SINGLEFLIGHT_CROSS_PROCESS = os.getenv('SINGLEFLIGHT_CROSS_PROCESS', '1') == '1'
+SINGLEFLIGHT_LOCK_DIR = os.getenv('SINGLEFLIGHT_LOCK_DIR', '')
+SINGLEFLIGHT_LOCK_TIMEOUT = float(os.getenv('SINGLEFLIGHT_LOCK_TIMEOUT', '30'))
+DRIVE_METADATA_CACHE_TIMEOUT = int(os.getenv('DRIVE_METADATA_CACHE_TIMEOUT', '60'))
+
 # MongoDB / GridFS configuration (for file storage).
 # When MONGODB_FILESTORE_ENABLED=1, fetched images are stored in GridFS and the link under each
 # image is your app URL (e.g. https://yoursite.com/files/<id>/); opening it serves the image (no S3).
@@ -147,6 +281,51 @@ MONGODB_BUCKET = os.getenv('MONGODB_BUCKET', 'files')
 MONGODB_FILESTORE_ENABLED = os.getenv('MONGODB_FILESTORE_ENABLED', '0') == '1'
 MONGODB_ASSET_COLLECTION = os.getenv('MONGODB_ASSET_COLLECTION', 'package_assets')
 
+# Connection pool and timeouts for get_client(). Atlas shared tiers cap connections, so keep the
+# pool small per worker. MONGODB_COMPRESSORS is a comma list, e.g. "zstd,snappy,zlib"
+# (zstd needs the zstandard package); leave empty to disable wire compression.
+MONGODB_MAX_POOL_SIZE = int(os.getenv('MONGODB_MAX_POOL_SIZE', '20'))
+MONGODB_MIN_POOL_SIZE = int(os.getenv('MONGODB_MIN_POOL_SIZE', '0'))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv('MONGODB_MAX_IDLE_TIME_MS', '60000'))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv('MONGODB_CONNECT_TIMEOUT_MS', '10000'))
+MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv('MONGODB_SOCKET_TIMEOUT_MS', '0')) or None
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGODB_SERVER_SELECTION_TIMEOUT_MS', '10000'))
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGODB_WAIT_QUEUE_TIMEOUT_MS', '0')) or None
+MONGODB_COMPRESSORS = os.getenv('MONGODB_COMPRESSORS', '').strip()
+# GridFS chunk size for new uploads (1 MiB: fewer chunk documents per photo than the 255 KiB default)
+# and the number of concurrent uploads used by file_store.store_many (keep <= MONGODB_MAX_POOL_SIZE).
+MONGODB_GRIDFS_CHUNK_SIZE = int(os.getenv('MONGODB_GRIDFS_CHUNK_SIZE', str(1024 * 1024)))
+MONGODB_UPLOAD_WORKERS = int(os.getenv('MONGODB_UPLOAD_WORKERS', '4'))
+# Files up to MONGODB_INLINE_MAX_BYTES (most AML documents and thumbnails) are stored whole in one
+# document of MONGODB_INLINE_COLLECTION (default "<bucket>.inline") instead of GridFS, so a read is one
+# query. Compressible content is zstd-compressed unless MONGODB_INLINE_COMPRESSION=0. 0 disables inlining.
+MONGODB_INLINE_MAX_BYTES = int(os.getenv('MONGODB_INLINE_MAX_BYTES', str(255 * 1024)))
+MONGODB_INLINE_COLLECTION = os.getenv('MONGODB_INLINE_COLLECTION', '')
+MONGODB_INLINE_COMPRESSION = os.getenv('MONGODB_INLINE_COMPRESSION', '1') == '1'
+# /files/<id>/ keeps recently served files in an in-process LRU of FILE_HOT_CACHE_BYTES per worker
+# (0 disables it); files over FILE_HOT_CACHE_MAX_OBJECT_BYTES are not cached. Hit/miss counts are
+# logged every FILE_HOT_CACHE_LOG_EVERY lookups and each response carries X-Cache: HIT or MISS.
+FILE_HOT_CACHE_BYTES = int(os.getenv('FILE_HOT_CACHE_BYTES', str(64 * 1024 * 1024)))
+FILE_HOT_CACHE_MAX_OBJECT_BYTES = int(os.getenv('FILE_HOT_CACHE_MAX_OBJECT_BYTES', str(4 * 1024 * 1024)))
+FILE_HOT_CACHE_LOG_EVERY = int(os.getenv('FILE_HOT_CACHE_LOG_EVERY', '10000'))
+# FILE_DISK_CACHE=sendfile|x-accel|x-sendfile writes /files/<id>/ and Drive proxy originals once to
+# FILE_DISK_CACHE_DIR and answers with a FileResponse (sendfile under gunicorn), an nginx X-Accel-Redirect
+# to FILE_DISK_CACHE_ACCEL_PREFIX (an `internal` location aliased to the directory) or an X-Sendfile
+# header. The oldest files are removed once the directory exceeds FILE_DISK_CACHE_MAX_BYTES.
+FILE_DISK_CACHE = os.getenv('FILE_DISK_CACHE', '').strip().lower()
+FILE_DISK_CACHE_DIR = os.getenv('FILE_DISK_CACHE_DIR', str(BASE_DIR / 'file_cache'))
+FILE_DISK_CACHE_ACCEL_PREFIX = os.getenv('FILE_DISK_CACHE_ACCEL_PREFIX', '/_file_cache/')
+FILE_DISK_CACHE_MAX_BYTES = int(os.getenv('FILE_DISK_CACHE_MAX_BYTES', str(2 * 1024 ** 3)))
+
+# Package version history: every Nth stored version is a full keyframe, the rest are JSON
+# Patch deltas; compact_package_versions keeps the newest PACKAGE_VERSION_RETENTION per package.
+PACKAGE_VERSION_KEYFRAME_INTERVAL = int(os.getenv('PACKAGE_VERSION_KEYFRAME_INTERVAL', '10'))
+PACKAGE_VERSION_RETENTION = int(os.getenv('PACKAGE_VERSION_RETENTION', '50'))
+
+# Parsed AML (package content and version keyframes) is stored zlib-compressed with a preset
+# AML dictionary (packages.fields); compress_json_fields rewrites rows stored before that.
+COMPRESSED_JSON_LEVEL = int(os.getenv('COMPRESSED_JSON_LEVEL', '6'))
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -0,0 +1,34 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from whitenoise.middleware import WhiteNoiseMiddleware as _WhiteNoiseMiddleware
+
+
+class WhiteNoiseMiddleware(_WhiteNoiseMiddleware):
+    """WhiteNoise that also runs in an async middleware chain (ASGI).
+
+    WhiteNoise's middleware is sync-only, which makes Django run every request
+    below it through its single sync thread under ASGI. Looking a static file up
+    is an in-memory dict access (or a stat with autorefresh), so it is done on
+    the event loop and other requests go straight to the async handler.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self._async = iscoroutinefunction(get_response)
+        if self._async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self._async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
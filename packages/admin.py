@@ -1,50 +1,48 @@
 from django.contrib import admin
-from .models import Package
-from django.contrib import messages
-from . import drive
+from .models import DriveFolder, Package, PackageContent, PackageImage
+from . import provisioning
+
+class PackageContentInline(admin.StackedInline):
+    model = PackageContent
+    can_delete = False
+
+
+class PackageImageInline(admin.TabularInline):
+    model = PackageImage
+    fields = ('order', 'name', 'drive_file_id', 'gridfs_id', 's3_key', 'content_hash', 'width', 'height')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        # Rows are rewritten by every fetch (see packages.image_index)
+        return False
+
 
 @admin.register(Package)
 class PackageAdmin(admin.ModelAdmin):
-    list_display = ('slug', 'category', 'publish_date', 'last_fetched_date', 'google_drive_url')
+    list_display = ('slug', 'category', 'publish_date', 'last_fetched_date', 'google_drive_url', 'drive_status')
     search_fields = ('slug', 'description')
-    list_filter = ('category',)
+    list_filter = ('category', 'drive_status')
+    readonly_fields = ('drive_status', 'drive_error')
     actions = ['create_drive_folders']
+    inlines = [PackageContentInline, PackageImageInline]
 
     def create_drive_folders(self, request, queryset):
-        created = 0
-        errors = []
-        
-        drive_settings = {
-            'service_account_file': getattr(settings, 'GOOGLE_SERVICE_ACCOUNT_FILE', None),
-            'impersonate_user': getattr(settings, 'GOOGLE_IMPERSONATE_USER', None),
-            'share_public': getattr(settings, 'GOOGLE_SHARE_PUBLIC', False),
-            'share_domain': getattr(settings, 'GOOGLE_SHARE_DOMAIN', None),
-        }
-
-        for pkg in queryset:
-            try:
-                result = drive.create_drive_folder(
-                    pkg.slug, 
-                    service_account_file=drive_settings['service_account_file'],
-                    impersonate_user=drive_settings['impersonate_user'],
-                    share_public=drive_settings['share_public'],
-                    share_domain=drive_settings['share_domain']
-                )
-                if result and isinstance(result, dict):
-                    pkg.google_drive_id = result.get('id', '')
-                    pkg.google_drive_url = result.get('url', '')
-                    pkg.save()
-                    created += 1
-                else:
-                    errors.append(f"{pkg.slug}: creation failed")
-            except Exception as e:
-                errors.append(f"{pkg.slug}: {e}")
-
-        msg = f"Drive folders created: {created}."
-        if errors:
-            msg += " Errors: " + "; ".join(errors[:5])
-            self.message_user(request, msg, level=messages.WARNING)
-        else:
-            self.message_user(request, msg)
+        queued = 0
+        for pkg in queryset.exclude(drive_status__in=[Package.DRIVE_RUNNING, Package.DRIVE_READY]):
+            provisioning.enqueue(pkg)
+            queued += 1
+        msg = f"Drive folder setup queued for {queued} package(s)."
+        if not provisioning.provision_workers():
+            msg += " Run manage.py provision_packages to process them."
+        self.message_user(request, msg)
 
     create_drive_folders.short_description = 'Create Google Drive folder(s) for selected packages'
+
+
+@admin.register(DriveFolder)
+class DriveFolderAdmin(admin.ModelAdmin):
+    list_display = ('folder_id', 'created_at', 'claimed_at', 'package')
+    list_filter = (('claimed_at', admin.EmptyFieldListFilter),)
+    raw_id_fields = ('package',)
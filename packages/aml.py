@@ -0,0 +1,115 @@
+"""ArchieML parsing helpers used by the Drive fetch pipeline.
+
+``parse_aml`` turns the plain text of an ``.aml`` Doc into the Kerckhoff-style
+dict we persist on ``Package.data``: split pull quotes are merged back together,
+image/top-level fields are put in a stable order and footnote junk keys are dropped.
+"""
+import logging
+
+try:
+    import archieml
+except Exception:
+    archieml = None
+
+logger = logging.getLogger(__name__)
+
+# Image block fields, in the order the frontends expect them
+IMAGE_FIELD_ORDER = ['alt', 'url', 'credit', 'caption']
+
+# Top-level fields in Kerckhoff order: author, content, then metadata
+FIELD_ORDER = [
+    'author', 'content', 'excerpt', 'updated', 'coveralt',
+    'coverimg', 'headline', 'authorbio', 'covercred',
+    'articleType', 'authoremail', 'authortwitter'
+]
+
+
+def _merge_split_pull_quotes(content):
+    """Fix malformed pull quotes from the ArchieML parser.
+
+    A ``{.pull}`` block sometimes comes back as two objects:
+    1. {"type": "pull", "value": {}}
+    2. {"value": {"caption": "..."}} (missing type)
+    """
+    fixed_content = []
+    i = 0
+    while i < len(content):
+        block = content[i]
+        next_block = content[i + 1] if i + 1 < len(content) else None
+        if (isinstance(block, dict) and
+            block.get('type') == 'pull' and
+            (not block.get('value') or not block['value'].get('caption')) and
+            next_block and isinstance(next_block, dict) and
+            'type' not in next_block and
+            'value' in next_block and
+            isinstance(next_block.get('value'), dict) and
+            'caption' in next_block['value']):
+            fixed_content.append({
+                'type': 'pull',
+                'value': {
+                    'caption': next_block['value']['caption']
+                }
+            })
+            i += 2  # Skip both blocks
+        else:
+            fixed_content.append(block)
+            i += 1
+    return fixed_content
+
+
+def _order_fields(value, field_order):
+    """Return a copy of ``value`` with ``field_order`` keys first, then the rest."""
+    ordered = {}
+    for key in field_order:
+        if key in value:
+            ordered[key] = value[key]
+    for key in value.keys():
+        if key not in ordered:
+            ordered[key] = value[key]
+    return ordered
+
+
+def normalize_aml(parsed):
+    """Normalize ArchieML output to the Kerckhoff format."""
+    if not isinstance(parsed, dict):
+        return parsed
+
+    if 'content' in parsed and isinstance(parsed['content'], list):
+        parsed['content'] = _merge_split_pull_quotes(parsed['content'])
+        for block in parsed['content']:
+            if isinstance(block, dict) and block.get('type') == 'image' and isinstance(block.get('value'), dict):
+                block['value'] = _order_fields(block['value'], IMAGE_FIELD_ORDER)
+
+    parsed = _order_fields(parsed, FIELD_ORDER)
+
+    _drop = [k for k in parsed if len(k) == 1 and k.isalpha() and parsed[k] == []]
+    for k in _drop:
+        del parsed[k]
+    if _drop:
+        logger.debug('Removed footnote-style single-letter keys: %s', _drop)
+    return parsed
+
+
+def parse_aml(txt: str):
+    """Parse AML text with ArchieML and normalize it.
+
+    Raises if ArchieML is not installed or the text cannot be parsed; callers
+    fall back to storing the raw text.
+    """
+    if archieml is None:
+        raise RuntimeError('archieml is not installed')
+    return normalize_aml(archieml.loads(txt))
+
+
+# Top-level fields copied to PackageContent.meta for filtering (see packages.models)
+META_FIELDS = ('headline', 'author', 'articleType', 'excerpt', 'updated')
+
+
+def article_meta(data) -> dict:
+    """The ``META_FIELDS`` strings of a package's main document (``article.aml``, else the first ``.aml``)."""
+    if not isinstance(data, dict):
+        return {}
+    main = data.get('article.aml')
+    if not isinstance(main, dict):
+        main = next((v for k, v in data.items() if k.lower().endswith('.aml') and isinstance(v, dict)), {})
+    return {k: main[k] for k in META_FIELDS if isinstance(main.get(k), str) and main[k]}
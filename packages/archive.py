@@ -0,0 +1,77 @@
+"""Entries for the ``/packages/<slug>/assets.zip`` download.
+
+Collects a package's AML files and images: stored copies from GridFS (read
+chunk by chunk) and, for images that only live in Drive, chunked Drive
+downloads. Sizes are resolved up front (one GridFS query, the ``bytes`` field
+recorded at fetch or a Drive metadata lookup) so the archive length is known
+before streaming starts.
+"""
+import json
+import logging
+import re
+from typing import List
+
+from django.conf import settings
+
+from . import drive, file_store, transfer
+from .zipstream import ZipEntry, unique_names
+
+logger = logging.getLogger(__name__)
+
+_PROXY_ID = re.compile(r'/image/([^/]+)/?$')
+
+
+def _gridfs_entries(pkg) -> List[tuple]:
+    """``(folder, name, file_id)`` for the package's GridFS AML files and images."""
+    items = []
+    for name, file_id in ((pkg.data or {}).get('_gridfs_aml') or {}).items():
+        items.append(('aml', name, file_id))
+    images = pkg.images if isinstance(pkg.images, dict) else {}
+    for entry in images.get('gridfs') or []:
+        if entry.get('id') and entry.get('name'):
+            items.append(('images', entry['name'], entry['id']))
+    return items
+
+
+def package_entries(pkg) -> List[ZipEntry]:
+    """ZIP entries (``aml/...`` and ``images/...``) for everything stored for ``pkg``."""
+    mtime = pkg.last_fetched_date.timestamp() if pkg.last_fetched_date else 0
+    items = []  # (path, size, chunks)
+
+    stored = _gridfs_entries(pkg) if getattr(settings, 'MONGODB_FILESTORE_ENABLED', False) else []
+    info = file_store.file_info(file_id for _, _, file_id in stored) if stored else {}
+    for folder, name, file_id in stored:
+        if file_id not in info:
+            logger.warning('GridFS file %s (%s) for %s is missing', file_id, name, pkg.slug)
+            continue
+        items.append((f'{folder}/{name}', info[file_id]['length'], lambda fid=file_id: file_store.iter_chunks(fid)))
+
+    # Parsed AML is all we have when the raw documents were not stored in GridFS
+    if not any(path.startswith('aml/') for path, _, _ in items):
+        for name, parsed in (pkg.data or {}).items():
+            if name.startswith('_') or not name.lower().endswith('.aml'):
+                continue
+            body = json.dumps(parsed, ensure_ascii=False, indent=2).encode('utf-8')
+            items.append((f'aml/{name}.json', len(body), lambda body=body: [body]))
+
+    stored_images = {path for path, _, _ in items if path.startswith('images/')}
+    images = pkg.images if isinstance(pkg.images, dict) else {}
+    service = None
+    for entry in images.get('gdrive') or []:
+        match = _PROXY_ID.search(entry.get('url') or '')
+        name = entry.get('name')
+        if not match or not name or f'images/{name}' in stored_images:
+            continue
+        if service is None:
+            service = drive.get_drive_service(getattr(settings, 'GOOGLE_SERVICE_ACCOUNT_FILE', None) or '')
+            if service is None:
+                logger.warning('Drive is not configured; leaving Drive-only images out of %s', pkg.slug)
+                break
+        fid = match.group(1)
+        size = entry.get('bytes')
+        if size is None:
+            size = int(service.files().get(fileId=fid, fields='size').execute().get('size') or 0)
+        items.append((f'images/{name}', int(size), lambda fid=fid: transfer.iter_drive_media(service, fid)))
+
+    paths = unique_names(path for path, _, _ in items)
+    return [ZipEntry(path, size, chunks, mtime) for path, (_, size, chunks) in zip(paths, items)]
@@ -0,0 +1,148 @@
+"""Async versions of the asset endpoints, used when serving over ASGI.
+
+``oink_project/asgi.py`` sets ``ASYNC_VIEWS`` and ``packages/urls.py`` then routes
+``/files/<id>/`` and ``/packages/<slug>/image/<id>/`` here instead of to the sync
+views: a slow Drive download or a large GridFS read awaits on the event loop
+instead of holding one of the few threads Django runs sync views on, so many
+image requests share one process. Stored files (inline documents and GridFS) are read with pymongo's async driver
+and Drive through ``packages.drive_async``. Database and cache lookups stay
+sync (they are fast) and run via ``sync_to_async``; rendering a resized variant
+runs the sync ``image_variants.serve`` in a worker thread.
+"""
+import logging
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotFound
+from gridfs.errors import NoFile
+
+from oink_project import mongo
+from . import cache as package_cache
+from . import drive_async, file_cache, file_store, hot_files, image_variants, singleflight, views
+from .package_views import DRIVE_IMAGE_FIELDS, drive_metadata_key, image_lookup
+
+logger = logging.getLogger(__name__)
+
+
+async def _serve_variant(request, source, read, content_type, **kwargs):
+    """``image_variants.serve`` in a worker thread, reading the original with ``await read()``."""
+    return await sync_to_async(image_variants.serve, thread_sensitive=False)(
+        request, source, async_to_sync(read), content_type, **kwargs,
+    )
+
+
+async def serve_gridfs_file(request, file_id: str):
+    try:
+        inline, oid = file_store.parse_id(file_id)
+    except Exception:
+        raise Http404("Invalid file id")
+
+    if file_cache.enabled() and not image_variants.requested(request.GET):
+        entry = file_cache.get(f'file:{file_id}')
+        if entry is not None:
+            response = views.file_response(request, None, entry.content_type, entry.filename, cache_status='HIT', entry=entry)
+            if response is not None:
+                return response
+
+    cached = hot_files.get(file_id)
+    if cached is not None:
+        if image_variants.requested(request.GET):
+            async def cached_data():
+                return cached.data
+            return await _serve_variant(
+                request, f'gridfs:{file_id}', cached_data, cached.content_type, filename=cached.filename,
+            )
+        return views.file_response(request, cached.data, cached.content_type, cached.filename, cache_status='HIT')
+
+    db = mongo.get_async_db()
+    if db is None:
+        return await sync_to_async(views.serve_gridfs_file, thread_sensitive=False)(request, file_id)
+
+    async def load():
+        if inline:
+            doc = await db[file_store.inline_collection_name()].find_one({'_id': oid})
+            if doc is None:
+                raise NoFile(f"no inline file with _id {oid}")
+            stream = file_store.InlineFile(doc)
+        else:
+            stream = await mongo.get_async_bucket().open_download_stream(oid)
+        try:
+            metadata = stream.metadata or {}
+            content_type = metadata.get('contentType') or 'application/octet-stream'
+            filename = stream.filename or file_id
+            data = stream.read() if inline else await stream.read()
+        finally:
+            if not inline:
+                await stream.close()
+        hot_files.put(file_id, data, content_type, filename)
+        return data, content_type, filename
+
+    # Concurrent requests for the same file share one open, metadata lookup and read
+    try:
+        data, content_type, filename = await singleflight.ado(f'gridfs:{file_id}', load)
+    except NoFile:
+        raise Http404("File not found")
+
+    if image_variants.requested(request.GET):
+        async def original():
+            return data
+        return await _serve_variant(request, f'gridfs:{file_id}', original, content_type, filename=filename)
+
+    entry = None
+    if file_cache.enabled():
+        entry = await sync_to_async(file_cache.put, thread_sensitive=False)(
+            f'file:{file_id}', data, content_type, filename,
+        )
+    return views.file_response(request, data, content_type, filename, cache_status='MISS', entry=entry)
+
+
+async def package_image(request, slug, file_id):
+    """Serve package image from Drive. Public so image URLs work when embedded in AML/flat pages (no login)."""
+    exists, file_metadata = await sync_to_async(image_lookup)(slug, file_id)
+    if not exists:
+        return HttpResponseNotFound('Package not found')
+    if not await sync_to_async(drive_async.configured, thread_sensitive=False)():
+        return HttpResponseNotFound('Google Drive not configured')
+
+    try:
+        if file_metadata is None:
+            file_metadata = await singleflight.ado(
+                f'drive-meta:{file_id}', lambda: drive_async.get_metadata(file_id, DRIVE_IMAGE_FIELDS),
+            )
+            await sync_to_async(package_cache.set)(
+                drive_metadata_key(file_id), file_metadata, [package_cache.package_tag(slug)],
+                getattr(settings, 'DRIVE_METADATA_CACHE_TIMEOUT', 60),
+            )
+        mime_type = file_metadata.get('mimeType', 'image/jpeg')
+        version = file_metadata.get('md5Checksum') or file_metadata.get('modifiedTime') or ''
+
+        async def download():
+            return await singleflight.ado(f'drive-media:{file_id}:{version}', lambda: drive_async.get_media(file_id))
+        if image_variants.requested(request.GET):
+            return await _serve_variant(
+                request,
+                f'drive:{file_id}:{version}',
+                download,
+                mime_type,
+                cache_control=f"public, max-age={getattr(settings, 'IMAGE_VARIANT_PROXY_MAX_AGE', 3600)}",
+                filename=file_metadata.get('name') or '',
+            )
+        key = f'drive:{file_id}:{version}'
+        entry = file_cache.get(key) if file_cache.enabled() else None
+        response = file_cache.response(entry) if entry is not None else None
+        if response is not None:
+            return response
+        media = await download()
+        if file_cache.enabled():
+            entry = await sync_to_async(file_cache.put, thread_sensitive=False)(
+                key, media, mime_type, file_metadata.get('name') or '',
+            )
+            response = file_cache.response(entry) if entry is not None else None
+            if response is not None:
+                return response
+        return HttpResponse(media, content_type=mime_type)
+    except drive_async.DriveUnavailable:
+        return HttpResponseNotFound('Google Drive not configured')
+    except Exception:
+        logger.exception('Failed to fetch image %s for package %s', file_id, slug)
+        return HttpResponseNotFound('Image not found')
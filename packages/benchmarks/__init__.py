@@ -0,0 +1,149 @@
+"""Offline benchmark suite for the fetch, parse, serve and API hot paths.
+
+Benchmarks register themselves with ``@benchmark`` (see ``suite.py``). Each one is a
+setup function that takes a size parameter and returns a zero-argument callable;
+only the callable is timed, and an optional ``teardown`` runs after each size.
+Results are median seconds per call, keyed as ``name[size]``, and are compared
+against ``baselines.json`` with a relative regression threshold. Run with
+``python manage.py benchmark``; the suite runs ``DEFAULT_ROUNDS`` times and keeps
+the median, both for the gate and for ``--update-baseline``.
+"""
+import json
+import platform
+import statistics
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+BASELINE_FILE = Path(__file__).resolve().parent / 'baselines.json'
+DEFAULT_THRESHOLD = 0.3
+# Baselines are recorded as the median of this many rounds; gate with the same
+DEFAULT_ROUNDS = 3
+
+BENCHMARKS: Dict[str, dict] = {}
+
+
+def benchmark(
+    name: str,
+    sizes: Dict[str, object],
+    repeat: int = 5,
+    teardown: Optional[Callable[[], None]] = None,
+):
+    """Register a benchmark setup function under ``name`` for each of ``sizes``.
+
+    ``teardown`` runs after each size is timed, e.g. to stop worker processes
+    that would otherwise compete with the benchmarks that follow.
+    """
+    def decorator(setup: Callable[[object], Callable[[], object]]):
+        BENCHMARKS[name] = {'setup': setup, 'sizes': sizes, 'repeat': repeat, 'teardown': teardown}
+        return setup
+    return decorator
+
+
+# Shorter samples let a single scheduler hiccup move the median past the threshold
+# on a shared (or single-core) machine
+MIN_SAMPLE_SECONDS = 0.05
+
+
+def time_call(func: Callable[[], object], repeat: int) -> float:
+    """Return the median wall time per call of ``func`` over ``repeat`` samples.
+
+    After a warm-up call, fast functions are looped within each sample (like
+    ``timeit.autorange``) so a sample lasts at least ``MIN_SAMPLE_SECONDS``.
+    """
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    number = 1
+    if elapsed < MIN_SAMPLE_SECONDS:
+        number = max(1, int(MIN_SAMPLE_SECONDS / max(elapsed, 1e-7)))
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return statistics.median(samples)
+
+
+def run(
+    names: Optional[Iterable[str]] = None,
+    quick: bool = False,
+    log: Callable[[str], None] = None,
+    use_mongomock: bool = True,
+) -> Dict[str, float]:
+    """Run the selected benchmarks offline and return ``{'name[size]': seconds}``.
+
+    ``quick`` runs only the smallest size of each benchmark once (used by the test suite).
+    Expects a database to be available (the management command creates a throwaway test DB).
+    """
+    from . import suite  # noqa: F401 - registers benchmarks
+    from .support import offline_environment, reset_state
+
+    selected = list(names) if names else sorted(BENCHMARKS)
+    unknown = [n for n in selected if n not in BENCHMARKS]
+    if unknown:
+        raise KeyError(f'Unknown benchmark(s): {", ".join(unknown)}')
+    with offline_environment(use_mongomock=use_mongomock):
+        return _run_selected(selected, quick, log, reset_state)
+
+
+def _run_selected(selected, quick, log, reset_state):
+    results = {}
+    for name in selected:
+        bench = BENCHMARKS[name]
+        sizes = list(bench['sizes'].items())
+        if quick:
+            sizes = sizes[:1]
+        for label, param in sizes:
+            reset_state()
+            try:
+                func = bench['setup'](param)
+                seconds = time_call(func, 1 if quick else bench['repeat'])
+            finally:
+                if bench['teardown']:
+                    bench['teardown']()
+            key = f'{name}[{label}]'
+            results[key] = seconds
+            if log:
+                log(f'{key}: {seconds * 1000:.2f} ms')
+    return results
+
+
+def median_results(rounds: List[Dict[str, float]]) -> Dict[str, float]:
+    """Combine the results of several runs into the median per key."""
+    return {key: statistics.median(r[key] for r in rounds if key in r) for key in rounds[0]}
+
+
+def load_baselines(path: Path = BASELINE_FILE) -> Dict[str, float]:
+    try:
+        with open(path, 'r', encoding='utf-8') as fh:
+            return json.load(fh).get('results', {})
+    except FileNotFoundError:
+        return {}
+
+
+def save_baselines(results: Dict[str, float], path: Path = BASELINE_FILE) -> None:
+    """Merge ``results`` into the stored baselines."""
+    merged = load_baselines(path)
+    merged.update(results)
+    payload = {
+        'machine': f'{platform.system()} {platform.machine()} / Python {platform.python_version()}',
+        'results': {key: round(value, 6) for key, value in sorted(merged.items())},
+    }
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump(payload, fh, indent=2)
+        fh.write('\n')
+
+
+def find_regressions(results: Dict[str, float], baselines: Dict[str, float], threshold: float = DEFAULT_THRESHOLD) -> List[dict]:
+    """Return entries that are more than ``threshold`` (relative) slower than their baseline."""
+    regressions = []
+    for key, seconds in results.items():
+        base = baselines.get(key)
+        if not base:
+            continue
+        ratio = seconds / base
+        if ratio > 1 + threshold:
+            regressions.append({'name': key, 'baseline': base, 'current': seconds, 'ratio': ratio})
+    return regressions
@@ -0,0 +1,186 @@
+"""Benchmark definitions. Each setup runs once per size; only the returned callable is timed."""
+import contextlib
+import io
+
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory
+
+from packages import aml
+from packages.benchmarks import benchmark
+from packages.benchmarks.support import active_service, populate_folder, reset_state, synthetic_aml
+from packages.models import Package, PackageContent
+
+_factory = RequestFactory()
+
+
+@benchmark('fetch_from_gdrive', sizes={'10-files': 10, '50-files': 50, '200-files': 200})
+def bench_fetch_from_gdrive(images):
+    folder_id = f'bench-folder-{images}'
+    populate_folder(active_service().root, folder_id, images)
+    Package.objects.filter(slug=folder_id).delete()
+    pkg = Package.objects.create(
+        slug=folder_id,
+        google_drive_url=f'https://drive.google.com/drive/folders/{folder_id}',
+    )
+    user = AnonymousUser()
+
+    def run():
+        # Every call is a first fetch: nothing stored to link instead of downloading, no image
+        # metadata to carry over, and a store that does not grow from call to call
+        reset_state()
+        pkg.images = {}
+        # fetch_from_gdrive narrates progress with print(); keep it out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            pkg.fetch_from_gdrive(user)
+    return run
+
+
+@benchmark('aml_parse', sizes={'100-blocks': 100, '1000-blocks': 1000, '5000-blocks': 5000})
+def bench_aml_parse(blocks):
+    txt = synthetic_aml(blocks)
+    return lambda: aml.parse_aml(txt)
+
+
+def _images_payload(count):
+    return {
+        'gdrive': [{'name': f'photo-{i}.jpg', 'url': f'/packages/bench/image/drive{i}/'} for i in range(count)],
+        'gridfs': [
+            {'name': f'photo-{i}.jpg', 'id': '%024x' % i, 'content_type': 'image/jpeg'}
+            for i in range(0, count, 2)
+        ],
+    }
+
+
+@benchmark('format_images', sizes={'100-images': 100, '1000-images': 1000, '10000-images': 10000})
+def bench_format_images(count):
+    from packages.package_views import _format_images
+
+    payload = _images_payload(count)
+    request = _factory.get('/packages/bench/')
+    return lambda: _format_images(payload, request=request, slug='bench')
+
+
+@benchmark('strip_footnote_keys', sizes={'10-files': 10, '100-files': 100, '1000-files': 1000})
+def bench_strip_footnote_keys(files):
+    from packages.package_views import _strip_footnote_keys
+
+    parsed = aml.parse_aml(synthetic_aml(50))
+    parsed.update({'f': [], 'g': []})
+    payload = {f'file-{i}.aml': dict(parsed) for i in range(files)}
+    payload['_gridfs_aml'] = {f'file-{i}.aml': '%024x' % i for i in range(files)}
+    return lambda: _strip_footnote_keys(payload)
+
+
+@benchmark('version_history_read', sizes={'10-versions': 10, '50-versions': 50})
+def bench_version_history_read(count):
+    from packages.models import PackageVersion
+
+    slug = f'bench-history-{count}'
+    data = {'article.aml': aml.parse_aml(synthetic_aml(200))}
+    Package.objects.filter(slug=slug).delete()
+    pkg = Package.objects.create(slug=slug)
+    PackageVersion.objects.bulk_create([PackageVersion(package=pkg, data=data) for _ in range(count)])
+    # Reading keyframes decodes every stored (compressed) blob
+    return lambda: [v.data for v in PackageVersion.objects.filter(package=pkg)]
+
+
+@benchmark('serve_gridfs_file', sizes={'16KB': 16 * 1024, '256KB': 256 * 1024, '4MB': 4 * 1024 * 1024})
+def bench_serve_gridfs_file(size):
+    from packages import hot_files
+    from packages.file_store import store_bytes
+    from packages.views import serve_gridfs_file
+
+    file_id = store_bytes('bench.bin', 'application/octet-stream', b'x' * size, slug='bench', asset_type='image')
+    request = _factory.get(f'/files/{file_id}/')
+
+    def run():
+        # 20 sequential requests so small-file timings are above timer noise; each one
+        # reads the store rather than the in-process hot_files copy of the previous one
+        for _ in range(20):
+            hot_files.clear()
+            response = serve_gridfs_file(request, file_id)
+            assert len(response.content) == size
+    return run
+
+
+@benchmark('package_image', sizes={'1-image': 1, '20-images': 20})
+def bench_package_image(images):
+    from packages.package_views import package_image
+
+    folder_id = f'bench-proxy-{images}'
+    service = active_service()
+    populate_folder(service.root, folder_id, images, blocks=1)
+    listing = service.files().list(q=f"'{folder_id}' in parents and mimeType = 'image/jpeg'").execute()
+    file_ids = [f['id'] for f in listing['files']]
+    Package.objects.get_or_create(
+        slug=folder_id,
+        defaults={'google_drive_url': f'https://drive.google.com/drive/folders/{folder_id}'},
+    )
+    request = _factory.get(f'/packages/{folder_id}/image/')
+
+    def run():
+        for fid in file_ids:
+            response = package_image(request, folder_id, fid)
+            assert response.status_code == 200
+    return run
+
+
+@benchmark('list_packages_from_pset', sizes={'10-packages': 10, '100-packages': 100, '1000-packages': 1000})
+def bench_list_packages_from_pset(count):
+    from packages_api.api_views import list_packages_from_pset
+
+    category = 'bench-%d' % count
+    data = {'article.aml': aml.parse_aml(synthetic_aml(30)), 'f': []}
+    Package.objects.filter(category=category).delete()
+    packages = Package.objects.bulk_create([
+        Package(
+            slug=f'{category}-{i}',
+            category=category,
+            google_drive_url=f'https://drive.google.com/drive/folders/{category}-{i}',
+        )
+        for i in range(count)
+    ])
+    PackageContent.objects.bulk_create([
+        PackageContent(package=pkg, data=data, images=_images_payload(10)) for pkg in packages
+    ])
+    from packages import cache
+    request = _factory.get(f'/api/packages/{category}')
+
+    def run():
+        # Time the query and serialization, not a cached listing
+        cache.invalidate(cache.category_tag(category), publish=False)
+        return list_packages_from_pset(request, category)
+    return run
+
+
+def _photo(seed, size=(1600, 1200)):
+    """A noisy JPEG that costs roughly what a camera photo does to decode and resize."""
+    from PIL import Image
+
+    noise = Image.effect_noise(size, 48 + seed)
+    img = Image.merge('RGB', (noise, noise.rotate(90, expand=False), noise.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    out = io.BytesIO()
+    img.save(out, format='JPEG', quality=90)
+    return out.getvalue()
+
+
+def _stop_image_pool():
+    from packages import image_pool
+    image_pool.shutdown()
+
+
+@benchmark('image_resize', sizes={'inline': 0, '1-worker': 1, '2-workers': 2, '4-workers': 4}, repeat=3,
+           teardown=_stop_image_pool)
+def bench_image_resize(workers):
+    # Eight photos per call; compare worker counts to see scaling across cores
+    from django.test.utils import override_settings
+    from packages import image_pool
+
+    photos = [_photo(i) for i in range(8)]
+    image_pool.shutdown()
+
+    def run():
+        with override_settings(IMAGE_POOL_WORKERS=workers):
+            results = image_pool.resize_many(photos)
+        assert all(results)
+    return run
@@ -0,0 +1,118 @@
+"""Offline fixtures for the benchmark suite: fake Drive, mongomock and synthetic content."""
+import io
+import random
+import tempfile
+import types
+from contextlib import contextmanager, ExitStack
+from pathlib import Path
+from unittest import mock
+
+from django.test.utils import override_settings
+
+import oink_project.mongo as mongo
+from packages.drive_fake import DOC_SUFFIX, FakeDriveService, get_fake_service
+
+def synthetic_aml(blocks: int, seed: int = 0) -> str:
+    """Build an ArchieML article with ``blocks`` content blocks (text, images, pull quotes)."""
+    rnd = random.Random(seed)
+    words = ['bruin', 'campus', 'regents', 'westwood', 'royce', 'pauley', 'tuition', 'students']
+    lines = [
+        'author: Joe Bruin',
+        'headline: Synthetic benchmark article',
+        'excerpt: ' + ' '.join(rnd.choice(words) for _ in range(20)),
+        'updated: 2025-01-01',
+        'articleType: article',
+        'coverimg: https://example.com/cover.jpg',
+        'coveralt: Cover',
+        'covercred: Daily Bruin',
+        '[+content]',
+    ]
+    for i in range(blocks):
+        kind = i % 10
+        if kind == 7:
+            lines += ['{.image}', 'url: https://example.com/%d.jpg' % i, 'caption: Caption %d' % i,
+                      'credit: Photographer', 'alt: Alt %d' % i, '{}']
+        elif kind == 9:
+            lines += ['{.pull}', 'caption: ' + ' '.join(rnd.choice(words) for _ in range(12)), '{}']
+        else:
+            lines.append(' '.join(rnd.choice(words) for _ in range(60)))
+    # Footnote markers like [g] in a Doc parse as empty top-level arrays
+    lines += ['[]', '[f]', '[]', '[g]', '[]']
+    return '\n'.join(lines) + '\n'
+
+
+def synthetic_image(size: int = 256, seed: int = 0) -> bytes:
+    """Return a small JPEG (or random bytes when Pillow is unavailable)."""
+    try:
+        from PIL import Image
+    except Exception:
+        return random.Random(seed).randbytes(size * size // 4)
+    img = Image.new('RGB', (size, size), ((seed * 37) % 256, (seed * 91) % 256, 128))
+    out = io.BytesIO()
+    img.save(out, format='JPEG', quality=85)
+    return out.getvalue()
+
+
+def populate_folder(root, folder_id: str, images: int, blocks: int = 200) -> Path:
+    """Write a fake Drive package folder with one article.aml Doc and ``images`` JPEGs."""
+    folder = Path(root) / folder_id
+    folder.mkdir(parents=True, exist_ok=True)
+    (folder / ('article.aml' + DOC_SUFFIX)).write_text(synthetic_aml(blocks), encoding='utf-8')
+    image = synthetic_image()
+    for i in range(images):
+        (folder / f'photo-{i}.jpg').write_bytes(image)
+    return folder
+
+
+_active = {'service': None, 'mongomock': False}
+
+
+def active_service() -> FakeDriveService:
+    """Return the fake Drive service installed by the enclosing ``offline_environment``."""
+    return _active['service']
+
+
+def reset_state() -> None:
+    """Drop the mongomock database so each benchmark starts from an empty store."""
+    if _active['mongomock']:
+        mongo.get_client().drop_database('oink_bench')
+
+
+def mongomock_client():
+    import mongomock
+    import mongomock.gridfs
+
+    mongomock.gridfs.enable_gridfs_integration()
+    client = mongomock.MongoClient()
+    # GridFSBucket reads client.options.timeout, which mongomock does not provide.
+    client.options = types.SimpleNamespace(timeout=None)
+    return client
+
+
+@contextmanager
+def offline_environment(use_mongomock: bool = True, **drive_settings):
+    """Point Drive at a temporary fake tree and Mongo at mongomock for the duration of the block.
+
+    Yields the ``FakeDriveService``. ``drive_settings`` override ``DRIVE_FAKE_*`` settings
+    (e.g. ``DRIVE_FAKE_LATENCY_MS=20``). With ``use_mongomock=False`` the configured
+    ``MONGODB_URI`` (e.g. a local mongod) is used.
+    """
+    with ExitStack() as stack:
+        root = stack.enter_context(tempfile.TemporaryDirectory(prefix='oink-fake-drive-'))
+        stack.enter_context(override_settings(
+            DRIVE_BACKEND='fake',
+            DRIVE_FAKE_ROOT=root,
+            MONGODB_FILESTORE_ENABLED=True,
+            ALLOWED_HOSTS=['testserver'],
+            **drive_settings,
+        ))
+        service = get_fake_service()
+        if use_mongomock:
+            client = mongomock_client()
+            stack.enter_context(mock.patch.object(mongo, 'get_client', return_value=client))
+            stack.enter_context(mock.patch.dict('os.environ', {'MONGODB_DB_NAME': 'oink_bench', 'MONGODB_BUCKET': 'files'}))
+        _active.update(service=service, mongomock=use_mongomock)
+        try:
+            yield service
+        finally:
+            _active.update(service=None, mongomock=False)
@@ -0,0 +1,145 @@
+"""Cache helpers with tag-based invalidation.
+
+Entries are stored in the ``default`` cache (see ``CACHES`` in settings) along
+with the current version of each of their tags. ``invalidate`` gives a tag a
+new version, which makes every entry stored under the old one a miss, so all
+cached data for a package (API JSON, rendered cards, formatted images, search
+results) can be dropped at once without tracking individual keys. Tag versions
+are ordinary cache keys, so this works the same on the local-memory, file and
+Redis backends.
+
+Tags: ``package_tag(slug)`` for one package, ``category_tag(category)`` for a
+category listing and ``PACKAGES`` for anything that lists packages across
+categories (index, search). ``invalidate_package`` bumps all three (in every
+worker, see ``packages.cache_bus``); it runs
+from ``Package.save``, on delete and after a fetch, so code writing packages
+with ``QuerySet.update`` or ``bulk_create`` must call it too.
+"""
+import hashlib
+import logging
+import uuid
+from typing import Callable, Iterable, Optional
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+PACKAGES = 'packages'
+
+_MISSING = object()
+
+
+def package_tag(slug: str) -> str:
+    return f'package:{slug}'
+
+
+def category_tag(category: str) -> str:
+    return f'category:{category}'
+
+
+def make_key(*parts) -> str:
+    """Cache key for ``parts`` (hashed: slugs and queries may hold characters memcached rejects)."""
+    raw = '\x1f'.join(str(p) for p in parts)
+    return 'c:' + hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _tag_key(tag: str) -> str:
+    return 't:' + hashlib.sha1(tag.encode('utf-8')).hexdigest()
+
+
+def _versions(tags: Iterable[str]) -> dict:
+    """Current version of each tag, giving untagged ones a first version."""
+    keys = {_tag_key(t): t for t in tags}
+    if not keys:
+        return {}
+    found = cache.get_many(list(keys))
+    for key in keys:
+        if key not in found:
+            # add() so concurrent first uses agree on one version
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            found[key] = cache.get(key)
+    return {keys[k]: v for k, v in found.items()}
+
+
+def tag_version(tag: str) -> str:
+    """Current version token of ``tag``; changes on every ``invalidate`` (for use in keys)."""
+    try:
+        return _versions([tag])[tag]
+    except Exception:
+        logger.warning('Cache read failed for tag %s', tag, exc_info=True)
+        return uuid.uuid4().hex
+
+
+def get(key: str, default=None):
+    """Cached value for ``key``, or ``default`` when missing or invalidated."""
+    try:
+        entry = cache.get(key)
+        if entry is None:
+            return default
+        versions, value = entry
+        if versions and _versions(versions) != versions:
+            return default
+        return value
+    except Exception:
+        logger.warning('Cache read failed for %s', key, exc_info=True)
+        return default
+
+
+def set(key: str, value, tags: Iterable[str] = (), timeout: Optional[int] = None) -> None:
+    """Store ``value`` under ``key``, invalidated by any of ``tags``."""
+    try:
+        _set(key, value, _versions(tags), timeout)
+    except Exception:
+        logger.warning('Cache write failed for %s', key, exc_info=True)
+
+
+def _set(key, value, versions, timeout):
+    if timeout is None:
+        cache.set(key, (versions, value))
+    else:
+        cache.set(key, (versions, value), timeout)
+
+
+def get_or_set(key: str, compute: Callable, tags: Iterable[str] = (), timeout: Optional[int] = None):
+    """Return the cached value for ``key``, computing and storing it on a miss.
+
+    Tag versions are read before ``compute`` runs, so an invalidation that lands
+    while it runs leaves the new entry already stale rather than serving old data.
+    """
+    value = get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+    try:
+        versions = _versions(tags)
+    except Exception:
+        logger.warning('Cache read failed for %s', key, exc_info=True)
+        return compute()
+    value = compute()
+    try:
+        _set(key, value, versions, timeout)
+    except Exception:
+        logger.warning('Cache write failed for %s', key, exc_info=True)
+    return value
+
+
+def invalidate(*tags: str, publish: bool = True) -> None:
+    """Make every entry tagged with any of ``tags`` a miss.
+
+    With ``publish`` the invalidation also goes to the other workers' local caches
+    (``packages.cache_bus``).
+    """
+    tags = [t for t in tags if t]
+    if not tags:
+        return
+    try:
+        cache.set_many({_tag_key(t): uuid.uuid4().hex for t in tags}, timeout=None)
+    except Exception:
+        logger.exception('Cache invalidation failed for %s', tags)
+    if publish:
+        from . import cache_bus
+        cache_bus.publish(tags)
+
+
+def invalidate_package(slug: str, category: str = '', publish: bool = True) -> None:
+    """Drop cached data for package ``slug`` and every listing that may include it."""
+    invalidate(package_tag(slug), category_tag(category) if category else '', PACKAGES, publish=publish)
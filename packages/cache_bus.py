@@ -0,0 +1,139 @@
+"""Cross-worker invalidation for process-local caches.
+
+With the default ``locmem`` cache every gunicorn worker has its own copy of
+cached package data, and ``cache.invalidate`` only reaches the worker that ran
+it. The bus makes invalidations global: ``publish`` appends the tags to the
+``CacheEvent`` table (``Package.save`` publishes once the change commits, so a
+rolled-back change publishes nothing) and ``CacheBusMiddleware`` has every worker ``poll``
+for new events at most every ``CACHE_BUS_POLL_INTERVAL`` seconds with one
+indexed range query, invalidating the same tags locally.
+
+``CACHE_BUS=auto`` (default) enables the bus only when the default cache is
+process-local; shared backends (Redis, file) are already coherent. Events older
+than ``CACHE_BUS_RETENTION`` seconds are pruned, so a worker that has not polled
+for that long (and may have missed some) clears its whole local cache.
+"""
+import logging
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Identifies this process's own events, which need no second local invalidation
+ORIGIN = uuid.uuid4().hex
+PRUNE_EVERY = 100
+
+_state = {'last_id': None, 'last_poll': 0.0, 'published': 0}
+_poll_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    mode = (getattr(settings, 'CACHE_BUS', 'auto') or 'auto').lower()
+    if mode == 'auto':
+        backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+        return backend.endswith('LocMemCache')
+    return mode == 'db'
+
+
+def publish(tags) -> None:
+    """Record an invalidation of ``tags`` for the other workers."""
+    from .models import CacheEvent
+
+    tags = [t for t in tags if t]
+    if not tags or not enabled():
+        return
+    try:
+        CacheEvent.objects.create(tags=tags, origin=ORIGIN)
+        _state['published'] += 1
+        if _state['published'] % PRUNE_EVERY == 0:
+            prune()
+    except Exception:
+        logger.exception('Could not publish cache invalidation for %s', tags)
+
+
+def prune() -> int:
+    from .models import CacheEvent
+
+    retention = int(getattr(settings, 'CACHE_BUS_RETENTION', 3600) or 3600)
+    deleted, _ = CacheEvent.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=retention)).delete()
+    return deleted
+
+
+def due() -> bool:
+    """Whether ``poll`` would query now (enabled and the poll interval has passed)."""
+    interval = float(getattr(settings, 'CACHE_BUS_POLL_INTERVAL', 1.0) or 0)
+    return enabled() and time.monotonic() - _state['last_poll'] >= interval
+
+
+def poll(force: bool = False) -> int:
+    """Apply events published since the last poll; returns the number applied."""
+    from . import cache
+    from .models import CacheEvent
+
+    if not enabled():
+        return 0
+    now = time.monotonic()
+    if not force and not due():
+        return 0
+    # One poller per process at a time; other threads go on with what they have
+    if not _poll_lock.acquire(blocking=False):
+        return 0
+    try:
+        previous, _state['last_poll'] = _state['last_poll'], now
+        last_id = _state['last_id']
+        if last_id is None:
+            # Nothing is cached yet that older events could apply to
+            _state['last_id'] = CacheEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+            return 0
+        if now - previous > int(getattr(settings, 'CACHE_BUS_RETENTION', 3600) or 3600):
+            logger.info('Idle longer than the cache event retention; clearing the local cache')
+            default_cache.clear()
+        events = list(CacheEvent.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'tags', 'origin'))
+        if not events:
+            return 0
+        tags = {tag for _, event_tags, origin in events if origin != ORIGIN for tag in event_tags}
+        if tags:
+            cache.invalidate(*tags, publish=False)
+        _state['last_id'] = events[-1][0]
+        return len(events)
+    except Exception:
+        logger.exception('Could not poll cache invalidations')
+        return 0
+    finally:
+        _poll_lock.release()
+
+
+def reset() -> None:
+    """Forget the poll position (tests, or after the local cache was cleared)."""
+    _state.update(last_id=None, last_poll=0.0)
+
+
+class CacheBusMiddleware:
+    """Apply other workers' cache invalidations before handling each request."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._async = iscoroutinefunction(get_response)
+        if self._async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self._async:
+            return self.__acall__(request)
+        poll()
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        # Only hop to the sync thread for the database query when a poll is due
+        if due():
+            await sync_to_async(poll)()
+        return await self.get_response(request)
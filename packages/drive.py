@@ -1,6 +1,7 @@
 import os
 import logging
-from typing import Optional
+import threading
+from typing import Callable, Optional
 
 try:
     from requests_oauthlib import OAuth2Session
@@ -18,46 +19,97 @@ except Exception:
     build = None
     HttpError = Exception
 
+DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive']
 
-def create_drive_folder(
-    folder_name: str,
-    *,
-    parent_id: Optional[str] = None,
+
+def get_drive_service(
     service_account_file: Optional[str] = None,
     impersonate_user: Optional[str] = None,
-    share_public: bool = False,
-    share_domain: Optional[str] = None,
-    share_role: str = 'writer'
-) -> Optional[dict]:
-    """Create a Google Drive folder and optionally set sharing."""
+):
+    """Return a Drive v3 service, or None if Drive is not configured.
+
+    With ``DRIVE_BACKEND = 'fake'`` this is the offline directory-backed service
+    from ``drive_fake``; otherwise a googleapiclient service built from the service
+    account file (or its JSON contents), optionally impersonating ``impersonate_user``.
+    """
+    from django.conf import settings
+
+    if getattr(settings, 'DRIVE_BACKEND', 'google') == 'fake':
+        from .drive_fake import get_fake_service
+        return get_fake_service()
+
+    creds = get_credentials(service_account_file, impersonate_user)
+    if creds is None:
+        return None
+    if build is None:
+        logger.error('Google API libraries are not installed')
+        return None
+    return build('drive', 'v3', credentials=creds, cache_discovery=False)
+
+
+def get_credentials(
+    service_account_file: Optional[str] = None,
+    impersonate_user: Optional[str] = None,
+):
+    """Drive-scoped service account credentials, or None if Drive is not configured."""
     if service_account_file is None:
         service_account_file = (
             os.getenv('GOOGLE_SERVICE_ACCOUNT_FILE')
             or os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
         )
     if not service_account_file:
-        logger.info('No service account credentials configured; skipping Drive folder creation')
+        logger.info('No service account credentials configured; Drive is unavailable')
         return None
 
-    if service_account is None or build is None:
-        logger.exception('Google API libraries are not installed')
+    if service_account is None:
+        logger.error('Google API libraries are not installed')
         return None
 
-    scopes = ['https://www.googleapis.com/auth/drive']
+    if service_account_file.strip().startswith('{'):
+        import json
+        info = json.loads(service_account_file)
+        creds = service_account.Credentials.from_service_account_info(info, scopes=DRIVE_SCOPES)
+    else:
+        creds = service_account.Credentials.from_service_account_file(service_account_file, scopes=DRIVE_SCOPES)
 
-    try:
-        # Load credentials
-        if service_account_file.strip().startswith('{'):
-            import json
-            info = json.loads(service_account_file)
-            creds = service_account.Credentials.from_service_account_info(info, scopes=scopes)
-        else:
-            creds = service_account.Credentials.from_service_account_file(service_account_file, scopes=scopes)
+    if impersonate_user:
+        creds = creds.with_subject(impersonate_user)
+    return creds
+
+
+def per_thread_service(factory: Callable, default=None) -> Callable:
+    """Return a callable giving each calling thread its own service from ``factory``.
+
+    googleapiclient services share one ``httplib2.Http`` and are not thread-safe, so
+    worker pools must not share a service. Falls back to ``default`` when ``factory``
+    returns None.
+    """
+    local = threading.local()
 
-        if impersonate_user:
-            creds = creds.with_subject(impersonate_user)
+    def get():
+        service = getattr(local, 'service', None)
+        if service is None:
+            service = local.service = factory() or default
+        return service
+    return get
 
-        service = build('drive', 'v3', credentials=creds, cache_discovery=False)
+
+def create_drive_folder(
+    folder_name: str,
+    *,
+    parent_id: Optional[str] = None,
+    service_account_file: Optional[str] = None,
+    impersonate_user: Optional[str] = None,
+    share_public: bool = False,
+    share_domain: Optional[str] = None,
+    share_role: str = 'writer'
+) -> Optional[dict]:
+    """Create a Google Drive folder and optionally set sharing."""
+    try:
+        service = get_drive_service(service_account_file, impersonate_user)
+        if service is None:
+            logger.info('Drive unavailable; skipping Drive folder creation for %s', folder_name)
+            return None
 
         file_metadata = {'name': folder_name, 'mimeType': 'application/vnd.google-apps.folder'}
         if parent_id:
@@ -97,25 +149,11 @@ def create_google_doc_in_folder(
     share_role: str = 'writer'
 ) -> Optional[dict]:
     """Create a Google Doc in an existing Drive folder using a service account."""
-    if service_account_file is None:
-        service_account_file = os.getenv('GOOGLE_SERVICE_ACCOUNT_FILE')
-
-    if not service_account_file:
-        logger.info('No service account file configured; skipping Google Doc creation')
-        return None
-
-    if service_account is None or build is None:
-        logger.exception('Google API libraries are not installed')
-        return None
-
-    scopes = ['https://www.googleapis.com/auth/drive']
-
     try:
-        creds = service_account.Credentials.from_service_account_file(service_account_file, scopes=scopes)
-        if impersonate_user:
-            creds = creds.with_subject(impersonate_user)
-
-        service = build('drive', 'v3', credentials=creds, cache_discovery=False)
+        service = get_drive_service(service_account_file, impersonate_user)
+        if service is None:
+            logger.info('Drive unavailable; skipping Google Doc creation')
+            return None
 
         file_metadata = {'name': title, 'mimeType': 'application/vnd.google-apps.document'}
         if folder_id:
@@ -153,17 +191,10 @@ def ensure_article_doc_in_folder(
     share_role: str = 'writer'
 ) -> Optional[dict]:
     """Ensure a Google Doc named 'article.aml' exists in the folder; create if missing."""
-    if service_account_file is None:
-        service_account_file = os.getenv('GOOGLE_SERVICE_ACCOUNT_FILE')
-    if not service_account_file or service_account is None or build is None:
-        return None
-
     try:
-        creds = service_account.Credentials.from_service_account_file(service_account_file, scopes=['https://www.googleapis.com/auth/drive'])
-        if impersonate_user:
-            creds = creds.with_subject(impersonate_user)
-
-        service = build('drive', 'v3', credentials=creds, cache_discovery=False)
+        service = get_drive_service(service_account_file, impersonate_user)
+        if service is None:
+            return None
 
         q = f"name contains 'article' and mimeType = 'application/vnd.google-apps.document' and '{folder_id}' in parents"
         found = service.files().list(q=q, fields='files(id,name,webViewLink)').execute().get('files', [])
@@ -183,6 +214,28 @@ def ensure_article_doc_in_folder(
         return None
 
 
+def rename_drive_file(
+    file_id: str,
+    name: str,
+    *,
+    service_account_file: Optional[str] = None,
+    impersonate_user: Optional[str] = None
+) -> bool:
+    """Rename a Drive file or folder in place (one files.update call)."""
+    try:
+        service = get_drive_service(service_account_file, impersonate_user)
+        if service is None:
+            return False
+        service.files().update(fileId=file_id, body={'name': name}, fields='id', supportsAllDrives=True).execute()
+        return True
+    except HttpError as e:
+        logger.warning('Google Drive API error renaming %s to %s: %s', file_id, name, e)
+        return False
+    except Exception:
+        logger.exception('Unexpected error renaming Drive file %s', file_id)
+        return False
+
+
 def get_oauth2_session(user, token_updater=True):
     """Build an OAuth2Session for a user using saved GoogleCredential tokens."""
     if OAuth2Session is None:
@@ -0,0 +1,119 @@
+"""Async Drive reads for the ASGI image proxy (``packages.async_views``).
+
+googleapiclient is synchronous: under ASGI every call would tie up a worker
+thread for the whole download. When httpx is installed and the real Drive
+backend is in use, file metadata and media are fetched with the Drive REST API
+over one ``httpx.AsyncClient`` per event loop, authorized with the service
+account's bearer token (google-auth is synchronous, so the token is refreshed
+in a worker thread, once for all waiting requests). Otherwise (the fake
+backend, or no httpx) the googleapiclient calls run in worker threads.
+"""
+import asyncio
+import logging
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import drive, singleflight
+
+try:
+    import httpx
+except ImportError:  # fall back to googleapiclient in worker threads
+    httpx = None
+
+try:
+    from google.auth.transport.requests import Request as AuthRequest
+except Exception:
+    AuthRequest = None
+
+logger = logging.getLogger(__name__)
+
+FILES_URL = 'https://www.googleapis.com/drive/v3/files/'
+
+_clients = {}  # event loop -> httpx.AsyncClient
+_credentials = {}  # service account file -> credentials (None when not configured)
+_lock = threading.Lock()
+
+
+class DriveUnavailable(Exception):
+    """Drive is not configured (no service account) or its libraries are missing."""
+
+
+def _service_account_file() -> str:
+    return getattr(settings, 'GOOGLE_SERVICE_ACCOUNT_FILE', None) or ''
+
+
+def _fake() -> bool:
+    return getattr(settings, 'DRIVE_BACKEND', 'google') == 'fake'
+
+
+def _native() -> bool:
+    return httpx is not None and AuthRequest is not None and not _fake()
+
+
+def _get_credentials():
+    key = _service_account_file()
+    with _lock:
+        if key not in _credentials:
+            _credentials[key] = drive.get_credentials(key)
+        return _credentials[key]
+
+
+def configured() -> bool:
+    return _fake() or _get_credentials() is not None
+
+
+def _client():
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        for stale in [l for l in _clients if l.is_closed()]:
+            del _clients[stale]
+        client = _clients[loop] = httpx.AsyncClient(
+            timeout=float(getattr(settings, 'DRIVE_HTTP_TIMEOUT', 30) or 30),
+            limits=httpx.Limits(max_connections=int(getattr(settings, 'DRIVE_HTTP_MAX_CONNECTIONS', 100) or 100)),
+        )
+    return client
+
+
+async def _token(creds) -> str:
+    if not creds.valid:
+        await singleflight.ado(
+            f'drive-token:{id(creds)}',
+            sync_to_async(lambda: creds.refresh(AuthRequest()), thread_sensitive=False),
+        )
+    return creds.token
+
+
+async def _get(file_id: str, params: dict):
+    creds = _get_credentials()
+    if creds is None:
+        raise DriveUnavailable('Google Drive not configured')
+    headers = {'Authorization': f'Bearer {await _token(creds)}'}
+    response = await _client().get(FILES_URL + file_id, params=params, headers=headers)
+    response.raise_for_status()
+    return response
+
+
+def _in_thread(call):
+    """Run ``call(service)`` with a googleapiclient service in a worker thread."""
+    def run():
+        service = drive.get_drive_service(_service_account_file())
+        if service is None:
+            raise DriveUnavailable('Google Drive not configured')
+        return call(service)
+    return sync_to_async(run, thread_sensitive=False)()
+
+
+async def get_metadata(file_id: str, fields: str) -> dict:
+    if not _native():
+        return await _in_thread(lambda service: service.files().get(fileId=file_id, fields=fields).execute())
+    return (await _get(file_id, {'fields': fields})).json()
+
+
+async def get_media(file_id: str) -> bytes:
+    if not _native():
+        return await _in_thread(lambda service: service.files().get_media(fileId=file_id).execute())
+    return (await _get(file_id, {'alt': 'media'})).content
+
@@ -0,0 +1,115 @@
+"""Breadth-first listing of a Drive folder tree.
+
+``iter_files`` pages through every folder with ``pageSize=1000`` and a minimal
+field mask, skips trashed entries and descends into subfolders, listing up to
+``DRIVE_CRAWL_WORKERS`` folders concurrently. Records are yielded as each page
+arrives, so callers can start downloading before the crawl finishes.
+
+googleapiclient service objects are not thread-safe; pass ``service_factory`` so
+every worker thread builds its own (the fake Drive service is shared safely).
+"""
+import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Optional
+
+from django.conf import settings
+
+from .drive import per_thread_service
+
+logger = logging.getLogger(__name__)
+
+FOLDER_MIME = 'application/vnd.google-apps.folder'
+PAGE_SIZE = 1000
+FILE_FIELDS = 'id,name,mimeType,size,md5Checksum,modifiedTime'
+
+_DONE = object()
+
+
+def crawl_workers() -> int:
+    return max(1, int(getattr(settings, 'DRIVE_CRAWL_WORKERS', 4) or 1))
+
+
+def list_folder(service, folder_id: str, *, fields: str = FILE_FIELDS, num_retries: int = 3) -> Iterator[list]:
+    """Yield the non-trashed children of ``folder_id`` one page at a time."""
+    page_token = None
+    while True:
+        resp = service.files().list(
+            q=f"'{folder_id}' in parents and trashed = false",
+            pageSize=PAGE_SIZE,
+            pageToken=page_token,
+            fields=f'nextPageToken,files({fields})',
+            supportsAllDrives=True,
+            includeItemsFromAllDrives=True,
+        ).execute(num_retries=num_retries)
+        yield resp.get('files', [])
+        page_token = resp.get('nextPageToken')
+        if not page_token:
+            return
+
+
+def iter_files(
+    service,
+    folder_id: str,
+    *,
+    recursive: bool = True,
+    max_depth: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    service_factory: Optional[Callable] = None,
+    fields: str = FILE_FIELDS,
+) -> Iterator[dict]:
+    """Yield every file under ``folder_id`` (folders themselves are not yielded).
+
+    Each record is the Drive metadata for ``fields`` plus ``path``: the file name
+    prefixed with its subfolder names relative to ``folder_id`` (e.g.
+    ``photos/cover.jpg``). ``max_depth`` limits recursion (0 lists ``folder_id``
+    only; defaults to ``DRIVE_CRAWL_MAX_DEPTH``). A failed listing is re-raised
+    once the folders already being listed have finished.
+    """
+    if max_depth is None:
+        max_depth = getattr(settings, 'DRIVE_CRAWL_MAX_DEPTH', 5)
+    if not recursive:
+        max_depth = 0
+    if 'mimeType' not in fields.split(','):
+        fields = f'{fields},mimeType'
+
+    results = queue.Queue()
+    _service = per_thread_service(service_factory, service) if service_factory else (lambda: service)
+
+    def _list(fid, prefix, depth):
+        try:
+            for page in list_folder(_service(), fid, fields=fields):
+                results.put((page, prefix, depth))
+        except Exception as exc:
+            results.put(exc)
+        finally:
+            results.put(_DONE)
+
+    seen = {folder_id}
+    pending = 1
+    error = None
+    with ThreadPoolExecutor(max_workers=max_workers or crawl_workers(), thread_name_prefix='drive-crawl') as pool:
+        pool.submit(_list, folder_id, '', 0)
+        while pending:
+            item = results.get()
+            if item is _DONE:
+                pending -= 1
+                continue
+            if isinstance(item, Exception):
+                error = error or item
+                continue
+            page, prefix, depth = item
+            for record in page:
+                path = prefix + (record.get('name') or '')
+                if record.get('mimeType') == FOLDER_MIME:
+                    # A folder can appear under several parents (or via shortcuts); list it once
+                    if depth < max_depth and record['id'] not in seen and error is None:
+                        seen.add(record['id'])
+                        pending += 1
+                        pool.submit(_list, record['id'], path + '/', depth + 1)
+                    continue
+                if error is None:
+                    yield dict(record, path=path)
+    if error is not None:
+        logger.warning('Drive crawl of %s failed: %s', folder_id, error)
+        raise error
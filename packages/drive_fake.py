@@ -0,0 +1,425 @@
+"""Offline Drive v3 backend backed by a local directory tree.
+
+Enabled with ``DRIVE_BACKEND=fake``; ``drive.get_drive_service`` then returns a
+``FakeDriveService`` rooted at ``DRIVE_FAKE_ROOT`` instead of a googleapiclient
+service. It implements the calls Oink makes (files.list/get/get_media/export/create/update,
+permissions.create, batch requests and the ranged GETs of ``MediaIoBaseDownload``)
+so fetches and the image proxy can be exercised and load tested without network access.
+
+Layout: every directory is a folder and every file a Drive file. Top-level
+directories are package folders whose Drive id is the directory name (so
+``DRIVE_FAKE_ROOT/my-package/`` is ``https://drive.google.com/drive/folders/my-package``);
+nested entries get a stable id derived from their path. A file named
+``article.aml.gdoc`` shows up as a Google Doc called ``article.aml``. Renames
+(``files.update``) are kept in memory and leave the directory as is, so ids stay
+stable like they do in Drive.
+
+``DRIVE_FAKE_LATENCY_MS`` adds a delay to every request, ``DRIVE_FAKE_ERROR_RATE``
+fails that fraction of requests with a 500 and ``DRIVE_FAKE_RATE_LIMIT`` answers
+with 429 ``rateLimitExceeded`` once more than that many requests per second arrive.
+"""
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+
+from django.conf import settings
+
+try:
+    import httplib2
+    from googleapiclient.errors import HttpError
+except Exception:
+    httplib2 = None
+    HttpError = None
+
+logger = logging.getLogger(__name__)
+
+FOLDER_MIME = 'application/vnd.google-apps.folder'
+DOC_MIME = 'application/vnd.google-apps.document'
+DOC_SUFFIX = '.gdoc'
+ROOT_ID = 'root'
+
+_ID_RE = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+class FakeDriveError(Exception):
+    """Raised instead of ``HttpError`` when googleapiclient is not installed."""
+
+    def __init__(self, status: int, reason: str):
+        super().__init__(f'{status} {reason}')
+        self.status_code = status
+        self.reason = reason
+
+
+def _http_error(status: int, reason: str) -> Exception:
+    content = json.dumps({'error': {'code': status, 'message': reason, 'errors': [{'reason': reason}]}}).encode('utf-8')
+    if HttpError is not None and httplib2 is not None:
+        resp = httplib2.Response({'status': status})
+        resp.reason = reason
+        return HttpError(resp, content)
+    return FakeDriveError(status, reason)
+
+
+class _Request:
+    """Deferred call with the ``execute()`` interface of googleapiclient's HttpRequest."""
+
+    def __init__(self, backend: 'FakeDriveService', func, *, uri: str = '', http=None):
+        self._backend = backend
+        self._func = func
+        # Read by googleapiclient.http.MediaIoBaseDownload for chunked media downloads
+        self.uri = uri
+        self.headers = {}
+        self.http = http
+
+    def execute(self, num_retries: int = 0):
+        self._backend._before_request()
+        return self._func()
+
+
+class _MediaHttp:
+    """``httplib2.Http`` stand-in answering the ranged GETs of ``MediaIoBaseDownload``."""
+
+    def __init__(self, backend: 'FakeDriveService', file_id: str):
+        self._backend = backend
+        self._file_id = file_id
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        try:
+            self._backend._before_request()
+            path = self._backend._path_for(self._file_id)
+            if path.is_dir():
+                raise _http_error(403, 'fileNotDownloadable')
+        except Exception as e:
+            resp = getattr(e, 'resp', None)
+            if resp is None:
+                raise
+            return resp, getattr(e, 'content', b'')
+        total = path.stat().st_size
+        m = re.match(r'bytes=(\d+)-(\d*)', (headers or {}).get('range', ''))
+        if not m:
+            return httplib2.Response({'status': 200, 'content-length': str(total)}), path.read_bytes()
+        start = int(m.group(1))
+        end = min(int(m.group(2)) if m.group(2) else total - 1, total - 1)
+        if start >= total:
+            return httplib2.Response({'status': 416, 'content-range': f'bytes */{total}'}), b''
+        with open(path, 'rb') as fh:
+            fh.seek(start)
+            content = fh.read(end - start + 1)
+        return httplib2.Response({'status': 206, 'content-range': f'bytes {start}-{end}/{total}'}), content
+
+
+class FakeDriveService:
+    def __init__(
+        self,
+        root: str,
+        *,
+        root_id: str = ROOT_ID,
+        latency_ms: float = 0,
+        error_rate: float = 0,
+        rate_limit: int = 0,
+        seed: Optional[int] = None,
+    ):
+        self.root = Path(root)
+        self.root_id = root_id or ROOT_ID
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.permissions_granted: Dict[str, list] = {}
+        self.request_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent = deque()
+        self._paths: Dict[str, Path] = {}
+        self._checksums: Dict[tuple, str] = {}
+        self._names: Dict[Path, str] = {}
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    # -- googleapiclient-style resources ---------------------------------------------------
+
+    def files(self):
+        return _Files(self)
+
+    def permissions(self):
+        return _Permissions(self)
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(callback)
+
+    # -- request accounting ----------------------------------------------------------------
+
+    def _before_request(self):
+        with self._lock:
+            self.request_count += 1
+            now = time.monotonic()
+            if self.rate_limit:
+                while self._recent and now - self._recent[0] > 1.0:
+                    self._recent.popleft()
+                limited = len(self._recent) >= self.rate_limit
+                if not limited:
+                    self._recent.append(now)
+            else:
+                limited = False
+            failed = self.error_rate and self._random.random() < self.error_rate
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        if limited:
+            raise _http_error(429, 'rateLimitExceeded')
+        if failed:
+            raise _http_error(500, 'backendError')
+
+    # -- id <-> path mapping ---------------------------------------------------------------
+
+    def _id_for(self, path: Path) -> str:
+        rel = path.relative_to(self.root)
+        if str(rel) == '.':
+            return self.root_id
+        if len(rel.parts) == 1 and path.is_dir() and _ID_RE.match(rel.parts[0]):
+            return rel.parts[0]
+        return 'f' + hashlib.sha1(rel.as_posix().encode('utf-8')).hexdigest()[:27]
+
+    def _remember(self, path: Path) -> str:
+        file_id = self._id_for(path)
+        with self._lock:
+            self._paths[file_id] = path
+        return file_id
+
+    def _path_for(self, file_id: str) -> Path:
+        if file_id == self.root_id:
+            return self.root
+        path = self._paths.get(file_id)
+        if path is not None and path.exists():
+            return path
+        candidate = self.root / file_id
+        if _ID_RE.match(file_id or '') and candidate.is_dir():
+            return self._paths.setdefault(file_id, candidate)
+        # Files added on disk since the last lookup: rescan the tree once.
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            for entry in dirnames + filenames:
+                self._remember(Path(dirpath) / entry)
+        path = self._paths.get(file_id)
+        if path is None or not path.exists():
+            raise _http_error(404, 'notFound')
+        return path
+
+    def _metadata(self, path: Path) -> dict:
+        file_id = self._remember(path)
+        name = path.name
+        if path.is_dir():
+            mime = FOLDER_MIME
+        elif name.endswith(DOC_SUFFIX):
+            name = name[:-len(DOC_SUFFIX)]
+            mime = DOC_MIME
+        elif name.lower().endswith('.aml'):
+            mime = 'text/plain'
+        else:
+            mime = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        name = self._names.get(path, name)
+        stat = path.stat()
+        meta = {
+            'id': file_id,
+            'name': name,
+            'mimeType': mime,
+            'parents': [self._id_for(path.parent)],
+            'trashed': False,
+            'modifiedTime': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(stat.st_mtime)),
+        }
+        if mime == FOLDER_MIME:
+            meta['webViewLink'] = f'https://drive.google.com/drive/folders/{file_id}'
+        elif mime == DOC_MIME:
+            meta['webViewLink'] = f'https://docs.google.com/document/d/{file_id}/edit'
+        else:
+            meta['size'] = str(stat.st_size)
+            meta['md5Checksum'] = self._md5(path, stat)
+            meta['webViewLink'] = f'https://drive.google.com/file/d/{file_id}/view'
+            meta['webContentLink'] = f'https://drive.google.com/uc?id={file_id}&export=download'
+        return meta
+
+    def _md5(self, path: Path, stat) -> str:
+        key = (str(path), stat.st_mtime_ns, stat.st_size)
+        digest = self._checksums.get(key)
+        if digest is None:
+            digest = self._checksums[key] = hashlib.md5(path.read_bytes()).hexdigest()
+        return digest
+
+    # -- operations ------------------------------------------------------------------------
+
+    def _list(self, q: str, page_size: int, page_token: Optional[str]) -> dict:
+        filters = _parse_query(q)
+        parent = filters.pop('parent', None)
+        folder = self._path_for(parent) if parent else self.root
+        entries = sorted(folder.iterdir(), key=lambda p: p.name) if folder.is_dir() else []
+        matched = [m for m in (self._metadata(p) for p in entries) if _matches(m, filters)]
+        start = int(page_token or 0)
+        page_size = max(1, min(page_size or 100, 1000))
+        result = {'files': matched[start:start + page_size]}
+        if start + page_size < len(matched):
+            result['nextPageToken'] = str(start + page_size)
+        return result
+
+    def _read(self, file_id: str) -> bytes:
+        path = self._path_for(file_id)
+        if path.is_dir():
+            raise _http_error(403, 'fileNotDownloadable')
+        return path.read_bytes()
+
+    def _export(self, file_id: str, mime: str) -> bytes:
+        path = self._path_for(file_id)
+        if not path.name.endswith(DOC_SUFFIX):
+            raise _http_error(403, 'fileNotExportable')
+        if mime != 'text/plain':
+            raise _http_error(400, 'exportFormatNotSupported')
+        return path.read_bytes()
+
+    def _create(self, body: dict, media_body=None) -> dict:
+        body = body or {}
+        parents = body.get('parents') or [self.root_id]
+        folder = self._path_for(parents[0])
+        name = body.get('name') or 'Untitled'
+        mime = body.get('mimeType')
+        if mime == FOLDER_MIME:
+            path = folder / name
+            path.mkdir(parents=True, exist_ok=True)
+        else:
+            path = folder / (name + DOC_SUFFIX if mime == DOC_MIME else name)
+            data = b''
+            if media_body is not None:
+                data = media_body.getbytes(0, media_body.size())
+            path.write_bytes(data)
+        return self._metadata(path)
+
+    def _update(self, file_id: str, body: dict) -> dict:
+        path = self._path_for(file_id)
+        if (body or {}).get('name'):
+            with self._lock:
+                self._names[path] = body['name']
+        return self._metadata(path)
+
+
+def _parse_query(q: str) -> dict:
+    """Parse the subset of the Drive query language Oink uses, joined with ``and``."""
+    filters = {}
+    for clause in re.split(r'\s+and\s+', (q or '').strip()):
+        clause = clause.strip()
+        if not clause:
+            continue
+        m = re.match(r"^'([^']+)'\s+in\s+parents$", clause)
+        if m:
+            filters['parent'] = m.group(1)
+            continue
+        m = re.match(r"^name\s+contains\s+'([^']*)'$", clause)
+        if m:
+            filters['name_contains'] = m.group(1)
+            continue
+        m = re.match(r"^name\s*=\s*'([^']*)'$", clause)
+        if m:
+            filters['name'] = m.group(1)
+            continue
+        m = re.match(r"^mimeType\s*(=|!=)\s*'([^']*)'$", clause)
+        if m:
+            filters['mime_ne' if m.group(1) == '!=' else 'mime'] = m.group(2)
+            continue
+        if re.match(r'^trashed\s*=\s*(false|true)$', clause):
+            continue
+        raise _http_error(400, f'invalidQuery: {clause}')
+    return filters
+
+
+def _matches(meta: dict, filters: dict) -> bool:
+    if 'name_contains' in filters and filters['name_contains'].lower() not in meta['name'].lower():
+        return False
+    if 'name' in filters and meta['name'] != filters['name']:
+        return False
+    if 'mime' in filters and meta['mimeType'] != filters['mime']:
+        return False
+    if 'mime_ne' in filters and meta['mimeType'] == filters['mime_ne']:
+        return False
+    return True
+
+
+class _Files:
+    def __init__(self, backend: FakeDriveService):
+        self._backend = backend
+
+    def list(self, q: str = '', fields=None, pageSize: int = 100, pageToken: Optional[str] = None, **kwargs):
+        return _Request(self._backend, lambda: self._backend._list(q, pageSize, pageToken))
+
+    def get(self, fileId: str = None, fields=None, **kwargs):
+        return _Request(self._backend, lambda: self._backend._metadata(self._backend._path_for(fileId)))
+
+    def get_media(self, fileId: str = None, **kwargs):
+        http = _MediaHttp(self._backend, fileId) if httplib2 is not None else None
+        return _Request(
+            self._backend,
+            lambda: self._backend._read(fileId),
+            uri=f'https://www.googleapis.com/drive/v3/files/{fileId}?alt=media',
+            http=http,
+        )
+
+    def export(self, fileId: str = None, mimeType: str = 'text/plain', **kwargs):
+        return _Request(self._backend, lambda: self._backend._export(fileId, mimeType))
+
+    def create(self, body: dict = None, media_body=None, fields=None, **kwargs):
+        return _Request(self._backend, lambda: self._backend._create(body, media_body))
+
+    def update(self, fileId: str = None, body: dict = None, fields=None, **kwargs):
+        return _Request(self._backend, lambda: self._backend._update(fileId, body))
+
+
+class _Permissions:
+    def __init__(self, backend: FakeDriveService):
+        self._backend = backend
+
+    def create(self, fileId: str = None, body: dict = None, fields=None, **kwargs):
+        def run():
+            self._backend._path_for(fileId)
+            granted = self._backend.permissions_granted.setdefault(fileId, [])
+            granted.append(dict(body or {}))
+            return {'id': f'perm-{len(granted)}'}
+        return _Request(self._backend, run)
+
+
+class _Batch:
+    """Sequential stand-in for ``BatchHttpRequest``: per-request callbacks get (id, response, exception)."""
+
+    def __init__(self, callback=None):
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        request_id = request_id or str(len(self._requests) + 1)
+        self._requests.append((request_id, request, callback or self._callback))
+
+    def execute(self):
+        for request_id, request, callback in self._requests:
+            try:
+                response, exception = request.execute(), None
+            except Exception as e:
+                response, exception = None, e
+            if callback:
+                callback(request_id, response, exception)
+
+
+@lru_cache(maxsize=4)
+def _service_for(root: str, root_id: str, latency_ms: float, error_rate: float, rate_limit: int) -> FakeDriveService:
+    logger.info('Using fake Drive backend rooted at %s', root)
+    return FakeDriveService(root, root_id=root_id, latency_ms=latency_ms, error_rate=error_rate, rate_limit=rate_limit)
+
+
+def get_fake_service() -> FakeDriveService:
+    """Return the process-wide fake service for the current settings."""
+    return _service_for(
+        str(getattr(settings, 'DRIVE_FAKE_ROOT', '') or Path(settings.BASE_DIR) / 'fake_drive'),
+        getattr(settings, 'REPOSITORY_FOLDER_ID', '') or ROOT_ID,
+        float(getattr(settings, 'DRIVE_FAKE_LATENCY_MS', 0) or 0),
+        float(getattr(settings, 'DRIVE_FAKE_ERROR_RATE', 0) or 0),
+        int(getattr(settings, 'DRIVE_FAKE_RATE_LIMIT', 0) or 0),
+    )
@@ -0,0 +1,109 @@
+"""Warm pool of pre-created Drive folders for new packages.
+
+Creating a package's folder, sharing it and adding its ``article.aml`` doc
+takes several Drive round trips. ``replenish`` does that ahead of time, keeping
+``DRIVE_FOLDER_POOL_SIZE`` unclaimed folder + doc pairs (``DriveFolder`` rows)
+under ``REPOSITORY_FOLDER_ID``. ``claim`` hands the oldest one to a new package
+and renames it to the package slug with a single ``files.update`` call, so the
+folder and doc links are ready when the create request returns.
+"""
+import logging
+import threading
+import uuid
+from typing import Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import drive
+
+logger = logging.getLogger(__name__)
+
+NAME_PREFIX = 'oink-unclaimed-'
+# Folders whose rename fails (deleted or moved out of reach in Drive) are dropped and the next is tried
+CLAIM_ATTEMPTS = 3
+
+_replenish_lock = threading.Lock()
+
+
+def pool_size() -> int:
+    return max(0, int(getattr(settings, 'DRIVE_FOLDER_POOL_SIZE', 0) or 0))
+
+
+def _take(package):
+    """Atomically mark the oldest unclaimed folder as claimed by ``package``."""
+    from .models import DriveFolder
+
+    while True:
+        pk = DriveFolder.objects.filter(claimed_at__isnull=True).values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        # Conditional update: if another request took this row first, try the next one
+        if DriveFolder.objects.filter(pk=pk, claimed_at__isnull=True).update(claimed_at=timezone.now(), package=package):
+            return DriveFolder.objects.get(pk=pk)
+
+
+def claim(package):
+    """Give ``package`` a pooled folder renamed to its slug; None when the pool is empty."""
+    drive_settings = package._get_drive_settings()
+    for _ in range(CLAIM_ATTEMPTS):
+        folder = _take(package)
+        if folder is None:
+            return None
+        if drive.rename_drive_file(
+            folder.folder_id,
+            package.slug,
+            service_account_file=drive_settings['service_account_file'],
+            impersonate_user=drive_settings['impersonate_user'],
+        ):
+            logger.info('Claimed pooled Drive folder %s for %s', folder.folder_id, package.slug)
+            return folder
+        logger.warning('Dropping pooled Drive folder %s: rename failed', folder.folder_id)
+        folder.delete()
+    return None
+
+
+def replenish(target: Optional[int] = None) -> int:
+    """Create folders until ``target`` (default DRIVE_FOLDER_POOL_SIZE) are unclaimed.
+
+    Returns the number created; stops at the first Drive failure.
+    """
+    from .models import DriveFolder, Package
+
+    target = pool_size() if target is None else target
+    created = 0
+    with _replenish_lock:
+        missing = target - DriveFolder.objects.filter(claimed_at__isnull=True).count()
+        drive_settings = Package()._get_drive_settings()
+        for _ in range(max(0, missing)):
+            folder = drive.create_drive_folder(
+                NAME_PREFIX + uuid.uuid4().hex[:12],
+                parent_id=drive_settings['parent_id'],
+                service_account_file=drive_settings['service_account_file'],
+                impersonate_user=drive_settings['impersonate_user'],
+                share_public=drive_settings['share_public'],
+                share_domain=drive_settings['share_domain'],
+                share_role=drive_settings['share_role'],
+            )
+            if not (isinstance(folder, dict) and folder.get('id')):
+                break
+            doc = drive.create_google_doc_in_folder(
+                folder['id'],
+                title='article.aml',
+                service_account_file=drive_settings['service_account_file'],
+                impersonate_user=drive_settings['impersonate_user'],
+                share_role=drive_settings['share_role'],
+            )
+            if not doc:
+                # The folder is still usable: provisioning adds the doc when it is missing
+                logger.warning('Could not create article.aml in pooled folder %s', folder['id'])
+            DriveFolder.objects.create(
+                folder_id=folder['id'],
+                folder_url=folder.get('url') or f"https://drive.google.com/drive/folders/{folder['id']}",
+                doc_id=(doc or {}).get('id') or '',
+                doc_url=(doc or {}).get('url') or '',
+            )
+            created += 1
+    if created:
+        logger.info('Added %d folder(s) to the Drive folder pool', created)
+    return created
@@ -0,0 +1,115 @@
+"""``CompressedJSONField``: JSON stored as zlib-compressed bytes.
+
+Parsed AML (``PackageContent.data`` and every keyframe in ``PackageVersion.data``)
+is mostly prose plus the same few keys and block shapes over and over, and
+version history dominates the database. The field keeps the ``JSONField``
+interface (callers read and assign dicts) but stores compact JSON deflated with
+a preset dictionary (``zlib``'s ``zdict``) of AML keys, block structure and
+common newsroom text, so even short documents compress well.
+
+Stored values start with a format byte:
+
+- ``0x01``..: raw deflate with dictionary ``DICTIONARIES[byte]``;
+- anything else: plain UTF-8 JSON (values that do not shrink, and rows written
+  before the column was compressed; ``manage.py compress_json_fields`` rewrites
+  those).
+
+A dictionary must never change once rows use it: add a new version instead
+and make it ``CURRENT``.
+"""
+import json
+import zlib
+
+from django import forms
+from django.conf import settings
+from django.db import models
+
+_AML_V1 = (
+    b' the and of to in a that for is was on with said he she it as at by from his her they be this have'
+    b' has are were an not but which who will their would been more one about also after when students'
+    b' university UCLA Bruin Bruins Westwood campus Los Angeles California Pauley Pavilion Royce Hall'
+    b' according to the told the Daily Bruin in an interview Undergraduate Students Association Council'
+    b' Academic Senate UC Regents University of California fourth-year third-year second-year first-year'
+    b' \xe2\x80\x99s \xe2\x80\x9c \xe2\x80\x9d \xe2\x80\x94 \xe2\x80\x93 '
+    b'<a href=\\"https://dailybruin.com/</a> <a href=\\"https://www.</a><em></em><strong></strong><br>'
+    b'https://assets3.dailybruin.com/images/.jpg.jpeg.png.webp'
+    b'"_gridfs_aml":{"article.aml":"i'
+    b',"authortwitter":"","authoremail":"@dailybruin.com","articleType":"","covercred":"Daily Bruin",'
+    b'"authorbio":" is a contributor to the  is a Daily Bruin staff writer. is the  editor.",'
+    b'"headline":"","coverimg":"","coveralt":"","updated":"","excerpt":"",'
+    b'{"type":"pull","value":{"caption":"'
+    b'{"type":"image","value":{"alt":"","url":"https://assets3.dailybruin.com/images/","credit":"'
+    b'/Daily Bruin staff","caption":"'
+    b'"}},{"type":"text","value":"'
+    b'"},{"type":"text","value":"'
+    b'{"article.aml":{"author":"","content":[{"type":"text","value":"'
+)
+
+DICTIONARIES = {1: _AML_V1}
+CURRENT = 1
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def compress(value, level=None) -> bytes:
+    """Encode ``value`` for storage: deflated with the current dictionary, or plain JSON when that is smaller."""
+    raw = _dumps(value)
+    if level is None:
+        level = int(getattr(settings, 'COMPRESSED_JSON_LEVEL', 6))
+    packer = zlib.compressobj(level, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, DICTIONARIES[CURRENT])
+    packed = bytes([CURRENT]) + packer.compress(raw) + packer.flush()
+    return packed if len(packed) < len(raw) else raw
+
+
+def decompress(data):
+    """Decode a stored value (any dictionary version, or plain JSON)."""
+    data = bytes(data)
+    if not data:
+        return None
+    dictionary = DICTIONARIES.get(data[0])
+    if dictionary is not None:
+        unpacker = zlib.decompressobj(-15, dictionary)
+        data = unpacker.decompress(data[1:]) + unpacker.flush()
+    return json.loads(data.decode('utf-8'))
+
+
+def is_current(data) -> bool:
+    """Whether a stored value needs no rewrite: current dictionary, or plain JSON too small to shrink."""
+    data = bytes(data)
+    if not data or data[0] == CURRENT:
+        return True
+    if data[0] in DICTIONARIES:
+        return False
+    return len(compress(decompress(data))) >= len(data)
+
+
+class CompressedJSONField(models.BinaryField):
+    """A ``JSONField`` stored compressed (see module docstring). No JSON key lookups."""
+    description = 'JSON (zlib compressed)'
+    empty_values = [None, '', [], (), {}]
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('editable', True)
+        super().__init__(*args, **kwargs)
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else decompress(value)
+
+    def to_python(self, value):
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return decompress(value)
+        if isinstance(value, str):
+            # Serialized fixtures (value_to_string)
+            return json.loads(value)
+        return value
+
+    def get_prep_value(self, value):
+        return None if value is None else compress(value)
+
+    def value_to_string(self, obj):
+        return json.dumps(self.value_from_object(obj), ensure_ascii=False)
+
+    def formfield(self, **kwargs):
+        return models.Field.formfield(self, **{'form_class': forms.JSONField, **kwargs})
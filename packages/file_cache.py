@@ -0,0 +1,164 @@
+"""Local disk cache for served files, answered without copying bytes through Python.
+
+``/files/<id>/`` and the Drive image proxy normally build ``HttpResponse(data)``:
+the worker reads every byte from Mongo or Drive and writes it to the socket.
+With ``FILE_DISK_CACHE`` set, the original is written once to
+``FILE_DISK_CACHE_DIR`` and every response points at that file instead:
+
+- ``sendfile``: a ``FileResponse``, which WSGI servers (gunicorn) send with
+  ``sendfile(2)`` through ``wsgi.file_wrapper``;
+- ``x-accel``: an empty response with ``X-Accel-Redirect:
+  FILE_DISK_CACHE_ACCEL_PREFIX/<path>`` for nginx to serve from an ``internal``
+  location aliased to the cache directory (best choice under ASGI);
+- ``x-sendfile``: an ``X-Sendfile: <absolute path>`` header (Apache
+  mod_xsendfile, lighttpd).
+
+Entries are keyed by an immutable source key (a stored file id, a Drive file id
+plus revision) hashed into ``<dir>/<2 hex>/<sha256>``, with a ``.json`` sidecar
+holding the content type and filename so hits need no Mongo or Drive lookup.
+Files are written atomically and touched on every hit; once the cache outgrows
+``FILE_DISK_CACHE_MAX_BYTES`` the least recently used entries are removed (checked
+every ``PRUNE_EVERY`` writes). A hit can still lose its file to a concurrent prune,
+so ``response`` returns None and callers serve the file as on a miss.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import namedtuple
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+MODES = ('sendfile', 'x-accel', 'x-sendfile')
+PRUNE_EVERY = 200
+
+Entry = namedtuple('Entry', 'path content_type filename')
+
+_writes = {'count': 0}
+_prune_lock = threading.Lock()
+
+
+def mode() -> str:
+    value = (getattr(settings, 'FILE_DISK_CACHE', '') or '').strip().lower()
+    return value if value in MODES else ''
+
+
+def enabled() -> bool:
+    return bool(mode())
+
+
+def _root() -> Path:
+    return Path(getattr(settings, 'FILE_DISK_CACHE_DIR', '') or Path(tempfile.gettempdir()) / 'oink-file-cache')
+
+
+def _path(key: str) -> Path:
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    return _root() / digest[:2] / digest
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def get(key: str) -> Optional[Entry]:
+    """The cached file for ``key``, or None; a hit marks the file as recently used."""
+    path = _path(key)
+    try:
+        meta = json.loads(path.with_suffix('.json').read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    except OSError:
+        pass
+    return Entry(path, meta.get('content_type') or 'application/octet-stream', meta.get('filename') or '')
+
+
+def put(key: str, data: bytes, content_type: str, filename: str = '') -> Optional[Entry]:
+    """Write ``data`` for ``key``; None (logged) when the cache directory is not writable."""
+    path = _path(key)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Data first: a sidecar is only ever visible next to a complete file
+        _write_atomic(path, data)
+        _write_atomic(path.with_suffix('.json'), json.dumps(
+            {'content_type': content_type, 'filename': filename}).encode('utf-8'))
+    except OSError:
+        logger.exception('Could not write %s to the file cache', key)
+        return None
+    _writes['count'] += 1
+    if _writes['count'] % PRUNE_EVERY == 0:
+        prune()
+    return Entry(path, content_type, filename)
+
+
+def response(entry: Entry) -> Optional[HttpResponse]:
+    """A response for ``entry`` that leaves sending the bytes to the server.
+
+    None when the file was pruned since ``get``; serve it as a miss instead.
+    """
+    current = mode()
+    if current == 'x-accel':
+        prefix = (getattr(settings, 'FILE_DISK_CACHE_ACCEL_PREFIX', '') or '/_file_cache/').rstrip('/')
+        response = HttpResponse(content_type=entry.content_type)
+        response['X-Accel-Redirect'] = f"{prefix}/{entry.path.relative_to(_root()).as_posix()}"
+        return response
+    if current == 'x-sendfile':
+        response = HttpResponse(content_type=entry.content_type)
+        response['X-Sendfile'] = str(entry.path.resolve())
+        return response
+    try:
+        fh = open(entry.path, 'rb')
+    except FileNotFoundError:
+        return None
+    return FileResponse(fh, content_type=entry.content_type)
+
+
+def prune(max_bytes: Optional[int] = None) -> int:
+    """Remove the least recently used entries until the cache fits ``max_bytes``; returns how many were removed."""
+    if max_bytes is None:
+        max_bytes = int(getattr(settings, 'FILE_DISK_CACHE_MAX_BYTES', 0) or 0)
+    if max_bytes <= 0 or not _prune_lock.acquire(blocking=False):
+        return 0
+    try:
+        files = []
+        for path in _root().glob('*/*'):
+            if path.suffix == '.json' or path.name.startswith('.tmp-'):
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, path in sorted(files, key=lambda f: f[0]):
+            if total <= max_bytes:
+                break
+            for victim in (path.with_suffix('.json'), path):
+                try:
+                    victim.unlink()
+                except FileNotFoundError:
+                    pass
+            total -= size
+            removed += 1
+        return removed
+    finally:
+        _prune_lock.release()
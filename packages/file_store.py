@@ -1,15 +1,38 @@
 from __future__ import annotations
 
+import hashlib
 import io
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 from django.conf import settings
-from bson import ObjectId
+from bson import Binary, ObjectId
+from gridfs.errors import NoFile
 
 from oink_project.mongo import get_bucket, get_collection
 
+try:
+    import zstandard
+except ImportError:  # inline blobs are stored uncompressed
+    zstandard = None
+
 # This new code is lightweight helper functions around GridFS so models/views can store and retrieve files easily
+#
+# Files up to MONGODB_INLINE_MAX_BYTES are not put in GridFS (a files document plus chunk
+# documents, two queries per read) but stored whole in one document of the inline collection
+# (MONGODB_INLINE_COLLECTION, default "<bucket>.inline"), zstd-compressed when that pays off.
+# Their ids are "i" + the ObjectId, so readers know where to look without a second query;
+# open_file() returns a GridOut-like object for either kind, and /files/<id>/ serves both.
+
+logger = logging.getLogger(__name__)
+
+INLINE_PREFIX = "i"
+# Content types that are already compressed: not worth a zstd pass
+_PRECOMPRESSED = ("image/jpeg", "image/png", "image/webp", "image/gif", "application/zip", "application/gzip")
 
 _ASSET_INDEX_INITIALIZED = False
 
@@ -29,6 +52,121 @@ def _ensure_asset_indexes() -> None:
     _ASSET_INDEX_INITIALIZED = True
 
 
+_VARIANT_INDEX_INITIALIZED = False
+
+
+def _ensure_variant_index() -> None:
+    """Index image variants by key in the bucket's files and inline collections (see image_variants)."""
+    global _VARIANT_INDEX_INITIALIZED
+    if _VARIANT_INDEX_INITIALIZED:
+        return
+    try:
+        bucket_name = os.getenv("MONGODB_BUCKET") or "fs"
+        get_collection(f"{bucket_name}.files").create_index("metadata.variantKey", sparse=True)
+        _inline_collection().create_index("metadata.variantKey", sparse=True)
+    except Exception:
+        return
+    _VARIANT_INDEX_INITIALIZED = True
+
+
+def inline_collection_name() -> str:
+    bucket_name = os.getenv("MONGODB_BUCKET") or "fs"
+    return getattr(settings, "MONGODB_INLINE_COLLECTION", "") or f"{bucket_name}.inline"
+
+
+def _inline_collection():
+    return get_collection(inline_collection_name())
+
+
+def _inline_max_bytes() -> int:
+    return max(0, int(getattr(settings, "MONGODB_INLINE_MAX_BYTES", 0) or 0))
+
+
+def is_inline(file_id: str) -> bool:
+    return file_id.startswith(INLINE_PREFIX)
+
+
+def parse_id(file_id: str) -> Tuple[bool, ObjectId]:
+    """``(inline, ObjectId)`` for a stored file id; raises InvalidId for anything else."""
+    inline = is_inline(file_id)
+    return inline, ObjectId(file_id[len(INLINE_PREFIX):] if inline else file_id)
+
+
+def _encode(data: bytes, content_type: str) -> Tuple[bytes, Optional[str]]:
+    if zstandard is None or not getattr(settings, "MONGODB_INLINE_COMPRESSION", True):
+        return data, None
+    if content_type.split(";")[0].strip().lower() in _PRECOMPRESSED:
+        return data, None
+    packed = zstandard.ZstdCompressor(level=3).compress(data)
+    # Keep the raw bytes unless compression saves at least a tenth
+    if len(packed) > len(data) * 0.9:
+        return data, None
+    return packed, "zstd"
+
+
+def _store_inline(name: str, data: bytes, meta: Dict[str, str]) -> str:
+    payload, encoding = _encode(data, meta["contentType"])
+    doc = {
+        "filename": name,
+        "length": len(data),
+        "uploadDate": datetime.utcnow(),
+        "metadata": meta,
+        "data": Binary(payload),
+    }
+    if encoding:
+        doc["encoding"] = encoding
+    return INLINE_PREFIX + str(_inline_collection().insert_one(doc).inserted_id)
+
+
+class InlineFile:
+    """A file from the inline collection, read like a GridOut (``read``, ``readchunk``, ``close``)."""
+
+    def __init__(self, doc: Dict):
+        self._id = doc["_id"]
+        self.filename = doc.get("filename")
+        self.length = doc.get("length", 0)
+        self.upload_date = doc.get("uploadDate")
+        self.metadata = doc.get("metadata") or {}
+        self._payload = bytes(doc.get("data") or b"")
+        self._encoding = doc.get("encoding")
+        self._consumed = False
+
+    def read(self) -> bytes:
+        if self._consumed:
+            return b""
+        self._consumed = True
+        if self._encoding == "zstd":
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read compressed inline files")
+            return zstandard.ZstdDecompressor().decompress(self._payload)
+        return self._payload
+
+    readchunk = read
+
+    def close(self) -> None:
+        self._consumed = True
+
+
+def open_file(file_id: str):
+    """Open a stored file (inline or GridFS) for reading; raises NoFile when it does not exist."""
+    inline, oid = parse_id(file_id)
+    if inline:
+        doc = _inline_collection().find_one({"_id": oid})
+        if doc is None:
+            raise NoFile(f"no inline file with _id {oid}")
+        return InlineFile(doc)
+    return get_bucket().open_download_stream(oid)
+
+
+def find_one(filter: Dict):
+    """Oldest stored file (inline first, then GridFS) matching ``filter`` on the files documents."""
+    for doc in _inline_collection().find(filter).sort("uploadDate", 1).limit(1):
+        return InlineFile(doc)
+    for grid_out in get_bucket().find(filter).sort("uploadDate", 1).limit(1):
+        return grid_out
+    return None
+
+
 def store_bytes(
     name: str,
     content_type: str,
@@ -39,8 +177,75 @@ def store_bytes(
     extra_metadata: Optional[Dict[str, str]] = None,
 ) -> str:
     
-    """ Store bytes in GridFS and return the file ObjectId as a string """
-    bucket = get_bucket()
+    """ Store bytes (inline when small, else in GridFS) and return the file id as a string """
+    meta = _metadata(content_type, slug, asset_type, extra_metadata)
+    return _store(get_bucket(), name, data, meta)
+
+
+def _store(bucket, name: str, data: bytes, meta: Dict[str, str]) -> str:
+    limit = _inline_max_bytes()
+    if limit and len(data) <= limit:
+        return _store_inline(name, data, meta)
+    return str(bucket.upload_from_stream(name, io.BytesIO(data), metadata=meta))
+
+
+def store_stream(
+    name: str,
+    content_type: str,
+    chunks: Iterable[bytes],
+    *,
+    slug: Optional[str] = None,
+    asset_type: Optional[str] = None,
+    extra_metadata: Optional[Dict[str, str]] = None,
+) -> str:
+    """Store an iterable of byte chunks in GridFS without joining them; returns the file id.
+
+    Chunks are written to ``open_upload_stream`` as they arrive and hashed on the
+    way, so only one chunk is held at a time; the SHA-256 lands in
+    ``metadata.sha256``. A failure part-way removes the partial upload.
+    """
+    meta = _metadata(content_type, slug, asset_type, extra_metadata)
+    return _upload_chunks(get_bucket(), name, chunks, meta)
+
+
+def _upload_chunks(bucket, name: str, chunks: Iterable[bytes], meta: Dict[str, str]) -> str:
+    digest = hashlib.sha256()
+    chunks = iter(chunks)
+    # Buffer up to the inline limit: a stream that ends within it is stored inline
+    limit = _inline_max_bytes()
+    head, size = [], 0
+    if limit:
+        for chunk in chunks:
+            digest.update(chunk)
+            head.append(chunk)
+            size += len(chunk)
+            if size > limit:
+                break
+        else:
+            return _store_inline(name, b"".join(head), dict(meta, sha256=digest.hexdigest()))
+
+    grid_in = bucket.open_upload_stream(name, metadata=meta)
+    try:
+        for chunk in head:
+            grid_in.write(chunk)
+        for chunk in chunks:
+            digest.update(chunk)
+            grid_in.write(chunk)
+        # Unknown attributes on GridIn are written to the files document on close()
+        grid_in.metadata = dict(meta, sha256=digest.hexdigest())
+        grid_in.close()
+    except BaseException:
+        grid_in.abort()
+        raise
+    return str(grid_in._id)
+
+
+def _metadata(
+    content_type: str,
+    slug: Optional[str],
+    asset_type: Optional[str],
+    extra_metadata: Optional[Dict[str, str]],
+) -> Dict[str, str]:
     meta = {"contentType": content_type or "application/octet-stream"}
     if slug:
         meta["slug"] = slug
@@ -50,8 +255,7 @@ def store_bytes(
         for key, value in extra_metadata.items():
             if value is not None:
                 meta[key] = value
-    file_id = bucket.upload_from_stream(name, io.BytesIO(data), metadata=meta)
-    return str(file_id)
+    return meta
 
 
 def store_text(
@@ -77,15 +281,78 @@ def store_text(
     )
 
 
-def read_file(file_id: str) -> Tuple[bytes, str, str]:
-    
-    """ Read a GridFS file and return (data, content_type, filename) """
+def store_many(
+    items: Iterable[Tuple[str, Union[bytes, Iterable[bytes]], Dict[str, str]]],
+    *,
+    slug: Optional[str] = None,
+    update_index: bool = False,
+    aml_assets: Optional[List[Dict[str, str]]] = None,
+    max_workers: Optional[int] = None,
+) -> List[Dict[str, str]]:
+    """Upload many files to GridFS concurrently and return their asset index entries.
+
+    ``items`` yields ``(name, data, metadata)``; metadata uses the keys ``store_bytes``
+    writes (``contentType``, ``assetType``, ``source``, ``sourceId``, ...). It may be a
+    generator that downloads lazily: it is consumed on the calling thread while up to
+    ``max_workers`` uploads (default MONGODB_UPLOAD_WORKERS) run on the pymongo pool
+    through one shared bucket, and at most twice that many payloads are held at once.
+    ``data`` may also be an iterable of byte chunks (e.g. ``transfer.iter_drive_media``);
+    it is then consumed on the upload thread and streamed as in ``store_stream``.
+
+    With ``update_index`` the ``package_assets`` entry for ``slug`` is rewritten in the
+    same pass with the uploaded files plus ``aml_assets``. Failed uploads are logged
+    and left out of the result.
+    """
     bucket = get_bucket()
-    oid = ObjectId(file_id)
+    workers = max(1, max_workers or getattr(settings, "MONGODB_UPLOAD_WORKERS", 4) or 1)
+
+    def upload(name: str, data: Union[bytes, Iterable[bytes]], metadata: Dict[str, str]) -> Dict[str, str]:
+        meta = _metadata(metadata.get("contentType"), slug or metadata.get("slug"), metadata.get("assetType"), metadata)
+        if isinstance(data, (bytes, bytearray)):
+            file_id = _store(bucket, name, data, meta)
+        else:
+            file_id = _upload_chunks(bucket, name, data, meta)
+        return {
+            "name": name,
+            "file_id": file_id,
+            "asset_type": meta.get("assetType", "image"),
+            "content_type": meta["contentType"],
+            "source": meta.get("source", "drive"),
+            "source_id": meta.get("sourceId"),
+        }
+
+    assets: List[Dict[str, str]] = []
+
+    def collect(future, name):
+        try:
+            assets.append(future.result())
+        except Exception:
+            logger.exception("GridFS upload failed for %s", name)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gridfs-upload") as pool:
+        pending = deque()
+        for name, data, metadata in items:
+            pending.append((pool.submit(upload, name, data, metadata or {}), name))
+            if len(pending) >= workers * 2:
+                collect(*pending.popleft())
+        while pending:
+            collect(*pending.popleft())
+
+    if update_index and slug:
+        update_package_asset_index(
+            slug,
+            aml_assets=list(aml_assets or []) + [a for a in assets if a["asset_type"] == "aml"],
+            image_assets=[a for a in assets if a["asset_type"] != "aml"],
+        )
+    return assets
+
+
+def read_file(file_id: str) -> Tuple[bytes, str, str]:
     
+    """ Read a stored file and return (data, content_type, filename) """
     """ Download to memory for large files, stream in chunks in a view """
     out = io.BytesIO()
-    stream = bucket.open_download_stream(oid)
+    stream = open_file(file_id)
     
     """ Here we read the file in chunks to avoid loading large files entirely into memory """
     try:
@@ -101,6 +368,41 @@ def read_file(file_id: str) -> Tuple[bytes, str, str]:
     return data, content_type, filename
 
 
+def file_info(file_ids: Iterable[str]) -> Dict[str, Dict]:
+    """Return ``{file_id: {"length", "uploadDate"}}`` for existing files (one query per kind)."""
+    oids = {True: [], False: []}
+    for file_id in file_ids:
+        try:
+            inline, oid = parse_id(file_id)
+        except Exception:
+            continue
+        oids[inline].append(oid)
+    bucket_name = os.getenv("MONGODB_BUCKET") or "fs"
+    info = {}
+    for inline, collection, prefix in (
+        (False, lambda: get_collection(f"{bucket_name}.files"), ""),
+        (True, _inline_collection, INLINE_PREFIX),
+    ):
+        if not oids[inline]:
+            continue
+        for doc in collection().find({"_id": {"$in": oids[inline]}}, {"length": 1, "uploadDate": 1}):
+            info[prefix + str(doc["_id"])] = {"length": doc.get("length", 0), "uploadDate": doc.get("uploadDate")}
+    return info
+
+
+def iter_chunks(file_id: str) -> Iterable[bytes]:
+    """Yield a stored file one chunk at a time (no full-file buffer for GridFS files)."""
+    stream = open_file(file_id)
+    try:
+        while True:
+            chunk = stream.readchunk()
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        stream.close()
+
+
 def update_package_asset_index(
     slug: str,
     *,
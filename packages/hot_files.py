@@ -0,0 +1,87 @@
+"""In-process LRU cache of hot stored files for ``/files/<id>/``.
+
+A few cover images account for most file requests. Stored files never change
+once written (an id always names the same bytes), so this cache needs no
+invalidation: ``serve_gridfs_file`` keeps recently served files in memory up to
+a total of ``FILE_HOT_CACHE_BYTES`` (0 disables it) and evicts the least
+recently used ones beyond that. Files larger than
+``FILE_HOT_CACHE_MAX_OBJECT_BYTES`` are never cached, so one big download
+cannot flush the hot set.
+
+Each worker process has its own cache. ``stats()`` reports hits, misses,
+evictions and the hit rate; the counts are also logged every
+``FILE_HOT_CACHE_LOG_EVERY`` lookups.
+"""
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CachedFile = namedtuple('CachedFile', 'data content_type filename')
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # file id -> CachedFile, least recently used first
+_state = {'bytes': 0, 'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def _budget() -> int:
+    return max(0, int(getattr(settings, 'FILE_HOT_CACHE_BYTES', 0) or 0))
+
+
+def _max_object() -> int:
+    return max(0, int(getattr(settings, 'FILE_HOT_CACHE_MAX_OBJECT_BYTES', 0) or 0))
+
+
+def get(file_id: str) -> Optional[CachedFile]:
+    if not _budget():
+        return None
+    with _lock:
+        entry = _entries.get(file_id)
+        if entry is None:
+            _state['misses'] += 1
+        else:
+            _entries.move_to_end(file_id)
+            _state['hits'] += 1
+        lookups = _state['hits'] + _state['misses']
+    every = int(getattr(settings, 'FILE_HOT_CACHE_LOG_EVERY', 0) or 0)
+    if every and lookups % every == 0:
+        logger.info('Hot file cache: %s', stats())
+    return entry
+
+
+def put(file_id: str, data: bytes, content_type: str, filename: str) -> None:
+    budget = _budget()
+    size = len(data)
+    if not budget or size > min(budget, _max_object() or budget):
+        return
+    with _lock:
+        previous = _entries.pop(file_id, None)
+        if previous is not None:
+            _state['bytes'] -= len(previous.data)
+        _entries[file_id] = CachedFile(bytes(data), content_type, filename)
+        _state['bytes'] += size
+        while _state['bytes'] > budget:
+            _, evicted = _entries.popitem(last=False)
+            _state['bytes'] -= len(evicted.data)
+            _state['evictions'] += 1
+
+
+def stats() -> dict:
+    with _lock:
+        lookups = _state['hits'] + _state['misses']
+        return dict(
+            _state,
+            entries=len(_entries),
+            budget=_budget(),
+            hit_rate=round(_state['hits'] / lookups, 4) if lookups else 0.0,
+        )
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+        _state.update(bytes=0, hits=0, misses=0, evictions=0)
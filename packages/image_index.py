@@ -0,0 +1,119 @@
+"""Package images as ``PackageImage`` rows.
+
+``Package.images`` keeps the JSON payload the API has always returned: a
+``gdrive`` and a ``gridfs`` list describing the same files, merged by file name
+whenever it is read. Each fetch also writes one ``PackageImage`` per image with
+the Drive file id, stored file id, S3 key, Drive md5 and metadata together, in
+Drive listing order. That way the detail/fetch responses read ready-made rows,
+the image proxy resolves a Drive file id, and a fetch finds an already stored
+copy of the same bytes (any package) with an indexed query.
+"""
+import logging
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import FilteredRelation, Q
+
+from . import file_store, image_meta
+
+logger = logging.getLogger(__name__)
+
+_PROXY_ID = re.compile(r'/image/([^/]+)/?$')
+
+
+def _copy_metadata(item: dict, row: dict) -> None:
+    if item.get('hash'):
+        row['content_hash'] = item['hash']
+    for key in image_meta.FIELDS:
+        if item.get(key) is not None:
+            row[key] = item[key]
+
+
+def row_fields(images, extra: Optional[Dict[str, dict]] = None) -> List[dict]:
+    """``PackageImage`` field values for an ``images`` payload, in display order.
+
+    Drive and stored entries with the same file name become one row (the rule
+    ``_format_images`` applies); ``extra`` adds fields per Drive file id (content
+    type, md5, S3 key known at fetch time).
+    """
+    if not isinstance(images, dict):
+        return []
+    rows = {}  # name -> fields
+    for item in images.get('gdrive') or []:
+        name = item.get('name')
+        if not name:
+            continue
+        row = rows.setdefault(name, {'name': name})
+        match = _PROXY_ID.search(item.get('url') or '')
+        if match:
+            row['drive_file_id'] = match.group(1)
+        _copy_metadata(item, row)
+    for item in images.get('gridfs') or []:
+        name = item.get('name')
+        if not name or not item.get('id'):
+            continue
+        row = rows.setdefault(name, {'name': name})
+        row['gridfs_id'] = item['id']
+        if item.get('content_type'):
+            row['content_type'] = item['content_type']
+        _copy_metadata(item, row)
+
+    result = []
+    for order, row in enumerate(rows.values()):
+        row['order'] = order
+        row.update({k: v for k, v in ((extra or {}).get(row.get('drive_file_id')) or {}).items() if v})
+        result.append(row)
+    return result
+
+
+def replace(package, images, extra: Optional[Dict[str, dict]] = None) -> List:
+    """Rewrite ``package``'s rows from its ``images`` payload in one transaction."""
+    from .models import PackageImage
+    rows = [PackageImage(package=package, **fields) for fields in row_fields(images, extra)]
+    with transaction.atomic():
+        PackageImage.objects.filter(package=package).delete()
+        PackageImage.objects.bulk_create(rows)
+    return rows
+
+
+def stored_copies(hashes: Iterable[str]) -> Dict[str, str]:
+    """``{md5: stored file id}`` for hashes some package already has in the file store.
+
+    Rows are only trusted when the stored file still exists.
+    """
+    from .models import PackageImage
+    hashes = {h for h in hashes if h}
+    if not hashes:
+        return {}
+    found = dict(
+        PackageImage.objects.filter(content_hash__in=hashes)
+        .exclude(gridfs_id='')
+        .values_list('content_hash', 'gridfs_id')
+    )
+    if not found:
+        return {}
+    try:
+        existing = file_store.file_info(found.values())
+    except Exception:
+        logger.exception('Could not check stored copies of %d image(s)', len(found))
+        return {}
+    return {md5: file_id for md5, file_id in found.items() if file_id in existing}
+
+
+def lookup(slug: str, file_id: str) -> Tuple[bool, Optional[dict]]:
+    """(package exists, Drive metadata as ``DRIVE_IMAGE_FIELDS`` for an image recorded at the
+    last fetch, or None) in one query: the package row left-joined to its row for ``file_id``."""
+    from .models import Package
+    found = (
+        Package.objects.filter(slug=slug)
+        .annotate(image=FilteredRelation('package_images', condition=Q(package_images__drive_file_id=file_id)))
+        .values_list('image__name', 'image__content_type', 'image__content_hash')
+        .order_by()[:1]
+    )
+    if not found:
+        return False, None
+    name, content_type, content_hash = found[0]
+    if not content_type or not content_hash:
+        return True, None
+    return True, {'mimeType': content_type, 'name': name, 'md5Checksum': content_hash}
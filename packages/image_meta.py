@@ -0,0 +1,164 @@
+"""Image metadata recorded at fetch time: width, height, bytes, dominant colour, LQIP.
+
+Metadata is keyed by content hash (the Drive ``md5Checksum``, which the crawl
+already lists) and computed at most once per image content: fetch reuses the
+entries already on the package, then the shared ``IMAGE_METADATA_COLLECTION``
+cache in MongoDB (when the file store is enabled), and only renders the rest
+in the image process pool. In GridFS mode the bytes are captured from the
+download that is being streamed into GridFS anyway; otherwise missing images
+are downloaded just for this, several at a time. A queued job holds the whole
+original, so at most ``IMAGE_METADATA_MAX_IN_FLIGHT`` are queued or running per
+fetch; further submissions wait for one to finish.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+
+from django.conf import settings
+
+from . import image_pool
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('width', 'height', 'bytes', 'color', 'lqip')
+
+
+def enabled() -> bool:
+    return bool(getattr(settings, 'IMAGE_METADATA_ENABLED', True))
+
+
+def max_in_flight() -> int:
+    return max(1, int(getattr(settings, 'IMAGE_METADATA_MAX_IN_FLIGHT', 4) or 1))
+
+
+def _collection():
+    if not getattr(settings, 'MONGODB_FILESTORE_ENABLED', False):
+        return None
+    try:
+        from oink_project.mongo import get_collection
+        return get_collection(getattr(settings, 'IMAGE_METADATA_COLLECTION', 'image_metadata'))
+    except Exception:
+        logger.exception('Image metadata cache is unavailable')
+        return None
+
+
+def _known(images) -> Dict[str, dict]:
+    """Metadata already stored on a package's ``images`` JSON, by hash."""
+    known = {}
+    if isinstance(images, dict):
+        for entry in (images.get('gdrive') or []) + (images.get('gridfs') or []):
+            if entry.get('hash') and all(k in entry for k in FIELDS):
+                known[entry['hash']] = {k: entry[k] for k in FIELDS}
+    return known
+
+
+class _Capture:
+    """``transfer.tee`` writer that hands the complete image to the pool on close."""
+
+    def __init__(self, collector: 'MetadataCollector', key: str):
+        self._collector = collector
+        self._key = key
+        self._chunks = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(data)
+        return len(data)
+
+    def close(self) -> None:
+        self._collector.submit(self._key, b''.join(self._chunks))
+        self._chunks = []
+
+    def abort(self) -> None:
+        self._chunks = []
+
+
+class MetadataCollector:
+    """Collects image metadata for one fetch."""
+
+    def __init__(self, previous_images=None):
+        self._lqip_size = int(getattr(settings, 'IMAGE_LQIP_SIZE', 16) or 16)
+        self._known = _known(previous_images)
+        self._futures = {}
+        self._new = set()
+        self._slots = threading.BoundedSemaphore(max_in_flight())
+
+    def prime(self, keys: Iterable[str]) -> None:
+        """Load cached metadata for ``keys`` from MongoDB in one query."""
+        missing = [k for k in set(keys) if k and k not in self._known]
+        collection = _collection() if missing else None
+        if collection is None:
+            return
+        try:
+            for doc in collection.find({'_id': {'$in': missing}}):
+                self._known[doc['_id']] = {k: doc.get(k) for k in FIELDS}
+        except Exception:
+            logger.exception('Could not read the image metadata cache')
+
+    def needs(self, key: Optional[str]) -> bool:
+        return bool(key) and key not in self._known and key not in self._futures
+
+    def capture(self, key: Optional[str]) -> Optional[_Capture]:
+        """A tee writer for a download of ``key``, or None when it is already known."""
+        return _Capture(self, key) if self.needs(key) else None
+
+    def submit(self, key: str, data: bytes) -> None:
+        """Queue ``data`` for rendering, waiting while ``max_in_flight()`` jobs are pending."""
+        if not self.needs(key):
+            return
+        self._slots.acquire()
+        try:
+            future = image_pool.submit(image_pool.image_info, data, self._lqip_size)
+        except Exception:
+            self._slots.release()
+            raise
+        self._futures[key] = future
+        future.add_done_callback(lambda _: self._slots.release())
+
+    def fetch_missing(self, items: Iterable[tuple], read: Callable[[str], bytes], max_workers: int = 4) -> None:
+        """Download and submit every ``(key, file_id)`` not known or captured yet."""
+        todo = [(key, fid) for key, fid in items if self.needs(key)]
+        if not todo:
+            return
+
+        def load(item):
+            key, fid = item
+            try:
+                self.submit(key, read(fid))
+            except Exception:
+                logger.warning('Could not download %s for image metadata', fid, exc_info=True)
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='image-meta') as pool:
+            list(pool.map(load, todo))
+
+    def results(self) -> Dict[str, dict]:
+        """Wait for pending work, cache new entries and return ``{hash: metadata}``."""
+        for key, future in list(self._futures.items()):
+            try:
+                self._known[key] = future.result()
+                self._new.add(key)
+            except Exception:
+                logger.warning('Could not read image metadata for %s', key, exc_info=True)
+        self._futures = {}
+        collection = _collection() if self._new else None
+        if collection is not None:
+            # New keys were missing at prime(); a concurrent fetch may have added some since,
+            # so duplicates are expected and ignored (same content, same metadata).
+            from pymongo.errors import BulkWriteError
+            try:
+                collection.insert_many([dict(self._known[k], _id=k) for k in self._new], ordered=False)
+            except BulkWriteError:
+                pass
+            except Exception:
+                logger.exception('Could not update the image metadata cache')
+        self._new = set()
+        return dict(self._known)
+
+
+def annotate(entry: dict, key: Optional[str], metadata: Dict[str, dict]) -> dict:
+    """Add ``hash`` and the metadata fields for ``key`` to an images JSON entry."""
+    info = metadata.get(key) if key else None
+    if info:
+        entry['hash'] = key
+        entry.update(info)
+    return entry
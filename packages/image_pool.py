@@ -0,0 +1,199 @@
+"""Process pool for CPU-bound Pillow work (decode, resize, encode).
+
+Resizes used to run on the calling thread one image at a time, so image-heavy
+packages kept a single core busy. ``submit_resize`` / ``resize_many`` hand the
+work to a shared ``ProcessPoolExecutor`` with ``IMAGE_POOL_WORKERS`` processes
+(0 runs inline). Each worker runs one task at a time under an address-space
+limit of ``IMAGE_POOL_MEMORY_LIMIT_MB`` and refuses images above
+``IMAGE_MAX_PIXELS``, so one oversized upload fails its own task with a
+``MemoryError`` / ``DecompressionBombError`` instead of taking the host down.
+Workers are recycled after ``IMAGE_POOL_MAX_TASKS_PER_CHILD`` tasks.
+
+Task functions here must stay importable without Django settings: workers are
+started with ``forkserver`` (or ``spawn``) and only import this module.
+"""
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Max dimension for resized images (same as Kerckhoff)
+MAX_IMAGE_SIZE = 1024
+JPEG_QUALITY = 85
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+# -- worker side -----------------------------------------------------------------------------
+
+def _init_worker(memory_limit_bytes: int, max_pixels: int) -> None:
+    if memory_limit_bytes:
+        try:
+            import resource
+            _, hard = resource.getrlimit(resource.RLIMIT_AS)
+            limit = memory_limit_bytes if hard == resource.RLIM_INFINITY else min(memory_limit_bytes, hard)
+            resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+        except Exception:
+            pass
+    if max_pixels:
+        from PIL import Image
+        Image.MAX_IMAGE_PIXELS = max_pixels
+
+
+def resize_bytes(data: bytes, max_size: int = MAX_IMAGE_SIZE, fmt: str = 'JPEG', quality: int = JPEG_QUALITY) -> bytes:
+    """Re-encode ``data`` as ``fmt`` so no side exceeds ``max_size``.
+
+    Runs in a pool worker; raises on undecodable or oversized input.
+    """
+    return fit_bytes(data, max_size, max_size, fmt, quality)
+
+
+def fit_bytes(data: bytes, width: Optional[int], height: Optional[int], fmt: str = 'JPEG',
+              quality: int = JPEG_QUALITY) -> bytes:
+    """Re-encode ``data`` as ``fmt``, scaled down to fit within ``width`` x ``height``.
+
+    Either bound may be None (unbounded); images are never scaled up.
+    """
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(data))
+    w, h = img.size
+    scale = min(width / w if width else 1.0, height / h if height else 1.0, 1.0)
+    target = (max(1, round(w * scale)), max(1, round(h * scale)))
+    # Decode at a reduced scale straight away when the target is much smaller (JPEG only)
+    img.draft('RGB', target)
+    if fmt.upper() == 'JPEG' and img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    elif img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        img = img.convert('RGBA')
+    if img.size != target:
+        img = img.resize(target, Image.Resampling.LANCZOS)
+    out = io.BytesIO()
+    img.save(out, format=fmt, quality=quality)
+    return out.getvalue()
+
+
+def image_info(data: bytes, lqip_size: int = 16) -> dict:
+    """Return display width/height, byte size, dominant colour and a tiny LQIP data URI.
+
+    Dimensions account for EXIF orientation. The LQIP is a ~``lqip_size`` px WebP
+    (well under 200 bytes as a data URI) meant to be shown blurred while the real
+    image loads.
+    """
+    import base64
+    from PIL import Image, ImageOps
+
+    img = Image.open(io.BytesIO(data))
+    width, height = img.size
+    if img.getexif().get(0x0112) in (5, 6, 7, 8):
+        width, height = height, width
+    img.draft('RGB', (64, 64))
+    small = ImageOps.exif_transpose(img).convert('RGB')
+    small.thumbnail((64, 64))
+    # Most common colour of an 8-colour palette rather than the (muddier) mean
+    quantized = small.quantize(colors=8)
+    palette = quantized.getpalette()
+    _, index = max(quantized.getcolors())
+    color = '#%02x%02x%02x' % tuple(palette[index * 3:index * 3 + 3])
+    small.thumbnail((lqip_size, lqip_size))
+    out = io.BytesIO()
+    small.save(out, format='WEBP', quality=30)
+    return {
+        'width': width,
+        'height': height,
+        'bytes': len(data),
+        'color': color,
+        'lqip': 'data:image/webp;base64,' + base64.b64encode(out.getvalue()).decode('ascii'),
+    }
+
+
+# -- pool ------------------------------------------------------------------------------------
+
+def pool_workers() -> int:
+    configured = getattr(settings, 'IMAGE_POOL_WORKERS', None)
+    if configured is None or configured == '':
+        return os.cpu_count() or 1
+    return max(0, int(configured))
+
+
+def get_executor() -> Optional[ProcessPoolExecutor]:
+    """Return the shared pool, creating it on first use; None when IMAGE_POOL_WORKERS is 0."""
+    global _executor
+    workers = pool_workers()
+    if workers == 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            memory_limit = int(getattr(settings, 'IMAGE_POOL_MEMORY_LIMIT_MB', 1024) or 0) * 1024 * 1024
+            max_pixels = int(getattr(settings, 'IMAGE_MAX_PIXELS', 0) or 0)
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(memory_limit, max_pixels),
+                max_tasks_per_child=getattr(settings, 'IMAGE_POOL_MAX_TASKS_PER_CHILD', None) or None,
+            )
+            logger.debug('Started image pool with %d worker(s)', workers)
+        return _executor
+
+
+def shutdown(wait: bool = True) -> None:
+    """Stop the shared pool (a new one is started on the next submit)."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def submit(func, *args, **kwargs) -> Future:
+    """Run ``func(*args, **kwargs)`` in the pool (inline when the pool is disabled)."""
+    executor = get_executor()
+    if executor is None:
+        future = Future()
+        try:
+            future.set_result(func(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    try:
+        return executor.submit(func, *args, **kwargs)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool and retry once
+        logger.warning('Image pool was broken; restarting it')
+        shutdown(wait=False)
+        return get_executor().submit(func, *args, **kwargs)
+
+
+def submit_resize(data: bytes, max_size: int = MAX_IMAGE_SIZE, fmt: str = 'JPEG', quality: int = JPEG_QUALITY) -> Future:
+    return submit(resize_bytes, data, max_size, fmt, quality)
+
+
+def submit_fit(data: bytes, width: Optional[int], height: Optional[int], fmt: str = 'JPEG',
+               quality: int = JPEG_QUALITY) -> Future:
+    return submit(fit_bytes, data, width, height, fmt, quality)
+
+
+def resize_many(images: Iterable[bytes], max_size: int = MAX_IMAGE_SIZE, fmt: str = 'JPEG',
+                quality: int = JPEG_QUALITY) -> List[Optional[bytes]]:
+    """Resize ``images`` across the pool; failed images come back as None (logged)."""
+    futures = [submit_resize(data, max_size, fmt, quality) for data in images]
+    results = []
+    for i, future in enumerate(futures):
+        try:
+            results.append(future.result())
+        except Exception as e:
+            logger.warning('Resize failed for image %d: %s', i, e)
+            results.append(None)
+    return results
@@ -0,0 +1,208 @@
+"""Resized/re-encoded image variants for ``/files/<id>/`` and the Drive image proxy.
+
+``?w=``, ``?h=`` and ``?fmt=`` select a variant: the image scaled down to fit
+within ``w`` x ``h`` and encoded as ``fmt``. Only sizes and formats from
+``IMAGE_VARIANT_WIDTHS`` / ``IMAGE_VARIANT_HEIGHTS`` / ``IMAGE_VARIANT_FORMATS``
+are accepted so arbitrary query strings cannot fill the store. A variant is
+rendered once (in the image process pool) and stored under a key made of the
+source id, its version and the parameters: in GridFS (``metadata.variantKey``)
+when the file store is enabled, otherwise as files under ``IMAGE_VARIANT_DIR``.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from collections import namedtuple
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseNotModified
+
+from . import image_pool, singleflight
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'webp': ('WEBP', 'image/webp'),
+    'png': ('PNG', 'image/png'),
+}
+_FORMAT_ALIASES = {'jpg': 'jpeg'}
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+Variant = namedtuple('Variant', 'width height fmt')
+
+
+class InvalidVariant(ValueError):
+    """The query asked for a size or format outside the allow-list."""
+
+
+def _allowed(name: str, default) -> set:
+    return set(getattr(settings, name, default) or ())
+
+
+def requested(params) -> bool:
+    """Whether ``params`` (a QueryDict) asks for a variant rather than the original."""
+    return bool(params.get('w') or params.get('h') or params.get('fmt'))
+
+
+def parse_variant(params, source_content_type: str = '') -> Optional[Variant]:
+    """Return the Variant requested by ``params`` (a QueryDict), or None for the original.
+
+    Raises InvalidVariant for values that are not allow-listed.
+    """
+    if not requested(params):
+        return None
+    raw_w, raw_h, raw_fmt = params.get('w'), params.get('h'), params.get('fmt')
+    try:
+        width = int(raw_w) if raw_w else None
+        height = int(raw_h) if raw_h else None
+    except ValueError:
+        raise InvalidVariant('w and h must be integers')
+    if width is not None and width not in _allowed('IMAGE_VARIANT_WIDTHS', ()):
+        raise InvalidVariant(f'Width {width} is not allowed')
+    if height is not None and height not in _allowed('IMAGE_VARIANT_HEIGHTS', ()):
+        raise InvalidVariant(f'Height {height} is not allowed')
+    fmt = (raw_fmt or '').lower()
+    fmt = _FORMAT_ALIASES.get(fmt, fmt)
+    if not fmt:
+        # Keep the source format when it is one we can write, e.g. PNGs stay transparent
+        source = (source_content_type or '').split(';')[0].strip().lower()
+        fmt = next((k for k, (_, ct) in FORMATS.items() if ct == source), 'jpeg')
+    if fmt not in FORMATS or fmt not in _allowed('IMAGE_VARIANT_FORMATS', FORMATS):
+        raise InvalidVariant(f'Format {fmt} is not allowed')
+    return Variant(width, height, fmt)
+
+
+def variant_key(source: str, variant: Variant) -> str:
+    return f'{source}:{variant.width or ""}x{variant.height or ""}.{variant.fmt}'
+
+
+def content_type_for(variant: Variant) -> str:
+    return FORMATS[variant.fmt][1]
+
+
+def render(data: bytes, variant: Variant) -> bytes:
+    """Produce the variant bytes in the image pool."""
+    timeout = getattr(settings, 'IMAGE_VARIANT_TIMEOUT', 30) or None
+    return image_pool.submit_fit(data, variant.width, variant.height, FORMATS[variant.fmt][0]).result(timeout=timeout)
+
+
+# -- storage ---------------------------------------------------------------------------------
+
+def _use_gridfs() -> bool:
+    backend = getattr(settings, 'IMAGE_VARIANT_STORE', '') or ''
+    if backend:
+        return backend == 'gridfs'
+    return bool(getattr(settings, 'MONGODB_FILESTORE_ENABLED', False))
+
+
+def _disk_path(key: str) -> Path:
+    root = Path(getattr(settings, 'IMAGE_VARIANT_DIR', '') or Path(tempfile.gettempdir()) / 'oink-variants')
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    return root / digest[:2] / digest
+
+
+def load(key: str) -> Optional[bytes]:
+    """Return the stored variant for ``key``, or None."""
+    if _use_gridfs():
+        from .file_store import find_one
+        stored = find_one({'metadata.variantKey': key})
+        return stored.read() if stored is not None else None
+    try:
+        return _disk_path(key).read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def save(key: str, data: bytes, content_type: str, *, source: str) -> None:
+    if _use_gridfs():
+        from .file_store import _ensure_variant_index, store_bytes
+        _ensure_variant_index()
+        store_bytes(
+            key,
+            content_type,
+            data,
+            asset_type='variant',
+            extra_metadata={'variantKey': key, 'variantOf': source},
+        )
+        return
+    path = _disk_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write then rename so a concurrent reader never sees a partial file
+    fd, tmp = tempfile.mkstemp(dir=path.parent)
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def get_or_create(key: str, original, variant: Variant, *, source: str) -> bytes:
+    """Return the stored variant, rendering and storing it from ``original()`` on a miss.
+
+    Concurrent misses for the same key render it once (across processes too).
+    """
+    data = load(key)
+    if data is not None:
+        return data
+
+    def create():
+        data = render(original(), variant)
+        try:
+            save(key, data, content_type_for(variant), source=source)
+        except Exception:
+            logger.exception('Could not store image variant %s', key)
+        return data
+    return singleflight.do(f'variant:{key}', create, recheck=lambda: load(key))
+
+
+def _etag(key: str) -> str:
+    return '"%s"' % hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+
+def serve(request, source: str, original, source_content_type: str = '', *,
+          cache_control: str = IMMUTABLE, filename: str = '') -> Optional[HttpResponse]:
+    """Serve the variant requested by ``request.GET``; None when the original was requested.
+
+    ``source`` identifies the original (and its version); ``original`` is called
+    to fetch its bytes only when the variant has to be rendered.
+    """
+    try:
+        variant = parse_variant(request.GET, source_content_type)
+    except InvalidVariant as e:
+        return HttpResponseBadRequest(str(e))
+    if variant is None:
+        return None
+    key = variant_key(source, variant)
+    etag = _etag(key)
+    if etag in request.headers.get('If-None-Match', ''):
+        # Same key, same bytes: no need to even look the variant up
+        response = HttpResponseNotModified()
+    else:
+        try:
+            data = get_or_create(key, original, variant, source=source)
+        except Exception:
+            logger.exception('Could not render image variant %s', key)
+            return HttpResponseBadRequest('Could not resize this file')
+        response = HttpResponse(data, content_type=content_type_for(variant))
+        if filename:
+            stem = filename.rsplit('.', 1)[0]
+            ext = 'jpg' if variant.fmt == 'jpeg' else variant.fmt
+            response['Content-Disposition'] = f'inline; filename="{stem}.{ext}"'
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def thumbnail_url(url: str) -> str:
+    """``url`` with the gallery thumbnail width (IMAGE_THUMBNAIL_WIDTH) appended."""
+    width = getattr(settings, 'IMAGE_THUMBNAIL_WIDTH', 0)
+    if not url or not width:
+        return url
+    return f'{url}{"&" if "?" in url else "?"}w={width}'
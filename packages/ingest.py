@@ -0,0 +1,75 @@
+"""Ingest stage of the Drive fetch pipeline.
+
+Each fetched AML document goes through ``ingest_aml`` exactly once: it is parsed
+(falling back to the raw text) and, when the Mongo file store is enabled, written
+to GridFS in a single upload that carries the parsed JSON in its metadata.
+"""
+import json
+import logging
+from typing import Optional, Tuple
+
+from django.conf import settings
+
+from . import aml
+
+logger = logging.getLogger(__name__)
+
+AML_CONTENT_TYPE = 'text/plain; charset=utf-8'
+
+
+def parse_aml_text(name: str, text: str):
+    """Return the normalized ArchieML dict for ``text``, or the raw text if it can't be parsed."""
+    try:
+        return aml.parse_aml(text)
+    except Exception as e:
+        logger.warning('ArchieML parsing failed for %s, storing raw text: %s', name, e)
+        return text
+
+
+def ingest_aml(
+    name: str,
+    text: str,
+    *,
+    slug: str,
+    source_id: Optional[str] = None,
+    generated: Optional[str] = None,
+    parse: bool = True,
+) -> Tuple[object, Optional[dict]]:
+    """Parse one AML document and store it once in GridFS.
+
+    Returns ``(parsed, asset)``: ``parsed`` is what goes into ``Package.data`` and
+    ``asset`` the ``package_assets`` index entry, or None when the file store is
+    disabled or the write failed.
+    """
+    parsed = parse_aml_text(name, text) if parse else text
+    if not getattr(settings, 'MONGODB_FILESTORE_ENABLED', False):
+        return parsed, None
+
+    metadata = {'source': 'drive', 'sourceId': source_id, 'generated': generated}
+    if isinstance(parsed, dict):
+        metadata['parsedJson'] = json.dumps(parsed)
+    try:
+        from .file_store import store_text
+        file_id = store_text(
+            name=name,
+            text=text,
+            content_type=AML_CONTENT_TYPE,
+            slug=slug,
+            asset_type='aml',
+            extra_metadata=metadata,
+        )
+    except Exception:
+        logger.exception('Failed to store AML %s for %s in GridFS', name, slug)
+        return parsed, None
+
+    asset = {
+        'name': name,
+        'file_id': file_id,
+        'asset_type': 'aml',
+        'content_type': AML_CONTENT_TYPE,
+        'source': 'drive',
+        'source_id': source_id,
+    }
+    if generated:
+        asset['generated'] = generated
+    return parsed, asset
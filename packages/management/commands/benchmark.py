@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = 'Run the offline benchmark suite and compare against stored baselines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Benchmarks to run (default: all)')
+        parser.add_argument('--quick', action='store_true', help='Smallest size only, single run')
+        parser.add_argument('--threshold', type=float, default=None,
+                            help='Allowed slowdown relative to baseline before failing (default 0.3 = 30%%)')
+        parser.add_argument('--rounds', type=int, default=None,
+                            help='Run the suite this many times and keep the median of each result '
+                                 '(default 3, the number of rounds the baselines are recorded with)')
+        parser.add_argument('--update-baseline', action='store_true', help='Store these results as the new baseline')
+        parser.add_argument('--local-mongo', action='store_true',
+                            help='Use MONGODB_URI instead of the in-process mongomock client')
+
+    def handle(self, *args, **options):
+        from packages import benchmarks
+
+        threshold = options['threshold'] if options['threshold'] is not None else benchmarks.DEFAULT_THRESHOLD
+        round_count = options['rounds']
+        if round_count is None:
+            round_count = 1 if options['quick'] else benchmarks.DEFAULT_ROUNDS
+
+        # Benchmarks write packages and versions; keep them out of the real database.
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            rounds = [
+                benchmarks.run(
+                    options['names'] or None,
+                    quick=options['quick'],
+                    log=self.stdout.write,
+                    use_mongomock=not options['local_mongo'],
+                )
+                for _ in range(max(1, round_count))
+            ]
+        except KeyError as e:
+            raise CommandError(e.args[0])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        results = benchmarks.median_results(rounds)
+
+        if options['update_baseline']:
+            benchmarks.save_baselines(results)
+            self.stdout.write(self.style.SUCCESS(f'Baseline updated: {benchmarks.BASELINE_FILE}'))
+            return
+
+        regressions = benchmarks.find_regressions(results, benchmarks.load_baselines(), threshold)
+        for r in regressions:
+            self.stdout.write(self.style.ERROR(
+                f"{r['name']}: {r['current'] * 1000:.2f} ms vs baseline {r['baseline'] * 1000:.2f} ms ({r['ratio']:.2f}x)"
+            ))
+        if regressions:
+            raise CommandError(f'{len(regressions)} benchmark(s) regressed by more than {threshold:.0%}')
+        self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Apply version retention and re-encode package history as keyframes + deltas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, default=None,
+                            help='Versions to keep per package (default PACKAGE_VERSION_RETENTION, 0 = keep all)')
+        parser.add_argument('--slug', action='append', default=[], help='Only these packages (repeatable)')
+        parser.add_argument('--rechain', action='store_true',
+                            help='Drop unchanged versions and convert full copies into deltas')
+
+    def handle(self, *args, **options):
+        from packages.models import Package
+        from packages import cache, versioning
+
+        keep = options['keep'] if options['keep'] is not None else getattr(settings, 'PACKAGE_VERSION_RETENTION', 0)
+        packages = Package.objects.all()
+        if options['slug']:
+            packages = packages.filter(slug__in=options['slug'])
+
+        deduped = deleted = 0
+        for pkg in packages.only('pk', 'slug').iterator():
+            removed = 0
+            if options['rechain']:
+                removed += versioning.rechain(pkg)
+                deduped += removed
+            if keep:
+                count = versioning.compact(pkg, keep)
+                deleted += count
+                removed += count
+            if removed:
+                cache.invalidate(cache.package_tag(pkg.slug))
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {deduped} unchanged version(s) and {deleted} version(s) beyond retention'
+        ))
@@ -0,0 +1,63 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+from django.db.models.functions import Cast
+
+
+class Command(BaseCommand):
+    help = 'Compress CompressedJSONField rows still stored as plain JSON (or with an older dictionary)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows read and rewritten per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Report the size change without writing')
+        parser.add_argument('--vacuum', action='store_true',
+                            help='Run VACUUM afterwards so SQLite returns the freed pages to the filesystem')
+
+    def handle(self, *args, **options):
+        from packages import fields
+
+        for model in apps.get_models():
+            for field in model._meta.concrete_fields:
+                if isinstance(field, fields.CompressedJSONField):
+                    before, after, rewritten = self._compress(model, field.attname, options)
+                    self.stdout.write(
+                        f'{model._meta.label}.{field.name}: {rewritten} row(s) rewritten, '
+                        f'{before} -> {after} bytes'
+                    )
+
+        if options['vacuum'] and not options['dry_run']:
+            if connection.vendor == 'sqlite':
+                with connection.cursor() as cursor:
+                    cursor.execute('VACUUM')
+            else:
+                self.stdout.write('Skipping --vacuum: only needed on SQLite (autovacuum reclaims space elsewhere)')
+        self.stdout.write(self.style.SUCCESS('Done'))
+
+    def _compress(self, model, name, options):
+        from packages import fields
+
+        before = after = rewritten = 0
+        last = None
+        while True:
+            rows = model._base_manager.order_by('pk')
+            if last is not None:
+                rows = rows.filter(pk__gt=last)
+            # The stored bytes, not the decoded value, so current rows are left alone
+            batch = list(rows.annotate(raw=Cast(name, models.BinaryField())).values_list('pk', 'raw')[:options['batch_size']])
+            if not batch:
+                break
+            with transaction.atomic():
+                for pk, raw in batch:
+                    if raw is None:
+                        continue
+                    before += len(raw)
+                    if fields.is_current(raw):
+                        after += len(raw)
+                        continue
+                    value = fields.decompress(raw)
+                    after += len(fields.compress(value))
+                    rewritten += 1
+                    if not options['dry_run']:
+                        model._base_manager.filter(pk=pk).update(**{name: value})
+            last = batch[-1][0]
+        return before, after, rewritten
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Create Drive folders (and article.aml docs) for packages waiting on provisioning and refill the folder pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--slug', action='append', default=[], help='Only these packages (repeatable)')
+        parser.add_argument('--retry-failed', action='store_true', help='Also retry packages whose provisioning failed')
+        parser.add_argument('--requeue-running', action='store_true',
+                            help='Treat packages stuck in "running" (e.g. after a worker restart) as pending')
+        parser.add_argument('--pool-size', type=int, default=None,
+                            help='Unclaimed folders to keep in the pool (default DRIVE_FOLDER_POOL_SIZE, 0 = skip)')
+
+    def handle(self, *args, **options):
+        from packages.models import Package
+        from packages import drive_pool, provisioning
+
+        packages = Package.objects.all()
+        if options['slug']:
+            packages = packages.filter(slug__in=options['slug'])
+        if options['requeue_running']:
+            packages.filter(drive_status=Package.DRIVE_RUNNING).update(drive_status=Package.DRIVE_PENDING)
+        statuses = [Package.DRIVE_PENDING]
+        if options['retry_failed']:
+            statuses.append(Package.DRIVE_FAILED)
+
+        ready = failed = 0
+        for pk in packages.filter(drive_status__in=statuses).values_list('pk', flat=True):
+            if provisioning.provision(pk, retry_failed=options['retry_failed']):
+                ready += 1
+            else:
+                failed += 1
+        pooled = drive_pool.replenish(options['pool_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Provisioned {ready} package(s); {failed} failed. Added {pooled} folder(s) to the pool'
+        ))
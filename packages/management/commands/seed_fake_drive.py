@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Create a synthetic package folder in the fake Drive tree (DRIVE_FAKE_ROOT)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('folder_id', help='Folder id / directory name, e.g. load-test-1')
+        parser.add_argument('--images', type=int, default=20, help='Number of JPEGs to generate')
+        parser.add_argument('--blocks', type=int, default=200, help='Content blocks in article.aml')
+
+    def handle(self, *args, **options):
+        from packages.benchmarks.support import populate_folder
+
+        folder = populate_folder(settings.DRIVE_FAKE_ROOT, options['folder_id'], options['images'], options['blocks'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {folder} -- use https://drive.google.com/drive/folders/{options['folder_id']} "
+            f"as the package's Drive URL with DRIVE_BACKEND=fake"
+        ))
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:59
+
+import hashlib
+import json
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Copied from packages.versioning so this migration does not depend on later code
+STORAGE_KEYS = ('_gridfs_aml',)
+
+
+def backfill_content_hash(apps, schema_editor):
+    """Hash existing (full-copy) versions so an unchanged re-fetch is recognised.
+
+    Matches packages.versioning.content_hash as of this migration: the
+    storage-only keys are left out of ``data`` before hashing."""
+    PackageVersion = apps.get_model('packages', 'PackageVersion')
+    for version in PackageVersion.objects.only('pk', 'article_data', 'data').iterator(chunk_size=200):
+        data = {k: v for k, v in (version.data or {}).items() if k not in STORAGE_KEYS}
+        content = {'article': version.article_data or '', 'data': data}
+        encoded = json.dumps(content, separators=(',', ':'), ensure_ascii=False, default=str)
+        digest = hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+        PackageVersion.objects.filter(pk=version.pk).update(content_hash=digest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packages', '0006_alter_package_options_package_pinned_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='packageversion',
+            name='base',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='deltas', to='packages.packageversion'),
+        ),
+        migrations.AddField(
+            model_name='packageversion',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='packageversion',
+            name='delta',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='packageversion',
+            name='is_keyframe',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddIndex(
+            model_name='packageversion',
+            index=models.Index(fields=['package', '-created_at'], name='packageversion_pkg_created'),
+        ),
+        migrations.RunPython(backfill_content_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+def backfill_drive_status(apps, schema_editor):
+    Package = apps.get_model('packages', 'Package')
+    Package.objects.exclude(google_drive_id='').update(drive_status='ready')
+    # Older rows without a folder id were never provisioned; leave them for an explicit retry
+    Package.objects.filter(google_drive_id='').update(
+        drive_status='failed', drive_error='No Drive folder id recorded before background provisioning')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packages', '0007_packageversion_deltas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='package',
+            name='drive_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='package',
+            name='drive_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('running', 'Provisioning'), ('ready', 'Ready'), ('failed', 'Failed')], default='', max_length=16),
+        ),
+        migrations.RunPython(backfill_drive_status, migrations.RunPython.noop),
+    ]
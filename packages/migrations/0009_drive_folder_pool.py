@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packages', '0008_package_drive_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='package',
+            name='article_doc_url',
+            field=models.URLField(blank=True, default=''),
+        ),
+        migrations.CreateModel(
+            name='DriveFolder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('folder_id', models.CharField(max_length=128, unique=True)),
+                ('folder_url', models.URLField()),
+                ('doc_id', models.CharField(blank=True, max_length=128)),
+                ('doc_url', models.URLField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('package', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pooled_folder', to='packages.package')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['claimed_at', 'created_at'], name='drivefolder_unclaimed')],
+            },
+        ),
+    ]
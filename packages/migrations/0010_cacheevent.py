@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packages', '0009_drive_folder_pool'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tags', models.JSONField(default=list)),
+                ('origin', models.CharField(blank=True, max_length=32)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:46
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+_PROXY_ID = re.compile(r'/image/([^/]+)/?$')
+_METADATA = ('width', 'height', 'bytes', 'color', 'lqip')
+
+
+def backfill_images(apps, schema_editor):
+    """Rows for the images already fetched into ``Package.images``.
+
+    Same merge as packages.image_index.row_fields."""
+    Package = apps.get_model('packages', 'Package')
+    PackageImage = apps.get_model('packages', 'PackageImage')
+    for pkg in Package.objects.only('pk', 'images').iterator(chunk_size=200):
+        images = pkg.images if isinstance(pkg.images, dict) else {}
+        rows = {}
+        for kind in ('gdrive', 'gridfs'):
+            for item in images.get(kind) or []:
+                name = item.get('name')
+                if not name or (kind == 'gridfs' and not item.get('id')):
+                    continue
+                row = rows.setdefault(name, {'name': name})
+                if kind == 'gdrive':
+                    match = _PROXY_ID.search(item.get('url') or '')
+                    if match:
+                        row['drive_file_id'] = match.group(1)
+                else:
+                    row['gridfs_id'] = item['id']
+                    if item.get('content_type'):
+                        row['content_type'] = item['content_type']
+                if item.get('hash'):
+                    row['content_hash'] = item['hash']
+                row.update({key: item[key] for key in _METADATA if item.get(key) is not None})
+        PackageImage.objects.bulk_create([
+            PackageImage(package_id=pkg.pk, order=order, **row) for order, row in enumerate(rows.values())
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packages', '0010_cacheevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackageImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=512)),
+                ('order', models.PositiveIntegerField(default=0)),
+                ('drive_file_id', models.CharField(blank=True, max_length=128)),
+                ('gridfs_id', models.CharField(blank=True, max_length=64)),
+                ('s3_key', models.CharField(blank=True, max_length=1024)),
+                ('content_hash', models.CharField(blank=True, max_length=64)),
+                ('content_type', models.CharField(blank=True, max_length=128)),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('bytes', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('color', models.CharField(blank=True, max_length=16)),
+                ('lqip', models.TextField(blank=True)),
+                ('package', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='package_images', to='packages.package')),
+            ],
+            options={
+                'ordering': ['package', 'order'],
+                'indexes': [models.Index(fields=['drive_file_id'], name='packageimage_drive_id'), models.Index(fields=['content_hash'], name='packageimage_hash'), models.Index(fields=['gridfs_id'], name='packageimage_gridfs_id')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('drive_file_id', ''), _negated=True), fields=('package', 'drive_file_id'), name='packageimage_unique_drive_file')],
+            },
+        ),
+        migrations.RunPython(backfill_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+FIELDS = ('cached_article_preview', 'images', 'data')
+
+
+def _batches(model, *fields):
+    """Rows of ``model`` as value tuples (pk first), BATCH_SIZE per query in pk order."""
+    last = 0
+    while True:
+        batch = list(model.objects.filter(pk__gt=last).order_by('pk').values_list('pk', *fields)[:BATCH_SIZE])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1][0]
+
+
+def copy_content(apps, schema_editor):
+    Package = apps.get_model('packages', 'Package')
+    PackageContent = apps.get_model('packages', 'PackageContent')
+    for batch in _batches(Package, *FIELDS):
+        PackageContent.objects.bulk_create([
+            PackageContent(package_id=pk, cached_article_preview=article or '', images=images or {}, data=data or {})
+            for pk, article, images, data in batch
+        ])
+
+
+def restore_content(apps, schema_editor):
+    Package = apps.get_model('packages', 'Package')
+    PackageContent = apps.get_model('packages', 'PackageContent')
+    for batch in _batches(PackageContent, *FIELDS):
+        Package.objects.bulk_update([
+            Package(pk=pk, cached_article_preview=article, images=images, data=data)
+            for pk, article, images, data in batch
+        ], FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packages', '0011_packageimage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackageContent',
+            fields=[
+                ('package', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='content', serialize=False, to='packages.package')),
+                ('cached_article_preview', models.TextField(blank=True, default='')),
+                ('images', models.JSONField(blank=True, default=dict)),
+                ('data', models.JSONField(blank=True, default=dict)),
+            ],
+        ),
+        migrations.RunPython(copy_content, restore_content),
+        migrations.RemoveField(
+            model_name='package',
+            name='cached_article_preview',
+        ),
+        migrations.RemoveField(
+            model_name='package',
+            name='data',
+        ),
+        migrations.RemoveField(
+            model_name='package',
+            name='images',
+        ),
+    ]
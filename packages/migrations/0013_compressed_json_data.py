@@ -0,0 +1,64 @@
+from django.db import migrations, models
+
+import packages.fields
+
+# (model, table) whose ``data`` column becomes a CompressedJSONField
+TABLES = (
+    ('packagecontent', 'packages_packagecontent'),
+    ('packageversion', 'packages_packageversion'),
+)
+BATCH_SIZE = 500
+
+
+def copy_as_json_bytes(apps, schema_editor):
+    """Copy each JSON column into its binary replacement as plain UTF-8 JSON, in one statement per table.
+
+    CompressedJSONField reads plain JSON, so nothing is decoded here; run
+    ``manage.py compress_json_fields`` afterwards to compress the rows.
+    """
+    connection = schema_editor.connection
+    source = "convert_to(data::text, 'UTF8')" if connection.vendor == 'postgresql' else 'CAST(data AS BLOB)'
+    with connection.cursor() as cursor:
+        for _, table in TABLES:
+            cursor.execute(f'UPDATE {table} SET data_compressed = {source}')
+
+
+def restore_json(apps, schema_editor):
+    for model_name, _ in TABLES:
+        model = apps.get_model('packages', model_name)
+        last = None
+        while True:
+            rows = model.objects.order_by('pk')
+            if last is not None:
+                rows = rows.filter(pk__gt=last)
+            batch = list(rows.only('pk', 'data_compressed')[:BATCH_SIZE])
+            if not batch:
+                break
+            for row in batch:
+                row.data = row.data_compressed if row.data_compressed is not None else {}
+            model.objects.bulk_update(batch, ['data'])
+            last = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packages', '0012_packagecontent'),
+    ]
+
+    operations = [
+        *(
+            migrations.AddField(
+                model_name=model_name,
+                name='data_compressed',
+                field=packages.fields.CompressedJSONField(blank=True, default=dict, editable=True),
+            )
+            for model_name, _ in TABLES
+        ),
+        migrations.RunPython(copy_as_json_bytes, restore_json),
+        *(migrations.RemoveField(model_name=model_name, name='data') for model_name, _ in TABLES),
+        *(
+            migrations.RenameField(model_name=model_name, old_name='data_compressed', new_name='data')
+            for model_name, _ in TABLES
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:03
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+META_FIELDS = ('headline', 'author', 'articleType', 'excerpt', 'updated')
+
+
+def backfill_meta(apps, schema_editor):
+    """Same projection as packages.aml.article_meta."""
+    PackageContent = apps.get_model('packages', 'PackageContent')
+    last = 0
+    while True:
+        batch = list(PackageContent.objects.filter(pk__gt=last).order_by('pk').only('pk', 'data')[:BATCH_SIZE])
+        if not batch:
+            break
+        for content in batch:
+            data = content.data if isinstance(content.data, dict) else {}
+            main = data.get('article.aml')
+            if not isinstance(main, dict):
+                main = next((v for k, v in data.items() if k.lower().endswith('.aml') and isinstance(v, dict)), {})
+            content.meta = {k: main[k] for k in META_FIELDS if isinstance(main.get(k), str) and main[k]}
+        PackageContent.objects.bulk_update(batch, ['meta'])
+        last = batch[-1].pk
+
+
+def create_gin_index(apps, schema_editor):
+    # jsonb_path_ops: smaller and faster than the default opclass, and ``@>`` is the only operator used
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS packagecontent_meta_gin ON packages_packagecontent USING gin (meta jsonb_path_ops)'
+        )
+
+
+def drop_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS packagecontent_meta_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('packages', '0013_compressed_json_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='packagecontent',
+            name='meta',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(backfill_meta, migrations.RunPython.noop),
+        migrations.RunPython(create_gin_index, drop_gin_index),
+    ]
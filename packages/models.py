@@ -1,8 +1,13 @@
 from django.db import models
-from django.utils.text import slugify
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.conf import settings
 from . import drive
+from . import drive_crawler
+from . import ingest
+from .fields import CompressedJSONField
 import re
+import logging
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.validators import RegexValidator
@@ -38,6 +43,19 @@ class Package(models.Model):
         (CATEGORY_ALUMNI, 'Alumni'),
     ]
 
+    # Drive folder provisioning (see packages.provisioning)
+    DRIVE_PENDING = 'pending'
+    DRIVE_RUNNING = 'running'
+    DRIVE_READY = 'ready'
+    DRIVE_FAILED = 'failed'
+
+    DRIVE_STATUS_CHOICES = [
+        (DRIVE_PENDING, 'Pending'),
+        (DRIVE_RUNNING, 'Provisioning'),
+        (DRIVE_READY, 'Ready'),
+        (DRIVE_FAILED, 'Failed'),
+    ]
+
    
 
     slug = models.CharField(
@@ -52,10 +70,10 @@ class Package(models.Model):
     last_fetched_date = models.DateTimeField(null=True, blank=True)
     category = models.CharField(max_length=32, choices=CATEGORY_CHOICES, default=CATEGORY_PRIME)
     created_at = models.DateTimeField(auto_now_add=True)
-    cached_article_preview = models.TextField(blank=True, default='')
-    images = models.JSONField(default=dict, blank=True)
-    data = models.JSONField(default=dict, blank=True)
     processing = models.BooleanField(default=False)
+    drive_status = models.CharField(max_length=16, choices=DRIVE_STATUS_CHOICES, blank=True, default='')
+    drive_error = models.TextField(blank=True, default='')
+    article_doc_url = models.URLField(blank=True, default='')
     pinned = models.BooleanField(default=False)
 
     class Meta:
@@ -64,6 +82,32 @@ class Package(models.Model):
     def __str__(self):
         return self.slug
 
+    # Fetched content lives in PackageContent, read on first access (or with select_related('content'))
+    CONTENT_FIELDS = ('cached_article_preview', 'images', 'data')
+
+    def _content(self):
+        try:
+            return self.content
+        except PackageContent.DoesNotExist:
+            return PackageContent(package=self)
+
+    def _content_field(name):
+        def get(self):
+            return getattr(self._content(), name)
+
+        def set(self, value):
+            setattr(self._content(), name, value)
+        return property(get, set)
+
+    cached_article_preview = _content_field('cached_article_preview')
+    images = _content_field('images')
+    data = _content_field('data')
+    del _content_field
+
+    def _loaded_content(self):
+        field = self._meta.get_field('content')
+        return field.get_cached_value(self) if field.is_cached(self) else None
+
     def _get_drive_settings(self):
         """Get Google Drive settings from Django settings."""
         return {
@@ -93,77 +137,52 @@ class Package(models.Model):
                 self.google_drive_id = found
                 self.google_drive_url = f"https://drive.google.com/drive/folders/{found}"
 
-        if not self.google_drive_url:
-            drive_settings = self._get_drive_settings()
-            folder_name = self.slug
-            created = None
-            try:
-                created = drive.create_drive_folder(
-                    folder_name,
-                    parent_id=drive_settings['parent_id'],
-                    service_account_file=drive_settings['service_account_file'],
-                    impersonate_user=drive_settings['impersonate_user'],
-                    share_public=drive_settings['share_public'],
-                    share_domain=drive_settings['share_domain'],
-                    share_role=drive_settings['share_role'],
-                )
-            except Exception:
-                created = None
-
-            if created and isinstance(created, dict):
-                self.google_drive_id = created.get('id', '')
-                self.google_drive_url = created.get('url') or ''
-            elif isinstance(created, str) and created.strip():
-                url = created.strip()
-                self.google_drive_url = url
-                if not self.google_drive_id and url.startswith('http'):
-                    try:
-                        self.google_drive_id = url.rstrip('/').split('/')[-1]
-                    except Exception:
-                        self.google_drive_id = ''
-            else:
-                root = getattr(settings, 'GOOGLE_DRIVE_ROOT', 'https://drive.google.com/drive/folders') or 'https://drive.google.com/drive/folders'
-                if not isinstance(root, str) or not root.startswith('http'):
-                    root = 'https://drive.google.com/drive/folders'
-                root = root.rstrip('/')
-                safe = slugify(self.slug)
-                self.google_drive_url = f"{root}/{safe}"
-        super().save(*args, **kwargs)
-
-    def setup_and_save(self, user, pset_slug: str = ''):
-        """Ensure Drive folder exists (id/url) and create starter doc if missing."""
-        created_now = False
-        if not (self.google_drive_url and self.google_drive_id):
-            drive_settings = self._get_drive_settings()
-            try:
-                created = drive.create_drive_folder(
-                    self.slug, 
-                    parent_id=drive_settings['parent_id'],
-                    service_account_file=drive_settings['service_account_file'],
-                    impersonate_user=drive_settings['impersonate_user'],
-                    share_public=drive_settings['share_public'],
-                    share_domain=drive_settings['share_domain'],
-                    share_role=drive_settings['share_role']
-                )
-            except Exception:
-                created = None
-            if created and isinstance(created, dict):
-                self.google_drive_id = created.get('id', '')
-                self.google_drive_url = created.get('url') or self.google_drive_url
-                created_now = True
-        self.save()
-        try:
-            if self.google_drive_id:
-                drive_settings = self._get_drive_settings()
-                drive.ensure_article_doc_in_folder(
-                    self.google_drive_id,
-                    service_account_file=drive_settings['service_account_file'],
-                    impersonate_user=drive_settings['impersonate_user'],
-                    share_role=drive_settings['share_role']
-                )
-        except Exception:
-            pass
-        return self
+        # Provisioning a folder is a Drive round trip; it runs in packages.provisioning, never here
+        if not self.drive_status:
+            self.drive_status = self.DRIVE_READY if self.google_drive_id else self.DRIVE_PENDING
+        # The content row is only written when it was read or assigned: saving a listed package leaves it alone
+        content = self._loaded_content()
+        content_fields = None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            content_fields = [f for f in update_fields if f in self.CONTENT_FIELDS]
+            kwargs['update_fields'] = [f for f in update_fields if f not in self.CONTENT_FIELDS]
+            if not content_fields:
+                content = None
+        if content is None:
+            super().save(*args, **kwargs)
+        else:
+            from django.db import transaction
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                content.package = self
+                content.save(update_fields=None if content._state.adding else content_fields)
+        self.invalidate_cache()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so a rename or category change also drops what was cached under the old values
+        instance._cache_keys = (instance.__dict__.get('slug'), instance.__dict__.get('category'))
+        return instance
+
+    def invalidate_cache(self):
+        """Drop cached data for this package and the listings it appears in (see packages.cache)."""
+        from . import cache
+        from django.db import transaction
+
+        tags = {(self.slug, self.category)}
+        old_slug, old_category = getattr(self, '_cache_keys', (None, None))
+        tags.add((old_slug or self.slug, old_category or self.category))
+        self._cache_keys = (self.slug, self.category)
+
+        def run(publish):
+            for slug, category in tags:
+                cache.invalidate_package(slug, category, publish=publish)
+        # Now for readers in this transaction, and again after commit (then for every worker)
+        # so nobody re-caches the old row in between
+        run(False)
+        transaction.on_commit(lambda: run(True))
 
     def fetch_from_gdrive(self, user):
         """Fetch article text, AML, and images from Drive and update cache fields.
@@ -184,24 +203,18 @@ class Package(models.Model):
         gridfs_aml = {}
         gridfs_image_assets = []
         gridfs_aml_assets = []
+        image_files = []
+        service = None
         try:
-            from google.oauth2 import service_account as _sa
-            from googleapiclient.discovery import build as _gbuild
-            sa_file = getattr(settings, 'GOOGLE_SERVICE_ACCOUNT_FILE', None)
-            if sa_file:
-                scopes = ['https://www.googleapis.com/auth/drive']
-                creds = _sa.Credentials.from_service_account_file(sa_file, scopes=scopes)
-                service = _gbuild('drive', 'v3', credentials=creds, cache_discovery=False)
-                q = f"'{folder_id}' in parents"
-                resp = service.files().list(q=q, fields='files(id,name,mimeType,webViewLink,webContentLink)').execute()
-                items = resp.get('files', [])
-                print(f"[FETCH] Found {len(items)} files in Drive folder")
-                try:
-                    import archieml as _arch
-                    print(f"[FETCH] ArchieML imported successfully")
-                except Exception as e:
-                    _arch = None
-                    print(f"[FETCH] ArchieML import failed: {e}")
+            service_account_file = getattr(settings, 'GOOGLE_SERVICE_ACCOUNT_FILE', None) or ''
+            service = drive.get_drive_service(service_account_file)
+            if service:
+                # Streams every page of the folder and its subfolders (e.g. photos/)
+                items = drive_crawler.iter_files(
+                    service,
+                    folder_id,
+                    service_factory=lambda: drive.get_drive_service(service_account_file),
+                )
                 for it in items:
                     name = it.get('name') or ''
                     mime = it.get('mimeType') or ''
@@ -220,139 +233,11 @@ class Package(models.Model):
                                 media = service.files().get_media(fileId=fid).execute()
                             txt = media.decode('utf-8') if isinstance(media, bytes) else media
                             print(f"[FETCH] Downloaded {len(txt)} bytes of AML")
-                            if getattr(settings, 'MONGODB_FILESTORE_ENABLED', False):
-                                try:
-                                    from .file_store import store_text
-                                    file_id = store_text(
-                                        name=name,
-                                        text=txt,
-                                        content_type='text/plain; charset=utf-8',
-                                        slug=self.slug,
-                                        asset_type='aml',
-                                        extra_metadata={'sourceId': fid, 'source': 'drive'},
-                                    )
-                                    gridfs_aml[name] = file_id
-                                    gridfs_aml_assets.append({
-                                        'name': name,
-                                        'file_id': file_id,
-                                        'asset_type': 'aml',
-                                        'content_type': 'text/plain; charset=utf-8',
-                                        'source': 'drive',
-                                        'source_id': fid,
-                                    })
-                                except Exception:
-                                    pass
-                            if _arch:
-                                try:
-                                    parsed = _arch.loads(txt)
-                                    # Fix malformed pull quotes from ArchieML parser
-                                    if isinstance(parsed, dict) and 'content' in parsed and isinstance(parsed['content'], list):
-                                        fixed_content = []
-                                        i = 0
-                                        while i < len(parsed['content']):
-                                            block = parsed['content'][i]
-                                            # Check if next block exists
-                                            next_block = parsed['content'][i + 1] if i + 1 < len(parsed['content']) else None
-
-                                            # Detect malformed pull quote split:
-                                            # 1. {"type": "pull", "value": {}}
-                                            # 2. {"value": {"caption": "..."}} (missing type)
-                                            if (isinstance(block, dict) and
-                                                block.get('type') == 'pull' and
-                                                (not block.get('value') or not block['value'].get('caption')) and
-                                                next_block and isinstance(next_block, dict) and
-                                                'type' not in next_block and
-                                                'value' in next_block and
-                                                isinstance(next_block.get('value'), dict) and
-                                                'caption' in next_block['value']):
-                                                # Merge the two objects
-                                                fixed_content.append({
-                                                    'type': 'pull',
-                                                    'value': {
-                                                        'caption': next_block['value']['caption']
-                                                    }
-                                                })
-                                                i += 2  # Skip both blocks
-                                            else:
-                                                fixed_content.append(block)
-                                                i += 1
-                                        parsed['content'] = fixed_content
-                                        print(f"[FETCH] Fixed malformed pull quotes in content")
-
-                                    # Reorder image block fields (alt, url, credit, caption)
-                                    if isinstance(parsed, dict) and 'content' in parsed and isinstance(parsed['content'], list):
-                                        for block in parsed['content']:
-                                            if isinstance(block, dict) and block.get('type') == 'image' and isinstance(block.get('value'), dict):
-                                                image_val = block['value']
-                                                ordered_image = {}
-                                                image_field_order = ['alt', 'url', 'credit', 'caption']
-                                                for key in image_field_order:
-                                                    if key in image_val:
-                                                        ordered_image[key] = image_val[key]
-                                                # Add any remaining fields
-                                                for key in image_val.keys():
-                                                    if key not in ordered_image:
-                                                        ordered_image[key] = image_val[key]
-                                                block['value'] = ordered_image
-
-                                    # Reorder fields to match Kerckhoff format:
-                                    # author, content, then metadata in specific order
-                                    if isinstance(parsed, dict):
-                                        ordered = {}
-                                        # Define exact field order
-                                        field_order = [
-                                            'author', 'content', 'excerpt', 'updated', 'coveralt',
-                                            'coverimg', 'headline', 'authorbio', 'covercred',
-                                            'articleType', 'authoremail', 'authortwitter'
-                                        ]
-                                        # Add fields in specified order
-                                        for key in field_order:
-                                            if key in parsed:
-                                                ordered[key] = parsed[key]
-                                        # Add any remaining fields not in the order list
-                                        for key in parsed.keys():
-                                            if key not in ordered:
-                                                ordered[key] = parsed[key]
-                                        parsed = ordered
-
-                                    _drop = [k for k in parsed if len(k) == 1 and k.isalpha() and parsed[k] == []]
-                                    for k in _drop:
-                                        del parsed[k]
-                                    if _drop:
-                                        print(f"[FETCH] Removed footnote-style single-letter keys: {_drop}")
-
-                                    aml_files[name] = parsed
-                                    print(f"[FETCH] Successfully parsed AML with ArchieML")
-                                except Exception as e:
-                                    aml_files[name] = txt
-                                    print(f"[FETCH] ArchieML parsing failed: {e}, storing raw text")
-                            else:
-                                aml_files[name] = txt
-                                print(f"[FETCH] No ArchieML, storing raw text")
-                            
-                            # Optionally persist AML to MongoDB GridFS
-                            if getattr(settings, 'MONGODB_FILESTORE_ENABLED', False):
-                                try:
-                                    from .file_store import store_text
-                                    file_id = store_text(
-                                        name=name,
-                                        text=txt,
-                                        content_type='text/plain; charset=utf-8',
-                                        slug=self.slug,
-                                        asset_type='aml',
-                                        extra_metadata={'sourceId': fid, 'source': 'drive'},
-                                    )
-                                    gridfs_aml[name] = file_id
-                                    gridfs_aml_assets.append({
-                                        'name': name,
-                                        'file_id': file_id,
-                                        'asset_type': 'aml',
-                                        'content_type': 'text/plain; charset=utf-8',
-                                        'source': 'drive',
-                                        'source_id': fid,
-                                    })
-                                except Exception:
-                                    pass
+                            parsed, asset = ingest.ingest_aml(name, txt, slug=self.slug, source_id=fid)
+                            aml_files[name] = parsed
+                            if asset:
+                                gridfs_aml[name] = asset['file_id']
+                                gridfs_aml_assets.append(asset)
                         except Exception:
                             aml_files[name] = ''
                     elif name.lower().startswith('article') and mime == 'application/vnd.google-apps.document':
@@ -367,42 +252,107 @@ class Package(models.Model):
                             print(f"[FETCH] Failed to export article: {e}")
                     elif mime.startswith('image'):
                         gdrive_images.append({'name': name, 'url': f'/packages/{self.slug}/image/{fid}/'})
-                        # Download image only when storing in GridFS (no S3)
-                        need_content = getattr(settings, 'MONGODB_FILESTORE_ENABLED', False)
-                        content = None
-                        if need_content:
-                            try:
-                                content = service.files().get_media(fileId=fid).execute()
-                                if isinstance(content, str):
-                                    content = content.encode('utf-8')
-                            except Exception:
-                                content = None
-                        # Persist image bytes to MongoDB GridFS; link under image will be /files/<id>/ (serves image)
-                        if getattr(settings, 'MONGODB_FILESTORE_ENABLED', False) and content is not None:
-                            try:
-                                from .file_store import store_bytes
-                                file_id = store_bytes(
-                                    name=name,
-                                    content_type=mime or 'application/octet-stream',
-                                    data=content,
-                                    slug=self.slug,
-                                    asset_type='image',
-                                    extra_metadata={'sourceId': fid, 'source': 'drive'},
-                                )
-                                gridfs_images.append({'name': name, 'id': file_id, 'content_type': mime or 'application/octet-stream'})
-                                gridfs_image_assets.append({
-                                    'name': name,
-                                    'file_id': file_id,
-                                    'asset_type': 'image',
-                                    'content_type': mime or 'application/octet-stream',
-                                    'source': 'drive',
-                                    'source_id': fid,
-                                })
-                            except Exception:
-                                pass
+                        image_files.append((fid, name, mime or 'application/octet-stream', it.get('md5Checksum')))
+                logging.getLogger(__name__).debug('Found %d images in Drive folder %s', len(image_files), folder_id)
         except Exception:
             pass
 
+        fallback_text = article_text or ''
+        if getattr(settings, 'MONGODB_FILESTORE_ENABLED', False) and not gridfs_aml_assets and fallback_text.strip():
+            fallback_name = f"{self.slug}-article.aml"
+            _, asset = ingest.ingest_aml(
+                fallback_name,
+                fallback_text,
+                slug=self.slug,
+                generated='doc-export',
+                parse=False,
+            )
+            if asset:
+                gridfs_aml[fallback_name] = asset['file_id']
+                gridfs_aml_assets.append(asset)
+                if fallback_name not in aml_files:
+                    aml_files[fallback_name] = fallback_text
+
+        from . import image_index, image_meta, transfer
+        media_service = drive.per_thread_service(
+            lambda: drive.get_drive_service(getattr(settings, 'GOOGLE_SERVICE_ACCOUNT_FILE', None) or ''),
+            service,
+        )
+        # Width/height/colour/LQIP per image, keyed by Drive md5Checksum and computed once
+        metadata = image_meta.MetadataCollector(self.images) if image_meta.enabled() and service else None
+        if metadata:
+            metadata.prime(md5 for _, _, _, md5 in image_files)
+        s3_uploads = {}  # Drive file id -> streamed S3 upload of the original
+
+        # Download images only when storing in GridFS. Each image is streamed chunk by chunk from
+        # Drive into GridFS on an upload worker (and, with DRIVE_STREAM_TO_S3, into an S3 multipart
+        # upload of the original); the package_assets index is written once they are stored.
+        if getattr(settings, 'MONGODB_FILESTORE_ENABLED', False):
+            stream_to_s3 = getattr(settings, 'DRIVE_STREAM_TO_S3', False)
+            # Bytes any package already stored (same Drive md5) are linked, not downloaded again;
+            # S3 originals are keyed per package, so those images are always streamed
+            reused = {} if stream_to_s3 else image_index.stored_copies(md5 for _, _, _, md5 in image_files)
+
+            def _media(fid):
+                # The service is looked up on the first next(), i.e. on the upload worker consuming it
+                yield from transfer.iter_drive_media(media_service(), fid)
+
+            def _chunks(fid, name, mime, md5):
+                chunks = _media(fid)
+                writers = []
+                if stream_to_s3:
+                    from .s3_upload import open_original_upload
+                    try:
+                        upload = open_original_upload(self.slug, name, mime, md5)
+                        if upload:
+                            s3_uploads[fid] = upload
+                        writers.append(upload)
+                    except Exception:
+                        logging.getLogger(__name__).exception('Could not start S3 upload for %s', name)
+                if metadata:
+                    writers.append(metadata.capture(md5))
+                writers = [w for w in writers if w]
+                return transfer.tee(chunks, *writers) if writers else chunks
+
+            def _downloads():
+                for fid, name, mime, md5 in image_files:
+                    if md5 not in reused:
+                        yield name, _chunks(fid, name, mime, md5), {'contentType': mime, 'assetType': 'image', 'sourceId': fid, 'source': 'drive'}
+
+            try:
+                from .file_store import store_many, update_package_asset_index
+                stored = store_many(_downloads(), slug=self.slug)
+                by_source = {a['source_id']: a for a in stored}
+                for fid, name, mime, md5 in image_files:
+                    if md5 in reused:
+                        by_source[fid] = {
+                            'name': name, 'file_id': reused[md5], 'asset_type': 'image',
+                            'content_type': mime, 'source': 'drive', 'source_id': fid,
+                        }
+                gridfs_image_assets = [by_source[fid] for fid, _, _, _ in image_files if fid in by_source]
+                update_package_asset_index(self.slug, aml_assets=gridfs_aml_assets, image_assets=gridfs_image_assets)
+            except Exception:
+                gridfs_image_assets = []
+            # Persisted images link to /files/<id>/ (serves image from GridFS)
+            gridfs_images = [
+                {'name': a['name'], 'id': a['file_id'], 'content_type': a['content_type']}
+                for a in gridfs_image_assets
+            ]
+
+        if metadata:
+            # Images not captured from a GridFS upload (Drive-only mode, failed uploads)
+            metadata.fetch_missing(
+                ((md5, fid) for fid, _, _, md5 in image_files),
+                lambda fid: b''.join(transfer.iter_drive_media(media_service(), fid)),
+                max_workers=drive_crawler.crawl_workers(),
+            )
+            known = metadata.results()
+            md5_by_id = {fid: md5 for fid, _, _, md5 in image_files}
+            for entry, (_, _, _, md5) in zip(gdrive_images, image_files):
+                image_meta.annotate(entry, md5, known)
+            for entry, asset in zip(gridfs_images, gridfs_image_assets):
+                image_meta.annotate(entry, md5_by_id.get(asset['source_id']), known)
+
         """ Replace cached fields with the freshly fetched content,
         
         just in case if we want to edit the .aml and images later """
@@ -411,34 +361,15 @@ class Package(models.Model):
         if getattr(settings, 'MONGODB_FILESTORE_ENABLED', False) and gridfs_images:
             images_payload['gridfs'] = gridfs_images
         self.images = images_payload
-        
-        fallback_text = self.cached_article_preview or ''
-        if getattr(settings, 'MONGODB_FILESTORE_ENABLED', False) and not gridfs_aml_assets and fallback_text.strip():
-            try:
-                from .file_store import store_text
-                fallback_name = f"{self.slug}-article.aml"
-                file_id = store_text(
-                    name=fallback_name,
-                    text=fallback_text,
-                    content_type='text/plain; charset=utf-8',
-                    slug=self.slug,
-                    asset_type='aml',
-                    extra_metadata={'source': 'drive', 'generated': 'doc-export'},
-                )
-                gridfs_aml[fallback_name] = file_id
-                gridfs_aml_assets.append({
-                    'name': fallback_name,
-                    'file_id': file_id,
-                    'asset_type': 'aml',
-                    'content_type': 'text/plain; charset=utf-8',
-                    'source': 'drive',
-                    'source_id': None,
-                    'generated': 'doc-export',
-                })
-                if fallback_name not in aml_files:
-                    aml_files[fallback_name] = fallback_text
-            except Exception:
-                pass
+        # Only originals whose upload completed are in S3
+        s3_keys = {fid: upload.key for fid, upload in s3_uploads.items() if upload.completed}
+        try:
+            image_index.replace(self, images_payload, {
+                fid: {'content_type': mime, 'content_hash': md5, 's3_key': s3_keys.get(fid)}
+                for fid, _, mime, md5 in image_files
+            })
+        except Exception:
+            logging.getLogger(__name__).exception('Failed to index images for %s', self.slug)
 
         """ Store AML data exactly as fetched so subsequent loads match Drive content """
         data_out = aml_files
@@ -452,27 +383,18 @@ class Package(models.Model):
         self.save()
         print(f"[FETCH] Fetch completed successfully!")
 
-        if getattr(settings, 'MONGODB_FILESTORE_ENABLED', False):
-            try:
-                from .file_store import update_package_asset_index
-                update_package_asset_index(
-                    self.slug,
-                    aml_assets=gridfs_aml_assets,
-                    image_assets=gridfs_image_assets,
-                )
-            except Exception:
-                pass
-
+        # Skipped when the content is unchanged; stored as a delta against the previous version
         try:
-            PackageVersion.objects.create(
-                package=self,
-                article_data=self.cached_article_preview or '',
-                data=self.data or {},
-                creator=user if getattr(user, 'is_authenticated', False) else None,
-                version_description=f"New PackageVersion created on {dj_tz.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            from .versioning import record_version
+            record_version(
+                self,
+                user,
+                description=f"New PackageVersion created on {dj_tz.now().strftime('%Y-%m-%d %H:%M:%S')}",
             )
         except Exception:
-            pass
+            logging.getLogger(__name__).exception('Failed to record version for %s', self.slug)
+        # The new version is part of the package's cached API data too
+        self.invalidate_cache()
 
         return self
     
@@ -485,16 +407,151 @@ class Package(models.Model):
            self.slug = s
 
 
+@receiver(post_delete, sender=Package)
+def _invalidate_deleted_package(sender, instance, **kwargs):
+    # A signal rather than delete() so queryset deletes (e.g. the admin bulk action) are covered
+    instance.invalidate_cache()
+
+
+class PackageContent(models.Model):
+    """The fetched article text, AML data and images JSON of a package.
+
+    Kept off the ``Package`` row so listings, pins and deletes do not read and
+    decode whole articles; ``Package`` proxies the three fields.
+    """
+    package = models.OneToOneField(Package, on_delete=models.CASCADE, primary_key=True, related_name='content')
+    cached_article_preview = models.TextField(blank=True, default='')
+    images = models.JSONField(default=dict, blank=True)
+    data = CompressedJSONField(default=dict, blank=True)
+    # Headline/author/articleType... of the main document, as plain JSON so packages can be filtered
+    # without decoding ``data``; GIN-indexed on PostgreSQL (migration 0014)
+    meta = models.JSONField(default=dict, blank=True, editable=False)
+
+    def __str__(self):
+        return f"PackageContent({self.package_id})"
+
+    def save(self, *args, **kwargs):
+        from .aml import article_meta
+        self.meta = article_meta(self.data)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'data' in update_fields and 'meta' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'meta']
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def meta_filter(prefix='', **fields):
+        """A Q matching packages whose ``meta`` has these values: a GIN-indexed ``@>`` on PostgreSQL,
+        key lookups where JSON containment is not supported (SQLite)."""
+        from django.db import connection
+        if connection.features.supports_json_field_contains:
+            return models.Q(**{f'{prefix}meta__contains': fields})
+        return models.Q(**{f'{prefix}meta__{key}': value for key, value in fields.items()})
+
+
+class PackageImage(models.Model):
+    """One image of a package, in Drive listing order (see ``packages.image_index``).
+
+    Rewritten by every fetch alongside the ``Package.images`` JSON the API returns;
+    the Drive and stored copies of a file are one row, and ``content_hash`` (the
+    Drive md5Checksum) finds the same bytes across packages.
+    """
+    package = models.ForeignKey(Package, on_delete=models.CASCADE, related_name='package_images')
+    name = models.CharField(max_length=512)
+    order = models.PositiveIntegerField(default=0)
+    drive_file_id = models.CharField(max_length=128, blank=True)
+    gridfs_id = models.CharField(max_length=64, blank=True)
+    s3_key = models.CharField(max_length=1024, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    content_type = models.CharField(max_length=128, blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    bytes = models.PositiveBigIntegerField(null=True, blank=True)
+    color = models.CharField(max_length=16, blank=True)
+    lqip = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['package', 'order']
+        indexes = [
+            models.Index(fields=['drive_file_id'], name='packageimage_drive_id'),
+            models.Index(fields=['content_hash'], name='packageimage_hash'),
+            models.Index(fields=['gridfs_id'], name='packageimage_gridfs_id'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['package', 'drive_file_id'],
+                condition=~models.Q(drive_file_id=''),
+                name='packageimage_unique_drive_file',
+            ),
+        ]
+
+    def __str__(self):
+        return f"PackageImage({self.package_id}: {self.name})"
+
+
+class CacheEvent(models.Model):
+    """A cache invalidation (list of tags) for the other workers to apply (see packages.cache_bus)."""
+    tags = models.JSONField(default=list)
+    origin = models.CharField(max_length=32, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"CacheEvent({self.pk}: {', '.join(self.tags)})"
+
+
 class PackageVersion(models.Model):
+    """A point in a package's fetch history.
+
+    Keyframes hold the full ``article_data``/``data``; other versions leave them empty
+    and store a JSON Patch ``delta`` against ``base`` (see ``packages.versioning``).
+    Use ``content()`` to get the full content of any version.
+    """
     package = models.ForeignKey(Package, on_delete=models.CASCADE, related_name='versions')
     article_data = models.TextField(blank=True)
-    data = models.JSONField(default=dict, blank=True)
+    data = CompressedJSONField(default=dict, blank=True)
     creator = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     version_description = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    content_hash = models.CharField(max_length=64, blank=True)
+    is_keyframe = models.BooleanField(default=True)
+    base = models.ForeignKey('self', on_delete=models.RESTRICT, null=True, blank=True, related_name='deltas')
+    delta = models.JSONField(null=True, blank=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['package', '-created_at'], name='packageversion_pkg_created'),
+        ]
 
     def __str__(self):
         return f"Version {self.pk} of {self.package.slug}"
+
+    def content(self):
+        from .versioning import reconstruct
+        return reconstruct(self)
+
+
+class DriveFolder(models.Model):
+    """A pre-created Drive folder with an ``article.aml`` doc, kept in a pool for new packages.
+
+    Unclaimed rows have no ``claimed_at``; claiming renames the folder to the
+    package slug (see ``packages.drive_pool``).
+    """
+    folder_id = models.CharField(max_length=128, unique=True)
+    folder_url = models.URLField()
+    doc_id = models.CharField(max_length=128, blank=True)
+    doc_url = models.URLField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    package = models.OneToOneField(Package, on_delete=models.SET_NULL, null=True, blank=True, related_name='pooled_folder')
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['claimed_at', 'created_at'], name='drivefolder_unclaimed'),
+        ]
+
+    def __str__(self):
+        return f"DriveFolder({self.folder_id})"
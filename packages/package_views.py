@@ -7,6 +7,15 @@ from .models import Package
 from .forms import PackageForm
 from django.conf import settings
 from . import drive
+from . import file_cache
+from . import image_index
+from . import image_meta
+from . import image_variants
+from . import provisioning
+from . import singleflight
+from django.utils import timezone
+from . import cache as package_cache
+from django.utils.functional import cached_property
 from django.http import JsonResponse, HttpResponseNotFound, HttpResponseForbidden
 import os
 import logging
@@ -15,14 +24,6 @@ try:
     import archieml
 except Exception:
     archieml = None
-try:
-    from google.oauth2 import service_account
-    from googleapiclient.discovery import build
-    from googleapiclient.errors import HttpError
-except Exception:
-    service_account = None
-    build = None
-    HttpError = Exception
 
 
 @login_required
@@ -39,7 +40,8 @@ def search_packages(request):
         else:
             packages = Package.objects.all()
         
-        page_obj, visible_page_range = paginate_package_list(request, packages)
+        page_obj, visible_page_range = paginate_package_list(
+            request, packages, count_key=package_cache.make_key('search:count', query))
     except Exception as e:
         logger.exception('Error during search: %s', e)
         messages.error(request, 'An error occurred while searching. Please try again.')
@@ -58,10 +60,8 @@ def search_packages(request):
             pkg = form.save()
             logger.info('Package saved via form: %s (id=%s)', pkg.slug, pkg.pk)
             messages.success(request, f'Package {pkg.slug} created')
-            try:
-                pkg.setup_and_save(request.user, '')
-            except Exception:
-                logging.getLogger(__name__).exception('setup_and_save failed for %s', pkg.slug)
+            if pkg.drive_status == Package.DRIVE_PENDING:
+                provisioning.start(pkg)
             
             if query:
                 return redirect(f'/search/?{urlencode({"q": query})}')
@@ -80,6 +80,7 @@ def search_packages(request):
         'categories': categories,
         'active_category': '',
         'search_query': query,
+        **_list_cache_context(),
     })
 
 
@@ -91,7 +92,8 @@ def packages_list(request):
     else:
         packages = Package.objects.all()
 
-    page_obj, visible_page_range = paginate_package_list(request, packages)
+    page_obj, visible_page_range = paginate_package_list(
+        request, packages, count_key=package_cache.make_key('list:count', category or ''))
 
     form = PackageForm()
     if request.method == 'POST':
@@ -105,10 +107,8 @@ def packages_list(request):
             pkg = form.save()
             logger.info('Package saved via form: %s (id=%s)', pkg.slug, pkg.pk)
             messages.success(request, f'Package {pkg.slug} created')
-            try:
-                pkg.setup_and_save(request.user, '')
-            except Exception:
-                logging.getLogger(__name__).exception('setup_and_save failed for %s', pkg.slug)
+            if pkg.drive_status == Package.DRIVE_PENDING:
+                provisioning.start(pkg)
 
             # Redirect to the category of the newly created package
             if pkg.category:
@@ -127,11 +127,35 @@ def packages_list(request):
         'form': form,
         'categories': categories,
         'active_category': category or '',
-        'search_query': '',  
+        'search_query': '',
+        **_list_cache_context(),
     })
 
-def paginate_package_list(request, queryset, items_per_page=10, pages_in_block=3):
-    paginator = Paginator(queryset, items_per_page)
+class _CachedCountPaginator(Paginator):
+    """Paginator whose total comes from the package cache (the rows are in a cached fragment)."""
+
+    def __init__(self, *args, count_key=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._count_key = count_key
+
+    @cached_property
+    def count(self):
+        compute = lambda: Paginator.count.func(self)
+        if not self._count_key:
+            return compute()
+        return package_cache.get_or_set(self._count_key, compute, [package_cache.PACKAGES])
+
+
+def _list_cache_context():
+    """Context for the cached row fragment of packages_list.html."""
+    return {
+        'packages_version': package_cache.tag_version(package_cache.PACKAGES),
+        'fragment_timeout': getattr(settings, 'CACHE_TIMEOUT', 600),
+    }
+
+
+def paginate_package_list(request, queryset, items_per_page=10, pages_in_block=3, count_key=None):
+    paginator = _CachedCountPaginator(queryset, items_per_page, count_key=count_key)
     page_number = request.GET.get('page', 1)
     page_obj = paginator.get_page(page_number)
 
@@ -169,6 +193,13 @@ def _strip_footnote_keys(data):
     return out
 
 
+def _copy_image_metadata(item, entry):
+    """ Carry width/height/bytes/color/lqip recorded at fetch (see image_meta) over to the template entry """
+    for key in image_meta.FIELDS:
+        if key in item:
+            entry[key] = item[key]
+
+
 """ This new function will flatten the stored image in google drive into a simple list for templates """
 def _format_images(images_data, request=None, slug=None):
     """ Convert stored images data into a flat list of images with name and URL for templates.
@@ -200,9 +231,11 @@ def _format_images(images_data, request=None, slug=None):
                 entry = {
                     'name': name,
                     'url': full_url,
+                    'thumb_url': image_variants.thumbnail_url(full_url),
                     'source': 'gridfs',
                     'link_url': full_url,
                 }
+                _copy_image_metadata(item, entry)
                 images_by_name[name] = entry
 
         # Drive-only images: link = /packages/<slug>/image/<fid>/ (app proxies from Drive)
@@ -214,9 +247,11 @@ def _format_images(images_data, request=None, slug=None):
                 entry = {
                     'name': name,
                     'url': full_url,
+                    'thumb_url': image_variants.thumbnail_url(full_url),
                     'source': 'gdrive',
                     'link_url': full_url,
                 }
+                _copy_image_metadata(item, entry)
                 images_by_name[name] = entry
     elif isinstance(images_data, list):
         if request:
@@ -231,10 +266,43 @@ def _format_images(images_data, request=None, slug=None):
     return list(images_by_name.values())
 
 
+def _format_image_rows(rows, request=None, slug=None):
+    """ Template entries (as _format_images) for PackageImage rows, already merged and ordered at fetch """
+    result = []
+    for row in rows:
+        if row.gridfs_id:
+            raw_url, source = f"/files/{row.gridfs_id}/", 'gridfs'
+        else:
+            raw_url, source = f"/packages/{slug}/image/{row.drive_file_id}/", 'gdrive'
+        full_url = request.build_absolute_uri(raw_url) if request else raw_url
+        entry = {
+            'name': row.name,
+            'url': full_url,
+            'thumb_url': image_variants.thumbnail_url(full_url),
+            'source': source,
+            'link_url': full_url,
+        }
+        for key in image_meta.FIELDS:
+            value = getattr(row, key)
+            if value is not None and value != '':
+                entry[key] = value
+        result.append(entry)
+    return result
+
+
+def _package_images(pkg, request=None):
+    """ Images for the detail/fetch payload: the package's PackageImage rows, or its images JSON
+    for packages not fetched (or backfilled) since the table was added """
+    rows = list(pkg.package_images.all())
+    if rows:
+        return _format_image_rows(rows, request=request, slug=pkg.slug)
+    return _format_images(pkg.images, request=request, slug=pkg.slug)
+
+
 @login_required
 def package_detail(request, slug):
     try:
-        pkg = Package.objects.get(slug=slug)
+        pkg = Package.objects.select_related('content').get(slug=slug)
     except Package.DoesNotExist:
         return HttpResponseNotFound('Package not found')
 
@@ -249,7 +317,7 @@ def package_detail(request, slug):
         'article': pkg.cached_article_preview or '',
         'aml_files': _data,
         'data': _data,
-        'images': _format_images(pkg.images, request=request, slug=pkg.slug),
+        'images': _package_images(pkg, request),
     }
 
     return render(request, 'packages/package_view.html', {
@@ -375,13 +443,21 @@ def _read_local_sample(slug: str):
 @login_required
 def package_fetch(request, slug):
     try:
-        pkg = Package.objects.get(slug=slug)
+        pkg = Package.objects.select_related('content').get(slug=slug)
     except Package.DoesNotExist:
         return JsonResponse({'error': 'Package not found'}, status=404)
 
+    started = timezone.now()
+
+    def fetched_meanwhile():
+        # Another worker finished a fetch of this package while we waited for its lock
+        last = Package.objects.filter(pk=pkg.pk).values_list('last_fetched_date', flat=True).first()
+        return True if last and last >= started else None
+
     # Persist fetched data in the database so it survives refresh/reopen
     try:
-        pkg.fetch_from_gdrive(request.user)
+        # Simultaneous fetches of one package (double clicks, several editors) run once
+        singleflight.do(f'fetch:{pkg.pk}', lambda: pkg.fetch_from_gdrive(request.user), recheck=fetched_meanwhile)
         pkg.refresh_from_db()  # ensure we respond with the latest persisted state
         _data = _strip_footnote_keys(pkg.data or {})
         return JsonResponse({
@@ -389,7 +465,7 @@ def package_fetch(request, slug):
             'article': pkg.cached_article_preview or '',
             'aml_files': _data,
             'data': _data,
-            'images': _format_images(pkg.images, request=request, slug=pkg.slug),
+            'images': _package_images(pkg, request),
             'last_fetched_date': pkg.last_fetched_date,
         })
     except Exception:
@@ -401,26 +477,87 @@ def package_fetch(request, slug):
 
     return JsonResponse({'error': 'Unable to fetch package content from Drive and no local sample available.'}, status=500)
 
+# Drive fields the image proxy needs: content type, download name and the revision for variant keys
+DRIVE_IMAGE_FIELDS = 'mimeType,name,md5Checksum,modifiedTime'
+
+
+def drive_metadata_key(file_id):
+    return package_cache.make_key('drive-meta', file_id)
+
+
+def image_lookup(slug, file_id):
+    """(package exists, Drive metadata for the image or None).
+
+    Images recorded at the last fetch are answered from their PackageImage row
+    (one indexed query, no Drive call); others from the metadata cache.
+    """
+    exists, known = image_index.lookup(slug, file_id)
+    if not exists or known is not None:
+        return exists, known
+    return True, package_cache.get(drive_metadata_key(file_id))
+
+
 def package_image(request, slug, file_id):
       """Serve package image from Drive. Public so image URLs work when embedded in AML/flat pages (no login)."""
-      try:
-          pkg = Package.objects.get(slug=slug)
-      except Package.DoesNotExist:
+      exists, file_metadata = image_lookup(slug, file_id)
+      if not exists:
           return HttpResponseNotFound('Package not found')
 
-      sa_file = getattr(settings, 'GOOGLE_SERVICE_ACCOUNT_FILE', None)
-      if not sa_file or not service_account or not build:
+      try:
+          service = drive.get_drive_service(getattr(settings, 'GOOGLE_SERVICE_ACCOUNT_FILE', None) or '')
+      except Exception:
+          logging.getLogger(__name__).exception('Failed to build Drive service for package %s', slug)
+          service = None
+      if service is None:
           return HttpResponseNotFound('Google Drive not configured')
 
-      try:
-          scopes = ['https://www.googleapis.com/auth/drive']
-          creds = service_account.Credentials.from_service_account_file(sa_file, scopes=scopes)
-          service = build('drive', 'v3', credentials=creds, cache_discovery=False)
+      # Concurrent requests for the same image share one metadata lookup and one download
+      def download():
+          return singleflight.do(
+              f'drive-media:{file_id}:{version}',
+              lambda: service.files().get_media(fileId=file_id).execute(),
+          )
 
-          file_metadata = service.files().get(fileId=file_id, fields='mimeType,name').execute()
+      try:
+          if file_metadata is None:
+              file_metadata = package_cache.get_or_set(
+                  drive_metadata_key(file_id),
+                  lambda: singleflight.do(
+                      f'drive-meta:{file_id}',
+                      lambda: service.files().get(fileId=file_id, fields=DRIVE_IMAGE_FIELDS).execute(),
+                  ),
+                  [package_cache.package_tag(slug)],
+                  getattr(settings, 'DRIVE_METADATA_CACHE_TIMEOUT', 60),
+              )
           mime_type = file_metadata.get('mimeType', 'image/jpeg')
 
-          media = service.files().get_media(fileId=file_id).execute()
+          # Resized variants are keyed by the Drive revision; the proxy URL itself is not
+          # versioned, so browsers revalidate (ETag) after IMAGE_VARIANT_PROXY_MAX_AGE.
+          version = file_metadata.get('md5Checksum') or file_metadata.get('modifiedTime') or ''
+          variant_response = image_variants.serve(
+              request,
+              f'drive:{file_id}:{version}',
+              download,
+              mime_type,
+              cache_control=f"public, max-age={getattr(settings, 'IMAGE_VARIANT_PROXY_MAX_AGE', 3600)}",
+              filename=file_metadata.get('name') or '',
+          )
+          if variant_response is not None:
+              return variant_response
+
+          # With FILE_DISK_CACHE the server sends the image from the local disk cache (sendfile / X-Accel-Redirect)
+          key = f'drive:{file_id}:{version}'
+          entry = file_cache.get(key) if file_cache.enabled() else None
+          response = file_cache.response(entry) if entry is not None else None
+          if response is not None:
+              return response
+
+          media = download()
+          if file_cache.enabled():
+              entry = file_cache.put(key, media, mime_type, file_metadata.get('name') or '')
+              response = file_cache.response(entry) if entry is not None else None
+              if response is not None:
+                  return response
 
           from django.http import HttpResponse
           return HttpResponse(media, content_type=mime_type)
@@ -429,6 +566,31 @@ def package_image(request, slug, file_id):
           logging.getLogger(__name__).exception('Failed to fetch image %s for package %s', file_id, slug)
           return HttpResponseNotFound('Image not found')
 
+@login_required
+def package_assets_zip(request, slug):
+    """Stream every AML file and image of a package as one ZIP (stored, constant memory, exact Content-Length)."""
+    from django.http import HttpResponse, StreamingHttpResponse
+    from . import archive, zipstream
+
+    try:
+        pkg = Package.objects.select_related('content').get(slug=slug)
+    except Package.DoesNotExist:
+        return HttpResponseNotFound('Package not found')
+
+    try:
+        entries = archive.package_entries(pkg)
+        zipstream.check_limits(entries)
+    except zipstream.ZipTooLarge as e:
+        return HttpResponse(str(e), status=413)
+    except Exception:
+        logging.getLogger(__name__).exception('Failed to list assets for package %s', slug)
+        return HttpResponse('Could not list package assets', status=502)
+
+    response = StreamingHttpResponse(zipstream.stream_zip(entries), content_type='application/zip')
+    response['Content-Length'] = str(zipstream.archive_size(entries))
+    response['Content-Disposition'] = f'attachment; filename="{slug}-assets.zip"'
+    return response
+
 @login_required
 def package_delete(request, pk):
     package = get_object_or_404(Package, pk=pk)
@@ -0,0 +1,163 @@
+"""Drive folder provisioning for packages, off the request path.
+
+Creating a package only writes its row (``drive_status='pending'``). ``start``
+then gives it a folder from the warm pool (``packages.drive_pool``) when one is
+available: a single rename, so the folder and ``article.aml`` links are ready
+when the request returns. Otherwise the package is queued: once the
+transaction commits it goes to a small in-process thread pool of
+``DRIVE_PROVISION_WORKERS`` threads (0 leaves it to the ``provision_packages``
+command), which also refills the folder pool. ``provision`` claims the row with
+a conditional UPDATE so only one worker handles it, gets a folder, makes sure
+it holds an ``article.aml`` doc and records the outcome in ``drive_status`` /
+``drive_error``. Results are written with ``QuerySet.update`` so a slow Drive
+call never overwrites edits made to the package in the meantime.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from . import cache, drive, drive_pool
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def provision_workers() -> int:
+    return max(0, int(getattr(settings, 'DRIVE_PROVISION_WORKERS', 2) or 0))
+
+
+def _get_executor() -> Optional[ThreadPoolExecutor]:
+    global _executor
+    workers = provision_workers()
+    if workers == 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='drive-provision')
+        return _executor
+
+
+def _run(func, *args) -> None:
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Background Drive task %s%r crashed', func.__name__, args)
+    finally:
+        close_old_connections()
+
+
+def _schedule(func, *args) -> None:
+    """Run ``func(*args)`` on the provisioning threads once the transaction commits."""
+    def submit():
+        executor = _get_executor()
+        if executor is not None:
+            executor.submit(_run, func, *args)
+    transaction.on_commit(submit)
+
+
+def _set(pkg, **fields) -> None:
+    from .models import Package
+
+    Package.objects.filter(pk=pkg.pk).update(**fields)
+    for name, value in fields.items():
+        setattr(pkg, name, value)
+    cache.invalidate_package(pkg.slug, pkg.category)
+
+
+def enqueue(pkg) -> None:
+    """Mark ``pkg`` pending and provision it in the background after commit."""
+    from .models import Package
+
+    _set(pkg, drive_status=Package.DRIVE_PENDING, drive_error='')
+    _schedule(provision, pkg.pk)
+
+
+def start(pkg) -> bool:
+    """Set up a new package's Drive folder; True when it was ready straight from the pool."""
+    from .models import Package
+
+    folder = drive_pool.claim(pkg) if not pkg.google_drive_id else None
+    if folder is not None:
+        _set(pkg, google_drive_id=folder.folder_id, google_drive_url=folder.folder_url, article_doc_url=folder.doc_url)
+        _schedule(drive_pool.replenish)
+        if folder.doc_url:
+            _set(pkg, drive_status=Package.DRIVE_READY, drive_error='')
+            return True
+    # Provisioning also fills in a doc missing from a pooled folder
+    enqueue(pkg)
+    return False
+
+
+def _claim(pk: int, retry_failed: bool) -> bool:
+    from .models import Package
+
+    statuses = [Package.DRIVE_PENDING, Package.DRIVE_FAILED] if retry_failed else [Package.DRIVE_PENDING]
+    return Package.objects.filter(pk=pk, drive_status__in=statuses).update(
+        drive_status=Package.DRIVE_RUNNING, drive_error='') == 1
+
+
+def _create_folder(pkg) -> Optional[dict]:
+    drive_settings = pkg._get_drive_settings()
+    return drive.create_drive_folder(
+        pkg.slug,
+        parent_id=drive_settings['parent_id'],
+        service_account_file=drive_settings['service_account_file'],
+        impersonate_user=drive_settings['impersonate_user'],
+        share_public=drive_settings['share_public'],
+        share_domain=drive_settings['share_domain'],
+        share_role=drive_settings['share_role'],
+    )
+
+
+def provision(pk: int, *, retry_failed: bool = False) -> bool:
+    """Provision package ``pk`` if it is pending (or failed, with ``retry_failed``).
+
+    Returns True when the package ends up with a Drive folder; False when it was
+    not claimable or provisioning failed (the error is kept in ``drive_error``).
+    """
+    from .models import Package
+
+    if not _claim(pk, retry_failed):
+        return False
+    pkg = Package.objects.get(pk=pk)
+    fields = {}
+    try:
+        if not pkg.google_drive_id:
+            folder = drive_pool.claim(pkg)
+            if folder is not None:
+                fields.update(google_drive_id=folder.folder_id, google_drive_url=folder.folder_url,
+                              article_doc_url=folder.doc_url)
+                _schedule(drive_pool.replenish)
+            else:
+                created = _create_folder(pkg)
+                if not (isinstance(created, dict) and created.get('id')):
+                    raise RuntimeError('Drive folder could not be created')
+                fields['google_drive_id'] = created['id']
+                fields['google_drive_url'] = created.get('url') or f"https://drive.google.com/drive/folders/{created['id']}"
+        if not (fields.get('article_doc_url') or pkg.article_doc_url):
+            drive_settings = pkg._get_drive_settings()
+            doc = drive.ensure_article_doc_in_folder(
+                fields.get('google_drive_id') or pkg.google_drive_id,
+                service_account_file=drive_settings['service_account_file'],
+                impersonate_user=drive_settings['impersonate_user'],
+                share_role=drive_settings['share_role'],
+            )
+            if doc is None:
+                logger.warning('Could not create article.aml for %s', pkg.slug)
+            elif doc.get('url'):
+                fields['article_doc_url'] = doc['url']
+    except Exception as e:
+        logger.warning('Drive provisioning failed for %s: %s', pkg.slug, e)
+        Package.objects.filter(pk=pk).update(drive_status=Package.DRIVE_FAILED, drive_error=str(e)[:1000], **fields)
+        cache.invalidate_package(pkg.slug, pkg.category)
+        return False
+    Package.objects.filter(pk=pk).update(drive_status=Package.DRIVE_READY, drive_error='', **fields)
+    cache.invalidate_package(pkg.slug, pkg.category)
+    logger.info('Provisioned Drive folder for %s', pkg.slug)
+    return True
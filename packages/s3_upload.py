@@ -10,10 +10,12 @@ from pathlib import Path
 
 from django.conf import settings
 
+from . import image_pool
+
 logger = logging.getLogger(__name__)
 
 # Max dimension for resized images (same as Kerckhoff)
-MAX_IMAGE_SIZE = 1024
+MAX_IMAGE_SIZE = image_pool.MAX_IMAGE_SIZE
 
 
 def _s3_enabled():
@@ -54,26 +56,9 @@ def _get_s3_client():
 
 
 def _resize_image(data: bytes, content_type: str, max_size: int = MAX_IMAGE_SIZE) -> bytes:
-    """Resize image so no side exceeds max_size. Returns bytes in same format."""
+    """Resize image so no side exceeds max_size (as JPEG) in the image process pool."""
     try:
-        from PIL import Image
-        import io
-        img = Image.open(io.BytesIO(data))
-        if img.mode in ('RGBA', 'P'):
-            img = img.convert('RGB')
-        w, h = img.size
-        if w <= max_size and h <= max_size:
-            out = io.BytesIO()
-            img.save(out, format='JPEG', quality=85)
-            return out.getvalue()
-        if w >= h:
-            new_w, new_h = max_size, int(h * max_size / w)
-        else:
-            new_w, new_h = int(w * max_size / h), max_size
-        img = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-        out = io.BytesIO()
-        img.save(out, format='JPEG', quality=85)
-        return out.getvalue()
+        return image_pool.submit_resize(data, max_size).result()
     except Exception as e:
         logger.warning('Resize failed, using original bytes: %s', e)
         return data
@@ -96,16 +81,9 @@ def upload_image_to_s3(
     if not client:
         return None
 
-    path = Path(original_filename)
-    stem = path.stem
-
-    try:
-        resized = _resize_image(image_bytes, content_type)
-        image_hash = hashlib.md5(resized).hexdigest()
-    except Exception as e:
-        logger.warning('Resize failed for %s: %s', original_filename, e)
-        resized = image_bytes
-        image_hash = hashlib.md5(resized).hexdigest()
+    stem = Path(original_filename).stem
+    resized = _resize_image(image_bytes, content_type)
+    image_hash = hashlib.md5(resized).hexdigest()
 
     # Resized output is always JPEG; key matches Kerckhoff: images/{slug}/{stem}-{hash}.jpg
     key = f"images/{package_slug}/{stem}-{image_hash}.jpg"
@@ -126,3 +104,95 @@ def upload_image_to_s3(
     except Exception as e:
         logger.exception('S3 upload failed for %s: %s', key, e)
         return None
+
+
+# S3 rejects multipart parts under 5 MiB (except the last one)
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class MultipartUpload:
+    """Writable S3 object: ``write`` chunks, then ``close`` (or ``abort``).
+
+    Chunks are buffered only up to ``part_size`` and sent as multipart parts, so
+    memory stays at one part however large the object is. The multipart upload is
+    only created when the first part goes out, so an upload that is never written
+    leaves nothing open in S3. The MD5 of the content is computed on the way; with
+    ``expected_md5`` a mismatch fails ``close``. ``completed`` is set once the
+    object exists.
+    """
+
+    def __init__(self, client, bucket: str, key: str, content_type: str, *,
+                 part_size: int = MIN_PART_SIZE, expected_md5: str | None = None, acl: str = 'public-read'):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.content_type = content_type or 'application/octet-stream'
+        self.acl = acl
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.expected_md5 = expected_md5
+        self.md5 = hashlib.md5()
+        self.completed = False
+        self._buffer = bytearray()
+        self._parts = []
+        self._upload_id = None
+
+    def write(self, data: bytes) -> int:
+        self.md5.update(data)
+        self._buffer += data
+        while len(self._buffer) >= self.part_size:
+            self._send(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+        return len(data)
+
+    def _send(self, body: bytes) -> None:
+        if self._upload_id is None:
+            self._upload_id = self.client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, ContentType=self.content_type, ACL=self.acl,
+            )['UploadId']
+        number = len(self._parts) + 1
+        resp = self.client.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload_id, PartNumber=number, Body=body,
+        )
+        self._parts.append({'PartNumber': number, 'ETag': resp['ETag']})
+
+    def close(self) -> None:
+        if self.expected_md5 and self.md5.hexdigest() != self.expected_md5:
+            raise ValueError(f'MD5 mismatch for {self.key}: got {self.md5.hexdigest()}, expected {self.expected_md5}')
+        if self._buffer or not self._parts:
+            self._send(bytes(self._buffer))
+            self._buffer = bytearray()
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload_id, MultipartUpload={'Parts': self._parts},
+        )
+        self.completed = True
+        logger.info('[S3] Uploaded %s in %d part(s)', self.key, len(self._parts))
+
+    def abort(self) -> None:
+        self._buffer = bytearray()
+        if self._upload_id is not None and not self.completed:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+            self._upload_id = None
+
+
+def open_original_upload(
+    package_slug: str,
+    original_filename: str,
+    content_type: str,
+    md5: str,
+    *,
+    part_size: int = MIN_PART_SIZE,
+) -> MultipartUpload | None:
+    """
+    Prepare a streaming upload of an unresized original to
+    images/{package_slug}/{stem}-{md5}{suffix}, using the Drive md5Checksum so the
+    key is known before the first byte arrives (S3 is first called on the first
+    part). Returns None if S3 is not configured.
+    """
+    client = _get_s3_client()
+    if not client or not md5:
+        return None
+    path = Path(original_filename)
+    key = f"images/{package_slug}/{path.stem}-{md5}{path.suffix.lower()}"
+    return MultipartUpload(
+        client, settings.AWS_STORAGE_BUCKET_NAME, key, content_type, part_size=part_size, expected_md5=md5,
+    )
@@ -0,0 +1,151 @@
+"""Request coalescing ("single flight") for expensive upstream reads.
+
+When many requests miss on the same thing at once (a just-published article's
+images, a package being fetched twice), ``do(key, fn)`` runs ``fn`` once per
+process: the first caller runs it and concurrent callers with the same key
+wait and share its result (or its exception).
+
+Callers that can see another process's result in a shared store (a stored
+image variant, a package row) also pass ``recheck``. The leader then takes a
+cross-process file lock for the key (one of ``LOCK_STRIPES`` files under
+``SINGLEFLIGHT_LOCK_DIR``) and calls ``recheck()`` once it holds it; a result
+other than None means another process did the work meanwhile and ``fn`` is
+skipped. Waiting for the lock gives up after ``SINGLEFLIGHT_LOCK_TIMEOUT``
+seconds and runs ``fn`` anyway.
+
+``ado(key, fn)`` is the same for coroutines on one event loop (the ASGI views).
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # not on POSIX: coalesce within the process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LOCK_STRIPES = 256
+
+_lock = threading.Lock()
+_calls = {}
+_async_calls = {}  # (event loop, key) -> Future
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _lock_dir() -> Optional[Path]:
+    if fcntl is None or not getattr(settings, 'SINGLEFLIGHT_CROSS_PROCESS', True):
+        return None
+    return Path(getattr(settings, 'SINGLEFLIGHT_LOCK_DIR', '') or Path(tempfile.gettempdir()) / 'oink-singleflight')
+
+
+class _FileLock:
+    """Exclusive ``flock`` on the stripe file for ``key``; a no-op when it cannot be taken."""
+
+    def __init__(self, key: str):
+        self._key = key
+        self._fd = None
+
+    def __enter__(self):
+        directory = _lock_dir()
+        if directory is None:
+            return self
+        stripe = int(hashlib.sha1(self._key.encode('utf-8')).hexdigest()[:8], 16) % LOCK_STRIPES
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            self._fd = os.open(directory / f'{stripe:03d}.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        except OSError:
+            logger.warning('Cannot open single-flight lock for %s', self._key, exc_info=True)
+            return self
+        deadline = time.monotonic() + float(getattr(settings, 'SINGLEFLIGHT_LOCK_TIMEOUT', 30) or 0)
+        while True:
+            try:
+                fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return self
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    logger.warning('Timed out waiting for the single-flight lock for %s', self._key)
+                    os.close(self._fd)
+                    self._fd = None
+                    return self
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+def do(key: str, fn: Callable, *, recheck: Optional[Callable] = None):
+    """Return ``fn()``, sharing one call among concurrent callers with the same ``key``."""
+    with _lock:
+        call = _calls.get(key)
+        leader = call is None
+        if leader:
+            call = _calls[key] = _Call()
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+    try:
+        if recheck is None:
+            call.result = fn()
+        else:
+            with _FileLock(key):
+                found = recheck()
+                call.result = found if found is not None else fn()
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            del _calls[key]
+        call.done.set()
+    return call.result
+
+
+async def ado(key: str, fn: Callable):
+    """Return ``await fn()``, sharing one call among concurrent coroutines with the same ``key``."""
+    loop = asyncio.get_running_loop()
+    future = _async_calls.get((loop, key))
+    if future is not None:
+        # Shielded: a follower going away must not cancel the leader's call
+        return await asyncio.shield(future)
+    future = _async_calls[(loop, key)] = loop.create_future()
+    try:
+        result = await fn()
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except BaseException as e:
+        future.set_exception(e)
+        future.exception()  # retrieved: the leader re-raises it even when nobody else waits
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        del _async_calls[(loop, key)]
+
+
+def in_flight() -> int:
+    """Number of keys currently being fetched (for tests and debugging)."""
+    with _lock:
+        return len(_calls) + len(_async_calls)
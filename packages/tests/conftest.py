@@ -0,0 +1,52 @@
+import io
+
+import pytest
+from django.core.cache import caches
+from django.test.utils import override_settings
+from PIL import Image
+
+import oink_project.mongo as mongo
+from packages import cache_bus, drive, hot_files
+from packages.benchmarks.support import mongomock_client
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Cached package data must not leak between tests (each test has a fresh database)."""
+    for cache in caches.all(initialized_only=True):
+        cache.clear()
+    cache_bus.reset()
+    hot_files.clear()
+    yield
+
+
+@pytest.fixture
+def fake_drive(tmp_path):
+    """Drive calls served from a temporary fake tree rooted at ``tmp_path``."""
+    with override_settings(DRIVE_BACKEND='fake', DRIVE_FAKE_ROOT=str(tmp_path), REPOSITORY_FOLDER_ID='repo'):
+        yield drive.get_drive_service()
+
+
+@pytest.fixture
+def mongo_db(monkeypatch):
+    """mongomock database standing in for MONGODB_URI, with the file store enabled."""
+    client = mongomock_client()
+    monkeypatch.setattr(mongo, 'get_client', lambda: client)
+    monkeypatch.setenv('MONGODB_DB_NAME', 'oink_test')
+    monkeypatch.setenv('MONGODB_BUCKET', 'files')
+    with override_settings(MONGODB_FILESTORE_ENABLED=True):
+        yield client['oink_test']
+
+
+@pytest.fixture
+def inline_pool():
+    """Run image pool work in the test process (modules opt in with ``usefixtures``)."""
+    with override_settings(IMAGE_POOL_WORKERS=0):
+        yield
+
+
+def jpeg(width=64, height=48, color=(10, 120, 200)) -> bytes:
+    """A solid ``color`` JPEG of ``width`` x ``height``."""
+    out = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(out, format='JPEG')
+    return out.getvalue()
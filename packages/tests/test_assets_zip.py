@@ -0,0 +1,66 @@
+import io
+import zipfile
+
+import pytest
+from django.contrib.auth.models import User
+from django.test.utils import override_settings
+
+from packages import zipstream
+from packages.benchmarks.support import populate_folder, synthetic_image
+from packages.models import Package
+
+
+@pytest.fixture
+def editor(client, db):
+    client.force_login(User.objects.create_user('editor'))
+    return client
+
+
+def _fetched(fake_drive, slug):
+    populate_folder(fake_drive.root, slug, images=3, blocks=5)
+    pkg = Package.objects.create(slug=slug, google_drive_url=f'https://drive.google.com/drive/folders/{slug}')
+    with override_settings(IMAGE_POOL_WORKERS=0):
+        pkg.fetch_from_gdrive(None)
+    return pkg
+
+
+def _download(editor, slug):
+    response = editor.get(f'/packages/{slug}/assets.zip')
+    assert response.status_code == 200 and response.streaming
+    body = b''.join(response.streaming_content)
+    assert int(response['Content-Length']) == len(body)
+    archive = zipfile.ZipFile(io.BytesIO(body))
+    assert archive.testzip() is None
+    return archive
+
+
+def test_stream_zip_matches_declared_size():
+    entries = [
+        zipstream.ZipEntry('a.txt', 3, lambda: [b'a', b'bc'], 0),
+        zipstream.ZipEntry('dir/ü.bin', 0, lambda: [], 0),
+    ]
+    body = b''.join(zipstream.stream_zip(entries))
+    assert len(body) == zipstream.archive_size(entries)
+    assert zipfile.ZipFile(io.BytesIO(body)).read('dir/ü.bin') == b''
+    assert zipstream.unique_names(['x.jpg', 'X.jpg', 'x']) == ['x.jpg', 'X (2).jpg', 'x']
+
+    with pytest.raises(ValueError):
+        b''.join(zipstream.stream_zip([zipstream.ZipEntry('short', 5, lambda: [b'abc'], 0)]))
+
+
+@pytest.mark.django_db
+def test_zip_reads_gridfs_assets(editor, fake_drive, mongo_db):
+    _fetched(fake_drive, 'zip-gridfs')
+    archive = _download(editor, 'zip-gridfs')
+
+    assert sorted(archive.namelist()) == ['aml/article.aml', 'images/photo-0.jpg', 'images/photo-1.jpg', 'images/photo-2.jpg']
+    assert archive.read('images/photo-1.jpg') == synthetic_image()
+
+
+@pytest.mark.django_db
+def test_zip_streams_drive_only_images(editor, fake_drive):
+    _fetched(fake_drive, 'zip-drive')
+    archive = _download(editor, 'zip-drive')
+
+    assert sorted(archive.namelist()) == ['aml/article.aml.json', 'images/photo-0.jpg', 'images/photo-1.jpg', 'images/photo-2.jpg']
+    assert archive.read('images/photo-0.jpg') == synthetic_image()
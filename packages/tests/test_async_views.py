@@ -0,0 +1,75 @@
+import asyncio
+import io
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncRequestFactory
+from django.test.utils import override_settings
+from PIL import Image
+
+from conftest import jpeg
+from packages import async_views, drive_async, file_store
+from packages.models import Package
+
+factory = AsyncRequestFactory()
+
+
+@pytest.fixture
+def drive_image(fake_drive):
+    (fake_drive.root / 'async-pkg').mkdir()
+    (fake_drive.root / 'async-pkg' / 'photo.jpg').write_bytes(jpeg(400, 300))
+    Package.objects.create(slug='async-pkg', google_drive_url='https://drive.google.com/drive/folders/async-pkg')
+    return fake_drive.files().list(q="'async-pkg' in parents").execute()['files'][0]['id']
+
+
+@pytest.mark.django_db
+def test_package_image_serves_original_and_variant(drive_image, tmp_path):
+    request = factory.get(f'/packages/async-pkg/image/{drive_image}/')
+    response = async_to_sync(async_views.package_image)(request, 'async-pkg', drive_image)
+    assert response.status_code == 200 and response['Content-Type'] == 'image/jpeg'
+    assert response.content == jpeg(400, 300)
+
+    with override_settings(IMAGE_POOL_WORKERS=0, IMAGE_VARIANT_STORE='disk', IMAGE_VARIANT_DIR=str(tmp_path / 'v')):
+        request = factory.get(f'/packages/async-pkg/image/{drive_image}/?w=160')
+        response = async_to_sync(async_views.package_image)(request, 'async-pkg', drive_image)
+    assert response.status_code == 200
+    assert Image.open(io.BytesIO(response.content)).size == (160, 120)
+
+    request = factory.get('/packages/missing/image/x/')
+    assert async_to_sync(async_views.package_image)(request, 'missing', 'x').status_code == 404
+
+
+@pytest.mark.django_db
+def test_concurrent_image_requests_share_one_download(drive_image, monkeypatch):
+    downloads = []
+    original = drive_async.get_media
+
+    async def slow_media(file_id):
+        downloads.append(file_id)
+        await asyncio.sleep(0.05)
+        return await original(file_id)
+    monkeypatch.setattr(drive_async, 'get_media', slow_media)
+
+    async def burst():
+        request = factory.get(f'/packages/async-pkg/image/{drive_image}/')
+        return await asyncio.gather(*[
+            async_views.package_image(request, 'async-pkg', drive_image) for _ in range(10)
+        ])
+    responses = async_to_sync(burst)()
+    assert [r.status_code for r in responses] == [200] * 10
+    assert downloads == [drive_image]
+
+
+def test_gridfs_file_falls_back_to_sync_driver(mongo_db):
+    file_id = file_store.store_bytes('notes.txt', 'text/plain', b'hello', slug='async')
+    request = factory.get(f'/files/{file_id}/?download=1')
+    response = async_to_sync(async_views.serve_gridfs_file)(request, file_id)
+    assert response.content == b'hello' and response['Content-Type'] == 'text/plain'
+    assert response['Content-Disposition'] == 'attachment; filename="notes.txt"'
+
+
+@pytest.mark.django_db
+def test_middleware_chain_runs_async(async_client):
+    response = async_to_sync(async_client.get)('/api/packages/prime')
+    assert response.status_code == 200
+    assert response['Access-Control-Allow-Origin'] == '*'
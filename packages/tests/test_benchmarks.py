@@ -0,0 +1,30 @@
+import pytest
+
+from packages import benchmarks
+
+
+@pytest.mark.django_db
+def test_quick_benchmark_run_covers_every_benchmark():
+    results = benchmarks.run(quick=True)
+    names = {key.split('[')[0] for key in results}
+    assert names == set(benchmarks.BENCHMARKS)
+    assert all(seconds > 0 for seconds in results.values())
+
+
+def test_find_regressions_uses_relative_threshold():
+    baselines = {'a[1]': 1.0, 'b[1]': 1.0}
+    results = {'a[1]': 1.2, 'b[1]': 1.5, 'c[1]': 9.0}
+    regressions = benchmarks.find_regressions(results, baselines, threshold=0.3)
+    assert [r['name'] for r in regressions] == ['b[1]']
+
+
+def test_stored_baselines_cover_every_benchmark():
+    from packages.benchmarks import suite  # noqa: F401
+
+    stored = {key.split('[')[0] for key in benchmarks.load_baselines()}
+    assert set(benchmarks.BENCHMARKS) <= stored
+
+
+def test_median_results_ignores_one_outlying_round():
+    rounds = [{'a[1]': 1.0, 'b[1]': 2.0}, {'a[1]': 0.5, 'b[1]': 2.2}, {'a[1]': 1.1, 'b[1]': 9.0}]
+    assert benchmarks.median_results(rounds) == {'a[1]': 1.0, 'b[1]': 2.2}
@@ -0,0 +1,104 @@
+import pytest
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from packages import cache
+from packages.models import Package
+
+
+def test_tags_invalidate_entries_together():
+    cache.set('a', 1, [cache.package_tag('x'), cache.PACKAGES])
+    cache.set('b', 2, [cache.package_tag('y'), cache.PACKAGES])
+    cache.set('c', 3, [cache.package_tag('y')])
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, 2, 3)
+
+    cache.invalidate(cache.package_tag('x'))
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (None, 2, 3)
+    cache.invalidate(cache.PACKAGES)
+    assert (cache.get('b'), cache.get('c')) == (None, 3)
+
+
+def test_get_or_set_computes_once_and_keeps_falsy_values():
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return []
+    assert cache.get_or_set('k', compute, ['t']) == []
+    assert cache.get_or_set('k', compute, ['t']) == []
+    assert len(calls) == 1
+    cache.invalidate('t')
+    cache.get_or_set('k', compute, ['t'])
+    assert len(calls) == 2
+
+
+def test_file_backend(tmp_path):
+    backend = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': str(tmp_path)}}
+    with override_settings(CACHES=backend):
+        cache.set('k', {'v': 1}, ['t'])
+        assert cache.get('k') == {'v': 1}
+        cache.invalidate('t')
+        assert cache.get('k') is None
+
+
+@pytest.mark.django_db
+def test_package_changes_invalidate_api_json(client):
+    pkg = Package.objects.create(slug='story', category='prime', description='first',
+                                 google_drive_url='https://drive.google.com/drive/folders/story')
+    show = reverse('get', args=['prime', 'story'])
+    listing = reverse('list_packages_from_pset', args=['prime'])
+    assert client.get(show).json()['description'] == 'first'
+    assert len(client.get(listing).json()['data']) == 1
+
+    pkg.description = 'second'
+    pkg.save()
+    assert client.get(show).json()['description'] == 'second'
+
+    # Category change: the old listing and the old category's detail URL must not be served stale
+    pkg = Package.objects.get(pk=pkg.pk)
+    pkg.category = 'alumni'
+    pkg.save()
+    assert client.get(listing).json()['data'] == []
+    assert client.get(show).status_code == 404
+
+    pkg.delete()
+    assert client.get(reverse('get', args=['alumni', 'story'])).status_code == 404
+
+
+def _package_queries(client, url):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url)
+    assert response.status_code == 200
+    return response.content.decode(), [q['sql'] for q in ctx.captured_queries if 'packages_package' in q['sql']]
+
+
+@pytest.mark.django_db
+def test_index_and_list_fragments_are_cached_until_a_package_changes(client):
+    from django.contrib.auth.models import User
+    from datetime import date
+
+    client.force_login(User.objects.create_user('editor'))
+    for i in range(5):
+        Package.objects.create(slug=f'story-{i}', publish_date=date(2024, 1, i + 1), pinned=i % 2 == 0,
+                               google_drive_url=f'https://drive.google.com/drive/folders/story-{i}')
+
+    html, queries = _package_queries(client, '/')
+    assert len(queries) == 1
+    assert html.index('story-4') < html.index('story-2') < html.index('story-0')
+    assert _package_queries(client, '/')[1] == []
+
+    html, queries = _package_queries(client, reverse('packages_list'))
+    assert 'story-3' in html and queries
+    html, queries = _package_queries(client, reverse('packages_list'))
+    assert queries == []
+    # Row forms get the CSRF token client-side: the cached rows are shared between editors
+    rows = html[html.index('<tbody>'):html.index('</tbody>')]
+    assert 'csrfmiddlewaretoken' not in rows
+
+    pkg = Package.objects.get(slug='story-3')
+    pkg.description = 'Updated description'
+    pkg.save()
+    assert 'Updated description' in _package_queries(client, reverse('packages_list'))[0]
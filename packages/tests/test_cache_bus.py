@@ -0,0 +1,48 @@
+import pytest
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from packages import cache, cache_bus
+from packages.models import CacheEvent, Package
+
+
+@pytest.mark.django_db
+def test_events_from_other_workers_invalidate_local_entries():
+    cache_bus.poll(force=True)
+    cache.set('card', 'x', [cache.package_tag('x')])
+    cache.set('other', 'y', [cache.package_tag('y')])
+
+    CacheEvent.objects.create(tags=[cache.package_tag('x')], origin='another-worker')
+    assert cache_bus.poll(force=True) == 1
+    assert cache.get('card') is None and cache.get('other') == 'y'
+    assert cache_bus.poll(force=True) == 0
+
+
+@pytest.mark.django_db
+def test_package_save_publishes_after_commit(django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=False) as callbacks:
+        pkg = Package.objects.create(slug='story', category='prime')
+    assert not CacheEvent.objects.exists()
+    for callback in callbacks:
+        callback()
+    assert set(CacheEvent.objects.get().tags) == {'package:story', 'category:prime', cache.PACKAGES}
+    assert CacheEvent.objects.get().origin == cache_bus.ORIGIN
+
+
+@pytest.mark.django_db
+@override_settings(CACHE_BUS_POLL_INTERVAL=0)
+def test_middleware_applies_events_before_the_view(client):
+    Package.objects.create(slug='story', category='prime', description='old')
+    url = reverse('get', args=['prime', 'story'])
+    assert client.get(url).json()['description'] == 'old'
+
+    # Another worker changed the row: only its event tells this worker to drop the cached JSON
+    Package.objects.filter(slug='story').update(description='new')
+    assert client.get(url).json()['description'] == 'old'
+    CacheEvent.objects.create(tags=[cache.package_tag('story')], origin='another-worker')
+    assert client.get(url).json()['description'] == 'new'
+
+
+@override_settings(CACHE_BUS='auto', CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+def test_bus_is_off_for_shared_backends():
+    assert not cache_bus.enabled()
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from packages import aml, fields
+from packages.benchmarks.support import synthetic_aml
+from packages.models import Package, PackageVersion
+
+
+def _stored(table, pk):
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT data FROM {table} WHERE {"package_id" if "content" in table else "id"} = %s', [pk])
+        return bytes(cursor.fetchone()[0])
+
+
+def test_codec_round_trips_and_keeps_tiny_values_plain():
+    doc = {'article.aml': aml.parse_aml(synthetic_aml(20)), 'quote': '“Go Bruins” — Joe’s'}
+    packed = fields.compress(doc)
+    assert packed[0] == fields.CURRENT and len(packed) < len(json.dumps(doc)) / 3
+    assert fields.decompress(packed) == doc
+    assert fields.compress({}) == b'{}' and fields.decompress(b'{}') == {}
+
+
+@pytest.mark.django_db
+def test_plain_json_rows_are_read_and_compressed_by_the_backfill(capsys):
+    doc = {'article.aml': aml.parse_aml(synthetic_aml(30))}
+    pkg = Package.objects.create(slug='compressed', data=doc)
+    version = PackageVersion.objects.create(package=pkg, data=doc)
+    assert _stored('packages_packagecontent', pkg.pk)[0] == fields.CURRENT
+
+    # Rows copied over from the old JSON columns hold plain JSON
+    with connection.cursor() as cursor:
+        cursor.execute('UPDATE packages_packageversion SET data = %s WHERE id = %s', [json.dumps(doc).encode(), version.pk])
+    assert PackageVersion.objects.get(pk=version.pk).data == doc
+
+    call_command('compress_json_fields')
+    assert 'packages.PackageVersion.data: 1 row(s) rewritten' in capsys.readouterr().out
+    assert _stored('packages_packageversion', version.pk)[0] == fields.CURRENT
+    assert PackageVersion.objects.get(pk=version.pk).data == doc
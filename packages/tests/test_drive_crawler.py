@@ -0,0 +1,48 @@
+import pytest
+
+from packages import drive_crawler
+from packages.benchmarks.support import populate_folder, synthetic_image
+from packages.models import Package
+
+
+def _tree(root):
+    folder = populate_folder(root, 'crawl-pkg', images=3, blocks=5)
+    (folder / 'photos' / 'raw').mkdir(parents=True)
+    (folder / 'photos' / 'nested.jpg').write_bytes(synthetic_image())
+    (folder / 'photos' / 'raw' / 'deep.jpg').write_bytes(synthetic_image())
+    return folder
+
+
+def test_crawl_follows_pages_and_subfolders(fake_drive, monkeypatch):
+    _tree(fake_drive.root)
+    monkeypatch.setattr(drive_crawler, 'PAGE_SIZE', 2)
+
+    records = list(drive_crawler.iter_files(fake_drive, 'crawl-pkg', max_workers=3))
+
+    assert sorted(r['path'] for r in records) == [
+        'article.aml', 'photo-0.jpg', 'photo-1.jpg', 'photo-2.jpg', 'photos/nested.jpg', 'photos/raw/deep.jpg',
+    ]
+    assert all(r['mimeType'] != drive_crawler.FOLDER_MIME for r in records)
+    shallow = drive_crawler.iter_files(fake_drive, 'crawl-pkg', max_depth=1, service_factory=lambda: fake_drive)
+    assert 'photos/raw/deep.jpg' not in {r['path'] for r in shallow}
+
+
+def test_listing_errors_are_raised(fake_drive):
+    fake_drive.error_rate = 1.0
+    try:
+        with pytest.raises(Exception):
+            list(drive_crawler.iter_files(fake_drive, 'missing'))
+    finally:
+        fake_drive.error_rate = 0
+
+
+@pytest.mark.django_db
+def test_fetch_includes_images_from_subfolders(fake_drive):
+    _tree(fake_drive.root)
+    pkg = Package.objects.create(slug='crawl-pkg', google_drive_url='https://drive.google.com/drive/folders/crawl-pkg')
+
+    pkg.fetch_from_gdrive(None)
+    pkg.refresh_from_db()
+
+    names = sorted(i['name'] for i in pkg.images['gdrive'])
+    assert names == ['deep.jpg', 'nested.jpg', 'photo-0.jpg', 'photo-1.jpg', 'photo-2.jpg']
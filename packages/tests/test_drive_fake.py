@@ -0,0 +1,81 @@
+import pytest
+from django.test.utils import override_settings
+
+from packages import drive
+from packages.benchmarks.support import populate_folder
+from packages.drive_fake import DOC_MIME, FOLDER_MIME, get_fake_service
+from packages.models import Package
+
+
+def _status(exc):
+    return getattr(getattr(exc, 'resp', None), 'status', None) or getattr(exc, 'status_code', None)
+
+
+def test_settings_select_fake_backend(fake_drive, tmp_path):
+    assert fake_drive is get_fake_service()
+    assert fake_drive.root == tmp_path
+
+
+def test_list_pages_and_filters(fake_drive):
+    populate_folder(fake_drive.root, 'pkg', images=5, blocks=3)
+    first = fake_drive.files().list(q="'pkg' in parents and trashed = false", pageSize=4).execute()
+    assert len(first['files']) == 4
+    rest = fake_drive.files().list(q="'pkg' in parents", pageSize=4, pageToken=first['nextPageToken']).execute()
+    assert len(rest['files']) == 2 and 'nextPageToken' not in rest
+
+    docs = fake_drive.files().list(q=f"name contains 'article' and mimeType = '{DOC_MIME}' and 'pkg' in parents").execute()
+    assert [f['name'] for f in docs['files']] == ['article.aml']
+    text = fake_drive.files().export(fileId=docs['files'][0]['id'], mimeType='text/plain').execute()
+    assert b'headline:' in text
+
+
+def test_drive_helpers_create_folder_and_doc(fake_drive):
+    created = drive.create_drive_folder('new-package', parent_id='repo', share_domain='example.com')
+    assert created == {'id': 'new-package', 'url': 'https://drive.google.com/drive/folders/new-package'}
+    assert (fake_drive.root / 'new-package').is_dir()
+    assert fake_drive.permissions_granted['new-package'][0]['domain'] == 'example.com'
+
+    doc = drive.ensure_article_doc_in_folder('new-package')
+    assert doc and doc['url'].startswith('https://docs.google.com/document/d/')
+    again = drive.ensure_article_doc_in_folder('new-package')
+    assert again['id'] == doc['id']
+    meta = fake_drive.files().get(fileId=doc['id']).execute()
+    assert meta['mimeType'] == DOC_MIME and meta['parents'] == ['new-package']
+    assert fake_drive.files().get(fileId='new-package').execute()['mimeType'] == FOLDER_MIME
+
+
+def test_missing_file_is_404(fake_drive):
+    with pytest.raises(Exception) as exc:
+        fake_drive.files().get_media(fileId='nope').execute()
+    assert _status(exc.value) == 404
+
+
+def test_rate_limit_and_error_injection(tmp_path):
+    with override_settings(DRIVE_BACKEND='fake', DRIVE_FAKE_ROOT=str(tmp_path), DRIVE_FAKE_RATE_LIMIT=3):
+        service = drive.get_drive_service()
+        statuses = []
+        batch = service.new_batch_http_request()
+        for _ in range(5):
+            batch.add(service.files().list(q=''), callback=lambda rid, resp, exc: statuses.append(_status(exc) if exc else 200))
+        batch.execute()
+    assert statuses == [200, 200, 200, 429, 429]
+
+    with override_settings(DRIVE_BACKEND='fake', DRIVE_FAKE_ROOT=str(tmp_path), DRIVE_FAKE_ERROR_RATE=1.0):
+        with pytest.raises(Exception) as exc:
+            drive.get_drive_service().files().list(q='').execute()
+    assert _status(exc.value) == 500
+
+
+@pytest.mark.django_db
+def test_fetch_from_gdrive_is_deterministic_offline(fake_drive, capsys):
+    populate_folder(fake_drive.root, 'fetch-me', images=3, blocks=20)
+    pkg = Package.objects.create(slug='fetch-me', google_drive_url='https://drive.google.com/drive/folders/fetch-me')
+
+    pkg.fetch_from_gdrive(None)
+    pkg.refresh_from_db()
+
+    article = pkg.data['article.aml']
+    assert article['headline'] == 'Synthetic benchmark article'
+    assert 'f' not in article and 'g' not in article
+    assert sorted(i['name'] for i in pkg.images['gdrive']) == ['photo-0.jpg', 'photo-1.jpg', 'photo-2.jpg']
+    assert pkg.versions.count() == 1
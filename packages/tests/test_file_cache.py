@@ -0,0 +1,71 @@
+import pytest
+from django.test.utils import override_settings
+
+from packages import file_cache, file_store, hot_files
+
+
+@pytest.fixture
+def disk_cache(tmp_path):
+    with override_settings(FILE_DISK_CACHE='sendfile', FILE_DISK_CACHE_DIR=str(tmp_path / 'cache')):
+        yield tmp_path / 'cache'
+
+
+def test_stored_file_is_sent_from_disk(client, mongo_db, disk_cache, monkeypatch):
+    file_id = file_store.store_bytes('cover.jpg', 'image/jpeg', b'\xff\xd8' * 500, slug='disk')
+    first = client.get(f'/files/{file_id}/')
+    assert first.streaming and b''.join(first.streaming_content) == b'\xff\xd8' * 500
+    assert first['X-Cache'] == 'MISS' and first['Content-Type'] == 'image/jpeg'
+
+    monkeypatch.setattr(file_store, 'open_file', lambda file_id: pytest.fail('should be served from disk'))
+    again = client.get(f'/files/{file_id}/')
+    assert again['X-Cache'] == 'HIT' and again['Content-Disposition'] == 'inline; filename="cover.jpg"'
+    assert b''.join(again.streaming_content) == b'\xff\xd8' * 500
+
+
+@pytest.mark.django_db
+def test_drive_image_is_offloaded_to_nginx(client, fake_drive, disk_cache):
+    (fake_drive.root / 'disk-pkg').mkdir()
+    (fake_drive.root / 'disk-pkg' / 'photo.jpg').write_bytes(b'jpeg-bytes')
+    fid = fake_drive.files().list(q="'disk-pkg' in parents").execute()['files'][0]['id']
+    from packages.models import Package
+    Package.objects.create(slug='disk-pkg', google_drive_url='https://drive.google.com/drive/folders/disk-pkg')
+
+    with override_settings(FILE_DISK_CACHE='x-accel', FILE_DISK_CACHE_ACCEL_PREFIX='/internal/'):
+        response = client.get(f'/packages/disk-pkg/image/{fid}/')
+    assert response.content == b'' and response['Content-Type'] == 'image/jpeg'
+    relative = response['X-Accel-Redirect'].removeprefix('/internal/')
+    assert (disk_cache / relative).read_bytes() == b'jpeg-bytes'
+
+
+def test_prune_removes_oldest_entries(disk_cache):
+    import os
+    for i in range(3):
+        entry = file_cache.put(f'k{i}', b'x' * 100, 'text/plain')
+        os.utime(entry.path, (i, i))
+    assert file_cache.prune(max_bytes=150) == 2
+    assert file_cache.get('k0') is None and file_cache.get('k1') is None
+    assert file_cache.get('k2').content_type == 'text/plain'
+
+
+def test_prune_keeps_recently_read_entries(disk_cache):
+    import os
+    for i in range(3):
+        entry = file_cache.put(f'k{i}', b'x' * 100, 'text/plain')
+        os.utime(entry.path, (i, i))
+    assert file_cache.get('k0') is not None
+    assert file_cache.prune(max_bytes=150) == 2
+    assert file_cache.get('k0') is not None and file_cache.get('k1') is None and file_cache.get('k2') is None
+
+
+def test_pruned_hit_is_served_from_the_store(client, mongo_db, disk_cache, monkeypatch):
+    file_id = file_store.store_bytes('cover.jpg', 'image/jpeg', b'\xff\xd8' * 500, slug='disk')
+    client.get(f'/files/{file_id}/')
+    entry = file_cache.get(f'file:{file_id}')
+
+    # The file goes between the lookup and the open, as when prune runs in another worker
+    monkeypatch.setattr(file_cache, 'get', lambda key: entry)
+    entry.path.unlink()
+    hot_files.clear()
+    response = client.get(f'/files/{file_id}/')
+    assert response.status_code == 200 and response['X-Cache'] == 'MISS'
+    assert b''.join(response.streaming_content) == b'\xff\xd8' * 500
@@ -0,0 +1,62 @@
+from django.test.utils import override_settings
+
+import oink_project.mongo as mongo
+from packages import file_store
+
+
+def _items(count):
+    for i in range(count):
+        yield f'photo-{i}.jpg', bytes([i]) * 1000, {'contentType': 'image/jpeg', 'assetType': 'image', 'sourceId': f'drive-{i}'}
+
+
+def test_store_many_uploads_all_items_and_indexes_them(mongo_db):
+    aml = [{'name': 'article.aml', 'file_id': 'aml-id', 'asset_type': 'aml', 'content_type': 'text/plain'}]
+
+    assets = file_store.store_many(_items(12), slug='batch', update_index=True, aml_assets=aml, max_workers=3)
+
+    assert [a['name'] for a in assets] == [f'photo-{i}.jpg' for i in range(12)]
+    assert mongo_db['files.inline'].count_documents({'metadata.slug': 'batch'}) == 12
+    data, content_type, _ = file_store.read_file(assets[5]['file_id'])
+    assert data == bytes([5]) * 1000 and content_type == 'image/jpeg'
+
+    index = mongo_db['package_assets'].find_one({'slug': 'batch'})
+    assert len(index['assets']) == 13
+    assert index['has_aml'] and index['has_images']
+    assert assets[0]['source_id'] == 'drive-0'
+
+
+def test_bucket_handle_is_shared(mongo_db):
+    assert mongo.get_bucket() is mongo.get_bucket()
+
+
+def test_client_options_come_from_settings():
+    with override_settings(MONGODB_MAX_POOL_SIZE=7, MONGODB_COMPRESSORS='zstd,zlib', MONGODB_SOCKET_TIMEOUT_MS=None):
+        options = mongo.client_options()
+    assert options['maxPoolSize'] == 7
+    assert options['compressors'] == 'zstd,zlib'
+    assert 'socketTimeoutMS' not in options
+
+
+def test_small_files_are_inline_and_large_ones_in_gridfs(mongo_db, client):
+    text = 'headline: Inline\n' * 200
+    small = file_store.store_text('article.aml', text, slug='tiers')
+    with override_settings(MONGODB_INLINE_MAX_BYTES=1024):
+        large = file_store.store_bytes('photo.jpg', 'image/jpeg', b'\xff' * 4096, slug='tiers')
+
+    assert file_store.is_inline(small) and not file_store.is_inline(large)
+    doc = mongo_db['files.inline'].find_one()
+    assert doc['encoding'] == 'zstd' and len(doc['data']) < len(text)
+    assert mongo_db['files.files'].count_documents({}) == 1
+
+    assert file_store.read_file(small)[0] == text.encode('utf-8')
+    assert b''.join(file_store.iter_chunks(small)) == text.encode('utf-8')
+    assert {k: v['length'] for k, v in file_store.file_info([small, large, 'bogus']).items()} == {
+        small: len(text), large: 4096,
+    }
+
+    response = client.get(f'/files/{small}/')
+    assert response.content == text.encode('utf-8')
+    assert response['Content-Type'] == 'text/plain; charset=utf-8'
+    assert client.get(f'/files/{large}/').content == b'\xff' * 4096
+    assert client.get(f'/files/i{"0" * 24}/').status_code == 404
+    assert client.get('/files/not-an-id/').status_code == 404
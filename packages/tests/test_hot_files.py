@@ -0,0 +1,38 @@
+from django.test.utils import override_settings
+
+from packages import file_store, hot_files
+
+
+@override_settings(FILE_HOT_CACHE_BYTES=250, FILE_HOT_CACHE_MAX_OBJECT_BYTES=120)
+def test_lru_is_bounded_by_bytes():
+    hot_files.put('a', b'a' * 100, 'text/plain', 'a')
+    hot_files.put('b', b'b' * 100, 'text/plain', 'b')
+    assert hot_files.get('a') is not None  # a is now the most recently used
+    hot_files.put('c', b'c' * 100, 'text/plain', 'c')
+    hot_files.put('big', b'x' * 121, 'text/plain', 'big')
+
+    assert hot_files.get('b') is None and hot_files.get('big') is None
+    assert hot_files.get('a').data == b'a' * 100 and hot_files.get('c') is not None
+    stats = hot_files.stats()
+    assert stats['bytes'] == 200 and stats['entries'] == 2 and stats['evictions'] == 1
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (3, 2, 0.6)
+
+
+@override_settings(FILE_HOT_CACHE_BYTES=0)
+def test_disabled_cache_stores_nothing():
+    hot_files.put('a', b'a', 'text/plain', 'a')
+    assert hot_files.get('a') is None and hot_files.stats()['entries'] == 0
+
+
+def test_repeat_requests_skip_mongo(client, mongo_db, monkeypatch):
+    file_id = file_store.store_bytes('cover.jpg', 'image/jpeg', b'\xff\xd8' * 500, slug='hot')
+    first = client.get(f'/files/{file_id}/')
+    assert first['X-Cache'] == 'MISS'
+
+    def no_mongo(file_id):
+        raise AssertionError('hot file should be served from memory')
+    monkeypatch.setattr(file_store, 'open_file', no_mongo)
+    again = client.get(f'/files/{file_id}/?download=1')
+    assert again['X-Cache'] == 'HIT' and again.content == first.content
+    assert again['Content-Type'] == 'image/jpeg'
+    assert again['Content-Disposition'] == 'attachment; filename="cover.jpg"'
@@ -0,0 +1,76 @@
+import threading
+from concurrent.futures import Future
+
+import pytest
+from django.test.utils import override_settings
+
+from packages import image_meta, image_pool
+from packages.benchmarks.support import populate_folder
+from packages.models import Package
+from packages.package_views import _format_images
+
+
+pytestmark = pytest.mark.usefixtures('inline_pool')
+
+
+def _package(fake_drive, slug, images=3):
+    populate_folder(fake_drive.root, slug, images=images, blocks=1)
+    return Package.objects.create(slug=slug, google_drive_url=f'https://drive.google.com/drive/folders/{slug}')
+
+
+@pytest.mark.django_db
+def test_fetch_records_metadata_once_per_content(fake_drive, mongo_db, monkeypatch):
+    pkg = _package(fake_drive, 'meta-pkg')
+    pkg.fetch_from_gdrive(None)
+    pkg.refresh_from_db()
+
+    for entry in pkg.images['gridfs'] + pkg.images['gdrive']:
+        assert entry['width'] == entry['height'] == 256
+        assert entry['color'].startswith('#') and entry['lqip'].startswith('data:image/webp;base64,')
+        assert entry['bytes'] > 0 and entry['hash']
+    # populate_folder writes the same JPEG three times: one content hash, one cache entry
+    assert mongo_db['image_metadata'].count_documents({}) == 1
+
+    # Same content in another package: served from the shared cache, nothing recomputed
+    calls = []
+    monkeypatch.setattr(image_pool, 'submit', lambda *a, **k: calls.append(a))
+    other = _package(fake_drive, 'meta-copy')
+    other.fetch_from_gdrive(None)
+    other.refresh_from_db()
+    assert not calls
+    assert other.images['gdrive'][0]['lqip'] == pkg.images['gdrive'][0]['lqip']
+
+    formatted = _format_images(other.images)
+    assert {'width', 'height', 'bytes', 'color', 'lqip'} <= set(formatted[0])
+
+
+@pytest.mark.django_db
+def test_drive_only_fetch_records_metadata(fake_drive, client):
+    pkg = _package(fake_drive, 'meta-drive', images=2)
+    pkg.fetch_from_gdrive(None)
+
+    data = client.get(f'/api/packages/{pkg.category}/meta-drive').json()
+    assert [i['width'] for i in data['images']['gdrive']] == [256, 256]
+    assert 'gridfs' not in data['images']
+
+
+@override_settings(IMAGE_METADATA_MAX_IN_FLIGHT=1)
+def test_pending_renders_are_bounded(monkeypatch):
+    pending = []
+
+    def queued(func, data, *args):
+        pending.append(Future())
+        return pending[-1]
+
+    monkeypatch.setattr(image_pool, 'submit', queued)
+    collector = image_meta.MetadataCollector()
+    collector.submit('a', b'first')
+    second = threading.Thread(target=collector.submit, args=('b', b'second'))
+    second.start()
+    second.join(0.2)
+    # The second original is not queued while the first render is pending
+    assert second.is_alive() and len(pending) == 1
+
+    pending[0].set_result({'width': 1})
+    second.join(5)
+    assert not second.is_alive() and len(pending) == 2
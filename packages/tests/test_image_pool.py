@@ -0,0 +1,38 @@
+import io
+
+import pytest
+from django.test.utils import override_settings
+from PIL import Image
+
+from conftest import jpeg
+from packages import image_pool
+
+
+@pytest.fixture
+def pool():
+    image_pool.shutdown()
+    with override_settings(IMAGE_POOL_WORKERS=2, IMAGE_MAX_PIXELS=4_000_000):
+        yield
+    image_pool.shutdown()
+
+
+def test_resize_many_runs_in_worker_processes(pool):
+    results = image_pool.resize_many([jpeg(3000, 1000), jpeg(400, 300), b'not an image'])
+
+    assert Image.open(io.BytesIO(results[0])).size == (1024, 341)
+    assert Image.open(io.BytesIO(results[1])).size == (400, 300)
+    assert results[2] is None
+    assert image_pool.get_executor() is not None
+
+
+def test_oversized_images_fail_their_own_task(pool):
+    bomb = image_pool.submit_resize(jpeg(4000, 3000))
+    with pytest.raises(Exception):
+        bomb.result()
+    assert image_pool.submit_resize(jpeg(100, 100)).result()
+
+
+def test_zero_workers_runs_inline():
+    with override_settings(IMAGE_POOL_WORKERS=0):
+        assert image_pool.get_executor() is None
+        assert image_pool.submit_resize(jpeg(2048, 2048), max_size=512).result()
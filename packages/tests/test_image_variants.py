@@ -0,0 +1,50 @@
+import io
+
+import pytest
+from django.test.utils import override_settings
+from PIL import Image
+
+from conftest import jpeg
+from packages import file_store, image_pool
+from packages.models import Package
+
+pytestmark = pytest.mark.usefixtures('inline_pool')
+
+
+def test_gridfs_variant_is_rendered_once_and_immutable(client, mongo_db, monkeypatch):
+    file_id = file_store.store_bytes('big.jpg', 'image/jpeg', jpeg(1200, 800), slug='v')
+
+    first = client.get(f'/files/{file_id}/?w=320')
+    assert first.status_code == 200 and first['Content-Type'] == 'image/jpeg'
+    assert Image.open(io.BytesIO(first.content)).size == (320, 213)
+    assert 'immutable' in first['Cache-Control']
+
+    def no_render(*args, **kwargs):
+        raise AssertionError('variant should come from the store')
+
+    monkeypatch.setattr(image_pool, 'submit_fit', no_render)
+    again = client.get(f'/files/{file_id}/?w=320')
+    assert again.content == first.content
+    assert mongo_db['files.inline'].count_documents({'metadata.assetType': 'variant'}) == 1
+
+    assert client.get(f'/files/{file_id}/?w=320', HTTP_IF_NONE_MATCH=first['ETag']).status_code == 304
+    assert client.get(f'/files/{file_id}/?w=333').status_code == 400
+    assert client.get(f'/files/{file_id}/?fmt=tiff').status_code == 400
+    assert len(client.get(f'/files/{file_id}/').content) == len(jpeg(1200, 800))
+
+
+@pytest.mark.django_db
+def test_drive_proxy_variant_on_disk(client, fake_drive, tmp_path):
+    (fake_drive.root / 'proxy-pkg').mkdir()
+    (fake_drive.root / 'proxy-pkg' / 'photo.jpg').write_bytes(jpeg(900, 900))
+    Package.objects.create(slug='proxy-pkg', google_drive_url='https://drive.google.com/drive/folders/proxy-pkg')
+    fid = fake_drive.files().list(q="'proxy-pkg' in parents").execute()['files'][0]['id']
+    variants = tmp_path / 'variants'
+
+    with override_settings(IMAGE_VARIANT_STORE='disk', IMAGE_VARIANT_DIR=str(variants)):
+        response = client.get(f'/packages/proxy-pkg/image/{fid}/?w=160&fmt=webp')
+
+    assert response.status_code == 200 and response['Content-Type'] == 'image/webp'
+    assert Image.open(io.BytesIO(response.content)).size == (160, 160)
+    assert response['Cache-Control'] == 'public, max-age=3600'
+    assert len(list(variants.rglob('*'))) == 2  # one shard directory, one variant
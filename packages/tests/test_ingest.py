@@ -0,0 +1,93 @@
+import hashlib
+import json
+import threading
+from collections import Counter
+
+import pytest
+
+from packages import drive, file_store, transfer
+from packages.benchmarks.support import populate_folder
+from packages.models import Package
+
+
+@pytest.fixture
+def store_calls(monkeypatch):
+    """Count GridFS writes per file name."""
+    calls = Counter()
+    original = file_store.store_bytes
+
+    def counting_store_bytes(name, *args, **kwargs):
+        calls[name] += 1
+        return original(name, *args, **kwargs)
+
+    monkeypatch.setattr(file_store, 'store_bytes', counting_store_bytes)
+    return calls
+
+
+@pytest.mark.django_db
+def test_fetch_writes_each_aml_file_once(fake_drive, mongo_db, store_calls):
+    folder = populate_folder(fake_drive.root, 'ingest-pkg', images=2, blocks=10)
+    (folder / 'extra.aml').write_text('headline: Second doc\n', encoding='utf-8')
+    pkg = Package.objects.create(slug='ingest-pkg', google_drive_url='https://drive.google.com/drive/folders/ingest-pkg')
+
+    pkg.fetch_from_gdrive(None)
+
+    assert store_calls['article.aml'] == 1
+    assert store_calls['extra.aml'] == 1
+    assert mongo_db['files.inline'].count_documents({'metadata.assetType': 'aml'}) == 2
+
+    index = mongo_db['package_assets'].find_one({'slug': 'ingest-pkg'})
+    aml_assets = [a for a in index['assets'] if a['asset_type'] == 'aml']
+    assert sorted(a['name'] for a in aml_assets) == ['article.aml', 'extra.aml']
+
+    pkg.refresh_from_db()
+    assert set(pkg.data['_gridfs_aml']) == {'article.aml', 'extra.aml'}
+
+
+@pytest.mark.django_db
+def test_parsed_json_is_stored_with_the_raw_document(fake_drive, mongo_db):
+    populate_folder(fake_drive.root, 'parsed-pkg', images=0, blocks=5)
+    pkg = Package.objects.create(slug='parsed-pkg', google_drive_url='https://drive.google.com/drive/folders/parsed-pkg')
+
+    pkg.fetch_from_gdrive(None)
+    pkg.refresh_from_db()
+
+    stored = file_store.find_one({'filename': 'article.aml'})
+    assert json.loads(stored.metadata['parsedJson']) == pkg.data['article.aml']
+    data, content_type, _ = file_store.read_file(pkg.data['_gridfs_aml']['article.aml'])
+    assert data.startswith(b'author: Joe Bruin')
+    assert content_type == 'text/plain; charset=utf-8'
+
+
+@pytest.mark.django_db
+def test_images_are_streamed_into_gridfs(fake_drive, mongo_db):
+    folder = populate_folder(fake_drive.root, 'stream-pkg', images=2, blocks=1)
+    pkg = Package.objects.create(slug='stream-pkg', google_drive_url='https://drive.google.com/drive/folders/stream-pkg')
+
+    pkg.fetch_from_gdrive(None)
+
+    stored = file_store.find_one({'filename': 'photo-1.jpg'})
+    assert stored.metadata['sha256'] == hashlib.sha256((folder / 'photo-1.jpg').read_bytes()).hexdigest()
+
+
+@pytest.mark.django_db
+def test_each_upload_thread_opens_its_own_drive_service(fake_drive, mongo_db, monkeypatch):
+    populate_folder(fake_drive.root, 'threads-pkg', images=6, blocks=1)
+    pkg = Package.objects.create(slug='threads-pkg', google_drive_url='https://drive.google.com/drive/folders/threads-pkg')
+    created, downloads = Counter(), []
+    get_drive_service, iter_drive_media = drive.get_drive_service, transfer.iter_drive_media
+
+    def recording_service(*args, **kwargs):
+        created[threading.current_thread().name] += 1
+        return get_drive_service(*args, **kwargs)
+
+    def recording_media(service, file_id, **kwargs):
+        downloads.append(threading.current_thread().name)
+        return iter_drive_media(service, file_id, **kwargs)
+
+    monkeypatch.setattr(drive, 'get_drive_service', recording_service)
+    monkeypatch.setattr(transfer, 'iter_drive_media', recording_media)
+    pkg.fetch_from_gdrive(None)
+
+    assert len(downloads) == 6 and all(name.startswith('gridfs-upload') for name in downloads)
+    assert all(created[name] == 1 for name in set(downloads))
@@ -0,0 +1,71 @@
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from packages.models import Package, PackageContent
+
+
+def _content_queries(ctx):
+    return [q['sql'] for q in ctx.captured_queries if 'packages_packagecontent' in q['sql']]
+
+
+@pytest.mark.django_db
+def test_content_fields_are_stored_in_their_own_row():
+    pkg = Package.objects.create(slug='split', data={'article.aml': {'headline': 'Hi'}}, cached_article_preview='Hi')
+
+    content = PackageContent.objects.get(package=pkg)
+    assert content.data == {'article.aml': {'headline': 'Hi'}} and content.cached_article_preview == 'Hi'
+
+    pkg = Package.objects.get(pk=pkg.pk)
+    pkg.images = {'gdrive': [{'name': 'a.jpg', 'url': '/packages/split/image/a/'}]}
+    pkg.save(update_fields=['images'])
+    content.refresh_from_db()
+    assert content.images['gdrive'][0]['name'] == 'a.jpg' and content.data['article.aml']['headline'] == 'Hi'
+
+    # Packages created without content read defaults and get a row on their first content save
+    bare = Package.objects.create(slug='bare')
+    assert bare.data == {} and not PackageContent.objects.filter(package=bare).exists()
+    bare = Package.objects.get(pk=bare.pk)
+    bare.data = {'x': 1}
+    bare.save(update_fields=['data'])
+    assert PackageContent.objects.get(package=bare).data == {'x': 1}
+
+
+@pytest.mark.django_db
+def test_listing_and_pinning_leave_content_alone(client):
+    client.force_login(User.objects.create_user('editor'))
+    pkg = Package.objects.create(slug='heavy', data={'article.aml': {'body': 'x' * 10000}})
+
+    with CaptureQueriesContext(connection) as ctx:
+        assert client.post(reverse('toggle_pin', args=[pkg.pk]) + '?format=json').json()['pinned'] is True
+        assert client.get(reverse('packages_list')).status_code == 200
+    assert _content_queries(ctx) == []
+
+    with CaptureQueriesContext(connection) as ctx:
+        detail = client.get(reverse('package_detail', args=['heavy']))
+    assert detail.status_code == 200 and len(_content_queries(ctx)) == 1
+    assert PackageContent.objects.get(package=pkg).data['article.aml']['body'] == 'x' * 10000
+
+
+@pytest.mark.django_db
+def test_meta_follows_data_and_filters_the_api(client):
+    news = Package.objects.create(slug='news', category='prime', data={
+        'article.aml': {'headline': 'Regents vote', 'author': 'Joe Bruin', 'articleType': 'news', 'content': []},
+    })
+    Package.objects.create(slug='opinion', category='prime', data={
+        'column.aml': {'headline': 'Why', 'author': 'Josie Bruin', 'articleType': 'opinion'},
+    })
+    assert news.content.meta == {'headline': 'Regents vote', 'author': 'Joe Bruin', 'articleType': 'news'}
+
+    url = reverse('list_packages_from_pset', args=['prime'])
+    assert [p['slug'] for p in client.get(url, {'articleType': 'opinion'}).json()['data']] == ['opinion']
+    assert [p['slug'] for p in client.get(url, {'author': 'Joe Bruin'}).json()['data']] == ['news']
+    assert len(client.get(url).json()['data']) == 2
+
+    news = Package.objects.get(pk=news.pk)
+    news.data = {'article.aml': {'author': 'Josie Bruin', 'articleType': 'opinion'}}
+    news.save(update_fields=['data'])
+    assert PackageContent.objects.get(pk=news.pk).meta == {'author': 'Josie Bruin', 'articleType': 'opinion'}
+    assert len(client.get(url, {'articleType': 'opinion'}).json()['data']) == 2
@@ -0,0 +1,78 @@
+import hashlib
+
+import pytest
+from django.test import RequestFactory
+
+from conftest import jpeg
+from packages import file_store, package_views
+from packages.models import Package, PackageImage
+
+factory = RequestFactory()
+
+
+def _package(fake_drive, slug, images):
+    folder = fake_drive.root / slug
+    folder.mkdir()
+    for name, data in images.items():
+        (folder / name).write_bytes(data)
+    return Package.objects.create(slug=slug, google_drive_url=f'https://drive.google.com/drive/folders/{slug}')
+
+
+@pytest.mark.django_db
+def test_fetch_writes_one_ordered_row_per_image(fake_drive, mongo_db):
+    red, blue = jpeg(color=(200, 0, 0)), jpeg(color=(0, 0, 200))
+    pkg = _package(fake_drive, 'rows-pkg', {'a.jpg': red, 'b.jpg': blue})
+
+    pkg.fetch_from_gdrive(None)
+
+    rows = list(pkg.package_images.all())
+    assert [r.name for r in rows] == ['a.jpg', 'b.jpg']
+    assert [r.order for r in rows] == [0, 1]
+    assert [r.content_hash for r in rows] == [hashlib.md5(red).hexdigest(), hashlib.md5(blue).hexdigest()]
+    assert all(r.drive_file_id and r.gridfs_id and r.content_type == 'image/jpeg' for r in rows)
+    assert file_store.read_file(rows[1].gridfs_id)[0] == blue
+
+    # The detail payload is built from the rows, same shape as from the images JSON
+    pkg.refresh_from_db()
+    from_rows = package_views._package_images(pkg)
+    assert [(i['name'], i['url'], i['source']) for i in from_rows] == [
+        (i['name'], i['url'], i['source']) for i in package_views._format_images(pkg.images)
+    ]
+
+
+@pytest.mark.django_db
+def test_image_proxy_resolves_known_images_without_drive_metadata(fake_drive, mongo_db, monkeypatch):
+    pkg = _package(fake_drive, 'proxy-pkg', {'a.jpg': jpeg(color=(0, 200, 0))})
+    pkg.fetch_from_gdrive(None)
+    row = pkg.package_images.get()
+
+    monkeypatch.setattr(
+        package_views.singleflight, 'do',
+        lambda key, fn, **kwargs: pytest.fail(f'unexpected Drive call {key}') if key.startswith('drive-meta') else fn(),
+    )
+    response = package_views.package_image(factory.get('/'), 'proxy-pkg', row.drive_file_id)
+    assert response.status_code == 200 and response['Content-Type'] == 'image/jpeg'
+    assert package_views.image_lookup('missing', row.drive_file_id) == (False, None)
+
+
+@pytest.mark.django_db
+def test_fetch_links_bytes_another_package_already_stored(fake_drive, mongo_db, monkeypatch):
+    shared = jpeg(color=(10, 20, 30))
+    first = _package(fake_drive, 'first-pkg', {'cover.jpg': shared})
+    first.fetch_from_gdrive(None)
+    stored_id = first.package_images.get().gridfs_id
+
+    uploads = []
+    original = file_store.store_many
+    monkeypatch.setattr(file_store, 'store_many', lambda items, **kw: original(
+        ((uploads.append(name), (name, data, meta))[1] for name, data, meta in items), **kw))
+    second = _package(fake_drive, 'second-pkg', {'lead.jpg': shared, 'other.jpg': jpeg(color=(90, 0, 0))})
+    second.fetch_from_gdrive(None)
+
+    assert uploads == ['other.jpg']
+    rows = {r.name: r for r in PackageImage.objects.filter(package=second)}
+    assert rows['lead.jpg'].gridfs_id == stored_id
+    second.refresh_from_db()
+    assert [i['id'] for i in second.images['gridfs']][0] == stored_id
+    index = mongo_db['package_assets'].find_one({'slug': 'second-pkg'})
+    assert [a['name'] for a in index['assets'] if a['asset_type'] == 'image'] == ['lead.jpg', 'other.jpg']
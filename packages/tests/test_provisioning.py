@@ -0,0 +1,107 @@
+import pytest
+from django.core.management import call_command
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.contrib.auth.models import User
+
+from packages import drive, drive_pool, provisioning
+from packages.models import DriveFolder, Package
+
+
+@pytest.fixture
+def no_drive_calls(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('Drive was called')
+    monkeypatch.setattr(drive, 'create_drive_folder', fail)
+    monkeypatch.setattr(drive, 'ensure_article_doc_in_folder', fail)
+
+
+@pytest.mark.django_db
+def test_save_is_a_pure_db_write(no_drive_calls):
+    pkg = Package.objects.create(slug='new.story')
+    assert pkg.drive_status == Package.DRIVE_PENDING and pkg.google_drive_url == ''
+
+    pkg.pinned = True
+    pkg.save()
+    linked = Package.objects.create(slug='linked', google_drive_url='https://drive.google.com/drive/folders/abc123')
+    assert linked.google_drive_id == 'abc123' and linked.drive_status == Package.DRIVE_READY
+
+
+@pytest.mark.django_db
+@override_settings(DRIVE_PROVISION_WORKERS=0)
+def test_create_view_queues_provisioning(client, no_drive_calls, django_capture_on_commit_callbacks):
+    client.force_login(User.objects.create_user('editor'))
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(reverse('packages_list'), {'slug': 'queued', 'category': 'prime'})
+    assert response.status_code == 302
+    assert Package.objects.get(slug='queued').drive_status == Package.DRIVE_PENDING
+
+
+@pytest.mark.django_db
+@override_settings(DRIVE_FOLDER_POOL_SIZE=0)
+def test_provision_creates_folder_and_doc_once(fake_drive):
+    pkg = Package.objects.create(slug='news-story')
+
+    assert provisioning.provision(pkg.pk)
+    pkg.refresh_from_db()
+    assert pkg.drive_status == Package.DRIVE_READY
+    assert pkg.google_drive_id == 'news-story'
+    assert pkg.google_drive_url == 'https://drive.google.com/drive/folders/news-story'
+    docs = fake_drive.files().list(q="'news-story' in parents").execute()['files']
+    assert [f['name'] for f in docs] == ['article.aml']
+    # Already provisioned: not claimable again
+    assert not provisioning.provision(pkg.pk)
+
+
+@pytest.mark.django_db
+@override_settings(DRIVE_FOLDER_POOL_SIZE=0)
+def test_failure_is_recorded_and_retried(fake_drive, monkeypatch):
+    pkg = Package.objects.create(slug='flaky')
+    monkeypatch.setattr(drive, 'create_drive_folder', lambda *a, **kw: None)
+    pkg.description = 'edited while provisioning'
+    assert not provisioning.provision(pkg.pk)
+    pkg.refresh_from_db()
+    assert pkg.drive_status == Package.DRIVE_FAILED and 'could not be created' in pkg.drive_error
+
+    monkeypatch.undo()
+    call_command('provision_packages')
+    pkg.refresh_from_db()
+    assert pkg.drive_status == Package.DRIVE_FAILED
+
+    call_command('provision_packages', '--retry-failed')
+    pkg.refresh_from_db()
+    assert pkg.drive_status == Package.DRIVE_READY and pkg.google_drive_id == 'flaky' and pkg.drive_error == ''
+
+
+@pytest.mark.django_db
+@override_settings(DRIVE_PROVISION_WORKERS=0)
+def test_create_claims_pooled_folder_with_one_rename(client, fake_drive, django_capture_on_commit_callbacks):
+    assert drive_pool.replenish(2) == 2
+    assert drive_pool.replenish(2) == 0
+    spare = DriveFolder.objects.first()
+    assert spare.doc_url and fake_drive.files().get(fileId=spare.folder_id).execute()['name'].startswith(drive_pool.NAME_PREFIX)
+
+    client.force_login(User.objects.create_user('editor'))
+    before = fake_drive.request_count
+    with django_capture_on_commit_callbacks(execute=True):
+        client.post(reverse('packages_list'), {'slug': 'sports.mbb', 'category': 'prime'})
+    assert fake_drive.request_count - before == 1
+
+    pkg = Package.objects.get(slug='sports.mbb')
+    assert pkg.drive_status == Package.DRIVE_READY
+    assert (pkg.google_drive_id, pkg.article_doc_url) == (spare.folder_id, spare.doc_url)
+    assert fake_drive.files().get(fileId=spare.folder_id).execute()['name'] == 'sports.mbb'
+    assert DriveFolder.objects.filter(claimed_at__isnull=True).count() == 1
+
+
+@pytest.mark.django_db
+@override_settings(DRIVE_FOLDER_POOL_SIZE=0)
+def test_broken_pooled_folder_is_dropped(fake_drive):
+    DriveFolder.objects.create(folder_id='gone', folder_url='https://drive.google.com/drive/folders/gone')
+    pkg = Package.objects.create(slug='fallback')
+
+    assert not provisioning.start(pkg)
+    assert not DriveFolder.objects.exists()
+    assert provisioning.provision(pkg.pk)
+    pkg.refresh_from_db()
+    assert pkg.google_drive_id == 'fallback' and pkg.article_doc_url
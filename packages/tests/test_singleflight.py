@@ -0,0 +1,112 @@
+import threading
+
+import pytest
+from django.test.utils import override_settings
+
+from packages import singleflight
+
+
+def _run_concurrently(n, target):
+    threads = [threading.Thread(target=target) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+
+
+def test_concurrent_callers_share_one_call():
+    release = threading.Event()
+    calls, results = [], []
+
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return b'image'
+
+    def caller():
+        results.append(singleflight.do('drive-media:abc', fetch))
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    while singleflight.in_flight() == 0:
+        pass
+    followers = [threading.Thread(target=caller) for _ in range(4)]
+    for t in followers:
+        t.start()
+    release.set()
+    for t in [leader, *followers]:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert results == [b'image'] * 5
+    assert singleflight.in_flight() == 0
+    # Later calls are not coalesced with finished ones
+    assert singleflight.do('drive-media:abc', lambda: b'new') == b'new'
+
+
+def test_errors_reach_every_waiting_caller():
+    release = threading.Event()
+    errors = []
+
+    def fetch():
+        release.wait(5)
+        raise RuntimeError('drive down')
+
+    def caller():
+        try:
+            singleflight.do('gridfs:x', fetch)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=caller)
+    leader.start()
+    while singleflight.in_flight() == 0:
+        pass
+    follower = threading.Thread(target=caller)
+    follower.start()
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert errors == ['drive down', 'drive down']
+
+
+@pytest.mark.parametrize('cross_process', [True, False])
+def test_recheck_result_skips_the_call(tmp_path, cross_process):
+    with override_settings(SINGLEFLIGHT_LOCK_DIR=str(tmp_path), SINGLEFLIGHT_CROSS_PROCESS=cross_process):
+        assert singleflight.do('variant:k', lambda: 'rendered', recheck=lambda: 'stored') == 'stored'
+        assert singleflight.do('variant:k', lambda: 'rendered', recheck=lambda: None) == 'rendered'
+    assert any(tmp_path.iterdir()) == cross_process
+
+
+def test_file_lock_serializes_leaders(tmp_path):
+    # Two leaders for one key in different "processes" (no shared in-process entry): the second
+    # sees the first one's stored result through recheck once it gets the lock.
+    stored, renders = {}, []
+
+    def render():
+        renders.append(1)
+        stored['k'] = 'variant'
+        return 'variant'
+
+    def caller():
+        with singleflight._FileLock('variant:k'):
+            if stored.get('k') is None:
+                render()
+
+    with override_settings(SINGLEFLIGHT_LOCK_DIR=str(tmp_path)):
+        _run_concurrently(4, caller)
+    assert len(renders) == 1
+
+
+def test_gridfs_followers_do_not_open_the_file(client, mongo_db, monkeypatch):
+    from packages import file_store
+    file_id = file_store.store_bytes('cover.jpg', 'image/jpeg', b'\xff\xd8' * 500, slug='flight')
+
+    def no_mongo(file_id):
+        raise AssertionError('only the leader of the flight should open the file')
+    monkeypatch.setattr(file_store, 'open_file', no_mongo)
+    # A follower gets the leader's bytes, content type and filename without touching Mongo
+    monkeypatch.setattr(singleflight, 'do', lambda key, fn, **kwargs: (b'shared', 'image/png', 'leader.png'))
+    response = client.get(f'/files/{file_id}/')
+    assert response.content == b'shared' and response['Content-Type'] == 'image/png'
+    assert response['Content-Disposition'] == 'inline; filename="leader.png"'
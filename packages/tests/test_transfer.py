@@ -0,0 +1,116 @@
+import hashlib
+
+import pytest
+from django.test.utils import override_settings
+from bson import ObjectId
+
+from packages import file_store, transfer
+from packages.s3_upload import MIN_PART_SIZE, MultipartUpload
+
+
+class RecordingS3:
+    """Records the multipart calls a boto3 S3 client would receive."""
+
+    def __init__(self):
+        self.parts, self.completed, self.aborted, self.created = [], None, False, 0
+
+    def create_multipart_upload(self, **kwargs):
+        self.created += 1
+        return {'UploadId': 'upload-1'}
+
+    def upload_part(self, PartNumber, Body, **kwargs):
+        self.parts.append(Body)
+        return {'ETag': f'"etag-{PartNumber}"'}
+
+    def complete_multipart_upload(self, MultipartUpload, **kwargs):
+        self.completed = MultipartUpload['Parts']
+
+    def abort_multipart_upload(self, **kwargs):
+        self.aborted = True
+
+
+def test_drive_media_is_downloaded_in_ranged_chunks(fake_drive):
+    (fake_drive.root / 'pkg').mkdir()
+    (fake_drive.root / 'pkg' / 'big.jpg').write_bytes(bytes(range(256)) * 40)
+    fid = fake_drive.files().list(q="'pkg' in parents").execute()['files'][0]['id']
+    before = fake_drive.request_count
+
+    chunks = list(transfer.iter_drive_media(fake_drive, fid, chunk_size=4096))
+
+    assert [len(c) for c in chunks] == [4096, 4096, 2048]
+    assert b''.join(chunks) == bytes(range(256)) * 40
+    assert fake_drive.request_count - before == 3
+
+
+@override_settings(MONGODB_INLINE_MAX_BYTES=1500)
+def test_store_stream_hashes_and_aborts(mongo_db):
+    # The second chunk crosses the inline limit: buffered bytes and the rest go to GridFS
+    chunks = [b'a' * 1000, b'b' * 1000]
+    file_id = file_store.store_stream('photo.jpg', 'image/jpeg', iter(chunks), slug='s', asset_type='image')
+
+    doc = mongo_db['files.files'].find_one({'_id': ObjectId(file_id)})
+    assert doc['metadata']['sha256'] == hashlib.sha256(b''.join(chunks)).hexdigest()
+    assert file_store.read_file(file_id)[0] == b''.join(chunks)
+
+    def failing():
+        yield b'partial'
+        raise IOError('connection reset')
+
+    with pytest.raises(IOError):
+        file_store.store_stream('broken.jpg', 'image/jpeg', failing())
+    assert mongo_db['files.files'].count_documents({'filename': 'broken.jpg'}) == 0
+
+
+def test_tee_feeds_s3_multipart_parts():
+    s3 = RecordingS3()
+    data = b'x' * (MIN_PART_SIZE + 100)
+    upload = MultipartUpload(s3, 'bucket', 'images/pkg/a.jpg', 'image/jpeg', expected_md5=hashlib.md5(data).hexdigest())
+
+    chunks = [data[i:i + 1024 * 1024] for i in range(0, len(data), 1024 * 1024)]
+    assert b''.join(transfer.tee(iter(chunks), upload)) == data
+    assert [len(p) for p in s3.parts] == [MIN_PART_SIZE, 100]
+    assert [p['PartNumber'] for p in s3.completed] == [1, 2]
+
+    assert upload.completed
+
+
+def test_multipart_upload_starts_on_first_part():
+    s3 = RecordingS3()
+    upload = MultipartUpload(s3, 'bucket', 'k', 'image/jpeg')
+    upload.abort()
+    assert s3.created == 0 and not s3.aborted
+
+    upload = MultipartUpload(s3, 'bucket', 'k', 'image/jpeg')
+    upload.write(b'x' * MIN_PART_SIZE)
+    assert s3.created == 1
+    upload.abort()
+    assert s3.aborted and not upload.completed
+
+
+def test_tee_drops_a_failing_writer():
+    s3 = RecordingS3()
+    data = b'x' * (MIN_PART_SIZE + 100)
+    upload = MultipartUpload(s3, 'bucket', 'k', 'image/jpeg', expected_md5='0' * 32)
+
+    chunks = [data[i:i + 1024 * 1024] for i in range(0, len(data), 1024 * 1024)]
+    assert b''.join(transfer.tee(iter(chunks), upload)) == data
+    assert s3.aborted and s3.completed is None and not upload.completed
+
+
+def test_failing_s3_writer_does_not_fail_the_gridfs_store(mongo_db):
+    class BrokenWriter:
+        aborted = False
+
+        def write(self, chunk):
+            raise OSError('S3 unavailable')
+
+        def close(self):
+            pass
+
+        def abort(self):
+            self.aborted = True
+
+    writer = BrokenWriter()
+    file_id = file_store.store_stream('a.jpg', 'image/jpeg', transfer.tee(iter([b'abc', b'def']), writer))
+    assert file_store.open_file(file_id).read() == b'abcdef'
+    assert writer.aborted
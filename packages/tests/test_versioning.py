@@ -0,0 +1,119 @@
+import pytest
+from django.test.utils import override_settings
+
+from packages import versioning
+from packages.benchmarks.support import populate_folder
+from packages.models import Package
+
+
+def _edit(pkg, headline, body=None):
+    pkg.cached_article_preview = f'headline: {headline}'
+    pkg.data = {'article.aml': {'headline': headline, 'content': body or [{'type': 'text', 'value': 'a'}]}}
+    pkg.save()
+
+
+def test_patch_roundtrip_preserves_key_order():
+    src = {'a': 1, 'b': [1, 2, 3, 4], 'c': {'x/y': 'old', 'z': ['p', 'q']}}
+    dst = {'a': 1, 'b': [1, 9, 4, 5], 'c': {'x/y': 'new', 'z': ['q'], 'w': None}, 'd': True}
+    assert versioning.apply_patch(src, versioning.make_patch(src, dst)) == dst
+    reordered = {'c': src['c'], 'a': 1, 'b': src['b']}
+    patched = versioning.apply_patch(src, versioning.make_patch(src, reordered))
+    assert list(patched) == ['c', 'a', 'b']
+
+
+@pytest.mark.django_db
+def test_unchanged_content_is_not_recorded(fake_drive):
+    pkg = Package.objects.create(slug='ver-same')
+    _edit(pkg, 'One')
+    assert versioning.record_version(pkg) is not None
+    assert versioning.record_version(pkg) is None
+    assert pkg.versions.count() == 1
+
+
+@pytest.mark.django_db
+def test_refetch_with_file_store_is_not_recorded(fake_drive, mongo_db):
+    populate_folder(fake_drive.root, 'ver-refetch', images=1, blocks=3)
+    pkg = Package.objects.create(slug='ver-refetch', google_drive_url='https://drive.google.com/drive/folders/ver-refetch')
+    pkg.fetch_from_gdrive(None)
+    first = dict(pkg.data['_gridfs_aml'])
+
+    pkg.fetch_from_gdrive(None)
+    assert pkg.data['_gridfs_aml'] != first
+    assert pkg.versions.count() == 1
+
+    (fake_drive.root / 'ver-refetch' / 'extra.aml').write_text('headline: Added\n', encoding='utf-8')
+    pkg.fetch_from_gdrive(None)
+    assert pkg.versions.count() == 2
+
+
+@pytest.mark.django_db
+@override_settings(PACKAGE_VERSION_KEYFRAME_INTERVAL=3)
+def test_deltas_reconstruct_between_keyframes(fake_drive):
+    pkg = Package.objects.create(slug='ver-chain')
+    expected = []
+    for i in range(7):
+        _edit(pkg, f'Headline {i}', [{'type': 'text', 'value': str(n)} for n in range(i + 1)])
+        versioning.record_version(pkg)
+        expected.append(versioning.snapshot(pkg))
+
+    versions = list(pkg.versions.order_by('created_at', 'pk'))
+    assert [v.is_keyframe for v in versions] == [True, False, False, True, False, False, True]
+    assert versions[1].data == {} and versions[1].base_id == versions[0].pk
+    assert [v.content() for v in versions] == expected
+
+
+@pytest.mark.django_db
+@override_settings(PACKAGE_VERSION_KEYFRAME_INTERVAL=4)
+def test_compact_and_rechain(fake_drive):
+    pkg = Package.objects.create(slug='ver-compact')
+    for i in range(6):
+        _edit(pkg, f'Headline {i}')
+        versioning.record_version(pkg)
+    newest = [v.content() for v in pkg.versions.order_by('created_at', 'pk')][-2:]
+
+    assert versioning.compact(pkg, keep=2) == 4
+    kept = list(pkg.versions.order_by('created_at', 'pk'))
+    assert kept[0].is_keyframe
+    assert [v.content() for v in kept] == newest
+
+    # Full copies recorded before delta storage existed, including a duplicate
+    for headline in ('Old', 'Old', 'Older'):
+        _edit(pkg, headline)
+        pkg.versions.create(article_data=pkg.cached_article_preview, data=pkg.data)
+    assert versioning.rechain(pkg) == 1
+    assert [v.is_keyframe for v in pkg.versions.order_by('created_at', 'pk')] == [True, False, False, False]
+    assert pkg.versions.order_by('created_at', 'pk').last().content()['data']['article.aml']['headline'] == 'Older'
+
+
+@pytest.mark.django_db
+def test_versions_api(client, fake_drive):
+    pkg = Package.objects.create(slug='ver-api')
+    _edit(pkg, 'First')
+    first = versioning.record_version(pkg)
+    _edit(pkg, 'Second')
+    versioning.record_version(pkg)
+
+    listing = client.get(f'/api/packages/{pkg.category}/ver-api/versions').json()['data']
+    assert len(listing) == 2 and listing[1]['id'] == first.pk
+
+    detail = client.get(f'/api/packages/{pkg.category}/ver-api/versions/{listing[0]["id"]}').json()
+    assert detail['data']['article.aml']['headline'] == 'Second'
+    assert client.get(f'/api/packages/{pkg.category}/ver-api/versions/999999').status_code == 404
+
+
+@pytest.mark.django_db
+def test_backfilled_hash_matches_content_hash():
+    import importlib
+    from django.apps import apps
+    migration = importlib.import_module('packages.migrations.0007_packageversion_deltas')
+
+    pkg = Package.objects.create(slug='ver-backfill')
+    _edit(pkg, 'One')
+    pkg.data = {**pkg.data, '_gridfs_aml': {'article.aml': 'file-id'}}
+    pkg.save()
+    version = versioning.record_version(pkg)
+    pkg.versions.update(content_hash='')
+
+    migration.backfill_content_hash(apps, None)
+    version.refresh_from_db()
+    assert version.content_hash == versioning.content_hash(versioning.snapshot(pkg))
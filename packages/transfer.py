@@ -0,0 +1,107 @@
+"""Chunked Drive downloads for piping files into GridFS and S3.
+
+``iter_drive_media`` downloads a Drive file with ``MediaIoBaseDownload`` in
+``DRIVE_DOWNLOAD_CHUNK_SIZE`` ranged requests and yields each chunk as it
+arrives, so a transfer holds one chunk of the file in memory instead of the
+whole file (plus a copy) as ``get_media().execute()`` + ``store_bytes`` did.
+``tee`` passes the chunks on while feeding extra writers (e.g. an S3 multipart
+upload) from the same download; a failing writer drops out without failing the
+download.
+"""
+import logging
+from typing import Iterable, Iterator
+
+from django.conf import settings
+
+try:
+    from googleapiclient.http import MediaIoBaseDownload
+except Exception:
+    MediaIoBaseDownload = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def download_chunk_size() -> int:
+    return max(256 * 1024, int(getattr(settings, 'DRIVE_DOWNLOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE) or DEFAULT_CHUNK_SIZE))
+
+
+class _ChunkBuffer:
+    """Write target for MediaIoBaseDownload that hands each written chunk back."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(data)
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b''.join(self._chunks) if len(self._chunks) != 1 else self._chunks[0]
+        self._chunks = []
+        return data
+
+
+def iter_drive_media(service, file_id: str, *, chunk_size: int = None, num_retries: int = 3) -> Iterator[bytes]:
+    """Yield the content of Drive file ``file_id`` in chunks of at most ``chunk_size`` bytes.
+
+    Retries 429/5xx responses per chunk. Without googleapiclient (or for a request
+    that cannot be ranged) the file is downloaded in one piece.
+    """
+    request = service.files().get_media(fileId=file_id)
+    if MediaIoBaseDownload is None or getattr(request, 'http', None) is None:
+        content = request.execute(num_retries=num_retries)
+        yield content.encode('utf-8') if isinstance(content, str) else content
+        return
+    buffer = _ChunkBuffer()
+    downloader = MediaIoBaseDownload(buffer, request, chunksize=chunk_size or download_chunk_size())
+    done = False
+    while not done:
+        _, done = downloader.next_chunk(num_retries=num_retries)
+        chunk = buffer.take()
+        if chunk:
+            yield chunk
+
+
+def tee(chunks: Iterable[bytes], *writers) -> Iterator[bytes]:
+    """Yield ``chunks`` while writing each one to ``writers``.
+
+    Writers need ``write``, ``close`` and ``abort``: they are closed once the
+    chunks are exhausted, and aborted if the download fails or the consumer stops
+    early. Writers are side copies: one whose ``write`` or ``close`` raises is
+    logged, aborted and dropped while the chunks keep flowing to the consumer.
+    """
+    active = list(writers)
+
+    def drop(writer):
+        logger.exception('Dropping %r from the download', writer)
+        active.remove(writer)
+        _abort(writer)
+
+    completed = False
+    try:
+        for chunk in chunks:
+            for writer in list(active):
+                try:
+                    writer.write(chunk)
+                except Exception:
+                    drop(writer)
+            yield chunk
+        for writer in list(active):
+            try:
+                writer.close()
+            except Exception:
+                drop(writer)
+        completed = True
+    finally:
+        if not completed:
+            for writer in active:
+                _abort(writer)
+
+
+def _abort(writer) -> None:
+    try:
+        writer.abort()
+    except Exception:
+        logger.exception('Failed to abort %r', writer)
@@ -1,7 +1,15 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 from . import package_views
 
+# Under ASGI (oink_project/asgi.py sets ASYNC_VIEWS) the asset endpoints await Drive/GridFS I/O
+if settings.ASYNC_VIEWS:
+    from . import async_views
+    package_image, serve_gridfs_file = async_views.package_image, async_views.serve_gridfs_file
+else:
+    package_image, serve_gridfs_file = package_views.package_image, views.serve_gridfs_file
+
 urlpatterns = [
     path('', views.index, name='index'),
     path('google/login/', views.google_login, name='google_login'),
@@ -12,9 +20,10 @@ urlpatterns = [
     path('packages/new/', package_views.package_create, name='package_create'),
     path('packages/<str:slug>/', package_views.package_detail, name='package_detail'),
     path('packages/<str:slug>/fetch/', package_views.package_fetch, name='package_fetch'),
-    path('packages/<str:slug>/image/<str:file_id>/', package_views.package_image, name='package_image'),
+    path('packages/<str:slug>/image/<str:file_id>/', package_image, name='package_image'),
+    path('packages/<str:slug>/assets.zip', package_views.package_assets_zip, name='package_assets_zip'),
     path('packages/<int:pk>/delete/', package_views.package_delete, name='package_delete'),
     path('packages/<int:pk>/toggle-pin/', package_views.toggle_pin, name='toggle_pin'),
 
-    path('files/<str:file_id>/', views.serve_gridfs_file, name='serve_gridfs_file'),
+    path('files/<str:file_id>/', serve_gridfs_file, name='serve_gridfs_file'),
 ]
@@ -0,0 +1,243 @@
+"""Delta-encoded package version history.
+
+A fetch records a ``PackageVersion`` only when the content hash of
+``{'article': cached_article_preview, 'data': data}`` changed since the latest
+version; storage pointers such as ``data['_gridfs_aml']`` are left out of the
+hash because a re-fetch stores the same AML under new file ids. Every ``PACKAGE_VERSION_KEYFRAME_INTERVAL``-th version is a keyframe that
+stores the full content; the ones in between store a JSON Patch (RFC 6902
+add/remove/replace ops) against their ``base`` version. ``reconstruct`` walks back
+to the nearest keyframe and replays the patches.
+"""
+import hashlib
+import json
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+DEFAULT_KEYFRAME_INTERVAL = 10
+
+# Keys of ``data`` that point at stored copies rather than hold content
+STORAGE_KEYS = ('_gridfs_aml',)
+
+
+def snapshot(package) -> dict:
+    return {'article': package.cached_article_preview or '', 'data': package.data or {}}
+
+
+def content_hash(content: dict) -> str:
+    data = content.get('data')
+    if isinstance(data, dict) and any(key in data for key in STORAGE_KEYS):
+        content = {**content, 'data': {k: v for k, v in data.items() if k not in STORAGE_KEYS}}
+    encoded = json.dumps(content, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+# -- JSON Patch ------------------------------------------------------------------------------
+
+def _escape(token) -> str:
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+
+def _unescape(token: str) -> str:
+    return token.replace('~1', '/').replace('~0', '~')
+
+
+def make_patch(src, dst, path: str = '') -> List[dict]:
+    """Return JSON Patch ops turning ``src`` into ``dst``, preserving dict key order."""
+    if type(src) is not type(dst):
+        return [{'op': 'replace', 'path': path, 'value': dst}]
+    if isinstance(src, dict):
+        kept = [k for k in src if k in dst]
+        added = [k for k in dst if k not in src]
+        if list(dst) != kept + added:
+            # Reordered keys: replaying add ops would append in the wrong order
+            return [{'op': 'replace', 'path': path, 'value': dst}]
+        ops = [{'op': 'remove', 'path': f'{path}/{_escape(k)}'} for k in src if k not in dst]
+        for k in kept:
+            ops += make_patch(src[k], dst[k], f'{path}/{_escape(k)}')
+        ops += [{'op': 'add', 'path': f'{path}/{_escape(k)}', 'value': dst[k]} for k in added]
+        return ops
+    if isinstance(src, list):
+        prefix = 0
+        while prefix < min(len(src), len(dst)) and src[prefix] == dst[prefix]:
+            prefix += 1
+        suffix = 0
+        while (suffix < min(len(src), len(dst)) - prefix
+               and src[len(src) - 1 - suffix] == dst[len(dst) - 1 - suffix]):
+            suffix += 1
+        old_mid = src[prefix:len(src) - suffix]
+        new_mid = dst[prefix:len(dst) - suffix]
+        ops = []
+        common = min(len(old_mid), len(new_mid))
+        for i in range(common):
+            ops += make_patch(old_mid[i], new_mid[i], f'{path}/{prefix + i}')
+        for i in reversed(range(common, len(old_mid))):
+            ops.append({'op': 'remove', 'path': f'{path}/{prefix + i}'})
+        for i in range(common, len(new_mid)):
+            ops.append({'op': 'add', 'path': f'{path}/{prefix + i}', 'value': new_mid[i]})
+        return ops
+    if src != dst:
+        return [{'op': 'replace', 'path': path, 'value': dst}]
+    return []
+
+
+def apply_patch(doc, ops: List[dict]):
+    """Apply JSON Patch ``ops`` (add/remove/replace) to a deep copy of ``doc``."""
+    doc = json.loads(json.dumps(doc))
+    for op in ops:
+        tokens = [_unescape(t) for t in op['path'].split('/')[1:]]
+        if not tokens:
+            if op['op'] == 'remove':
+                doc = None
+            else:
+                doc = json.loads(json.dumps(op['value']))
+            continue
+        parent = doc
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+        last = tokens[-1]
+        if isinstance(parent, list):
+            index = len(parent) if last == '-' else int(last)
+            if op['op'] == 'add':
+                parent.insert(index, op['value'])
+            elif op['op'] == 'remove':
+                del parent[index]
+            else:
+                parent[index] = op['value']
+        else:
+            if op['op'] == 'remove':
+                del parent[last]
+            else:
+                parent[last] = op['value']
+    return doc
+
+
+# -- versions --------------------------------------------------------------------------------
+
+def keyframe_interval() -> int:
+    return max(1, int(getattr(settings, 'PACKAGE_VERSION_KEYFRAME_INTERVAL', DEFAULT_KEYFRAME_INTERVAL) or 1))
+
+
+def reconstruct(version) -> dict:
+    """Return the full ``{'article', 'data'}`` content of ``version``."""
+    from .models import PackageVersion
+
+    chain = []
+    current = version
+    while not current.is_keyframe:
+        chain.append(current)
+        current = PackageVersion.objects.get(pk=current.base_id)
+    content = {'article': current.article_data or '', 'data': current.data or {}}
+    for delta in reversed(chain):
+        content = apply_patch(content, delta.delta or [])
+    return content
+
+
+def _deltas_since_keyframe(version) -> int:
+    count = 0
+    current = version
+    while current is not None and not current.is_keyframe:
+        count += 1
+        current = current.base
+    return count
+
+
+def record_version(package, user=None, description: str = '') -> Optional[object]:
+    """Store a version of ``package``'s current content; returns None if nothing changed."""
+    from .models import PackageVersion
+
+    content = snapshot(package)
+    digest = content_hash(content)
+    latest = package.versions.order_by('-created_at', '-pk').first()
+    if latest is not None and latest.content_hash == digest:
+        return None
+
+    fields = {
+        'package': package,
+        'content_hash': digest,
+        'creator': user if getattr(user, 'is_authenticated', False) else None,
+        'version_description': description,
+    }
+    if latest is None or _deltas_since_keyframe(latest) + 1 >= keyframe_interval():
+        return PackageVersion.objects.create(
+            article_data=content['article'], data=content['data'], is_keyframe=True, **fields
+        )
+    return PackageVersion.objects.create(
+        article_data='',
+        data={},
+        is_keyframe=False,
+        base=latest,
+        delta=make_patch(reconstruct(latest), content),
+        **fields
+    )
+
+
+def materialize(version) -> None:
+    """Turn ``version`` into a keyframe holding its full content."""
+    if version.is_keyframe:
+        return
+    content = reconstruct(version)
+    version.article_data = content['article']
+    version.data = content['data']
+    version.is_keyframe = True
+    version.base = None
+    version.delta = None
+    version.save(update_fields=['article_data', 'data', 'is_keyframe', 'base', 'delta'])
+
+
+def compact(package, keep: int) -> int:
+    """Keep the newest ``keep`` versions of ``package`` and delete the rest.
+
+    The oldest surviving version is materialized first so no delta loses its base.
+    Returns the number of deleted versions.
+    """
+    versions = list(package.versions.order_by('-created_at', '-pk'))
+    if keep < 1 or len(versions) <= keep:
+        return 0
+    doomed = [v.pk for v in versions[keep:]]
+    with transaction.atomic():
+        materialize(versions[keep - 1])
+        _delete(package, doomed)
+    return len(doomed)
+
+
+def rechain(package) -> int:
+    """Re-encode ``package``'s history as keyframes + deltas and drop unchanged versions.
+
+    Used to shrink history recorded before delta versions existed (every fetch stored a
+    full copy). Returns the number of deleted duplicate versions.
+    """
+    versions = list(package.versions.order_by('created_at', 'pk'))
+    contents = [reconstruct(v) for v in versions]
+    interval = keyframe_interval()
+    duplicates = []
+    previous = previous_content = previous_hash = None
+    since_keyframe = 0
+    with transaction.atomic():
+        for version, content in zip(versions, contents):
+            digest = content_hash(content)
+            if previous is not None and digest == previous_hash:
+                duplicates.append(version.pk)
+                continue
+            if previous is None or since_keyframe + 1 >= interval:
+                version.article_data, version.data = content['article'], content['data']
+                version.is_keyframe, version.base, version.delta = True, None, None
+                since_keyframe = 0
+            else:
+                version.article_data, version.data = '', {}
+                version.is_keyframe, version.base = False, previous
+                version.delta = make_patch(previous_content, content)
+                since_keyframe += 1
+            version.content_hash = digest
+            version.save(update_fields=['article_data', 'data', 'is_keyframe', 'base', 'delta', 'content_hash'])
+            previous, previous_content, previous_hash = version, content, digest
+        _delete(package, duplicates)
+    return len(duplicates)
+
+
+def _delete(package, pks) -> None:
+    # Unlink first: deltas among the doomed rows still point at each other (on_delete=RESTRICT)
+    doomed = package.versions.filter(pk__in=pks)
+    doomed.update(base=None)
+    doomed.delete()
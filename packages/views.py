@@ -7,34 +7,53 @@ from django.shortcuts import redirect, render
 from django.contrib.auth import login, logout
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
+from django.db.models import BooleanField, ExpressionWrapper, F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils.functional import SimpleLazyObject
 from .models import Package
+from . import cache as package_cache
+from . import file_cache
+from . import file_store
+from . import hot_files
+from . import image_variants
+from . import singleflight
 
 # Additional imports for serving GridFS files
 from django.http import HttpResponse, Http404
-from bson import ObjectId
 from gridfs.errors import NoFile
-from oink_project.mongo import get_bucket
 
 logger = logging.getLogger(__name__)
 
+def _dashboard_sections():
+    """Pinned and recent packages (three of each) in one query."""
+    newest_first = [F('publish_date').desc(), F('slug').asc()]
+    rows = Package.objects.annotate(
+        pinned_rank=Window(RowNumber(), partition_by=[F('pinned')], order_by=newest_first),
+        recent_rank=Window(
+            RowNumber(),
+            partition_by=[ExpressionWrapper(Q(publish_date__isnull=True), output_field=BooleanField())],
+            order_by=newest_first,
+        ),
+    ).filter(Q(pinned=True, pinned_rank__lte=3) | Q(publish_date__isnull=False, recent_rank__lte=3))
+    rows = list(rows)
+    return {
+        'pinned': sorted((p for p in rows if p.pinned and p.pinned_rank <= 3), key=lambda p: p.pinned_rank),
+        'recent': sorted((p for p in rows if p.publish_date and p.recent_rank <= 3), key=lambda p: p.recent_rank),
+    }
+
+
 def index(request):
     user = request.user if request.user.is_authenticated else None
     
     if user and user.is_authenticated:
-        # Get pinned packages
-        pinned_packages = Package.objects.filter(
-            pinned=True
-        ).order_by('-publish_date', 'slug')[:3]
-        
-        # Get recent packages (by publish date, limit to 3)
-        recent_packages = Package.objects.filter(
-            publish_date__isnull=False
-        ).order_by('-publish_date')[:3]
-        
+        # Evaluated only when the cached dashboard fragment has to be rendered
+        sections = SimpleLazyObject(_dashboard_sections)
         return render(request, 'packages/index.html', {
             'user': user,
-            'pinned_packages': pinned_packages,
-            'recent_packages': recent_packages
+            'pinned_packages': SimpleLazyObject(lambda: sections['pinned']),
+            'recent_packages': SimpleLazyObject(lambda: sections['recent']),
+            'packages_version': package_cache.tag_version(package_cache.PACKAGES),
+            'fragment_timeout': getattr(settings, 'CACHE_TIMEOUT', 600),
         })
     
     # Not authenticated - show login page
@@ -113,39 +132,83 @@ def signout(request):
     logout(request)
     return redirect('/')
 
-""" Stream a file from GridFS by its ObjectId (which is stored as a string in mongoDB).
+""" Stream a stored file (inline or GridFS) by its id (which is stored as a string in mongoDB).
     Example URL: /files/<file_id>/
     Public GET so the URL can be used as image source (img src, CMS upload by URL, etc.). """
 def serve_gridfs_file(request, file_id: str):
     try:
-        oid = ObjectId(file_id)
+        file_store.parse_id(file_id)
     except Exception:
         raise Http404("Invalid file id")
 
-    bucket = get_bucket()
-    try:
-        stream = bucket.open_download_stream(oid)
-    except NoFile:
-        raise Http404("File not found")
+    # With FILE_DISK_CACHE the server sends the file from the local disk cache (sendfile / X-Accel-Redirect)
+    if file_cache.enabled() and not image_variants.requested(request.GET):
+        entry = file_cache.get(f'file:{file_id}')
+        if entry is not None:
+            response = file_response(request, None, entry.content_type, entry.filename, cache_status='HIT', entry=entry)
+            if response is not None:
+                return response
+
+    # Stored files never change, so hot ones are served from memory without touching Mongo
+    cached = hot_files.get(file_id)
+    if cached is not None:
+        variant_response = image_variants.serve(
+            request, f'gridfs:{file_id}', lambda: cached.data, cached.content_type, filename=cached.filename,
+        )
+        if variant_response is not None:
+            return variant_response
+        return file_response(request, cached.data, cached.content_type, cached.filename, cache_status='HIT')
 
     """ Memory-efficient file read from GridFS
 
     This will read content
 
     In case for very large files, use StreamingHttpResponse with chunks for better memory usage """
+    def load():
+        stream = file_store.open_file(file_id)
+        try:
+            # Access metadata from the stream's _file property before closing
+            metadata = getattr(stream, 'metadata', {}) or {}
+            content_type = metadata.get('contentType') or 'application/octet-stream'
+            filename = getattr(stream, 'filename', None) or file_id
+            data = stream.read()
+        finally:
+            stream.close()
+        hot_files.put(file_id, data, content_type, filename)
+        return data, content_type, filename
+
+    # Concurrent requests for the same file share one open, metadata lookup and read
     try:
-        data = stream.read()
-        # Access metadata from the stream's _file property before closing
-        metadata = getattr(stream, 'metadata', {}) or {}
-        content_type = metadata.get('contentType') or 'application/octet-stream'
-        filename = getattr(stream, 'filename', None) or file_id
-    finally:
-        stream.close()
-
-    response = HttpResponse(data, content_type=content_type)
+        data, content_type, filename = singleflight.do(f'gridfs:{file_id}', load)
+    except NoFile:
+        raise Http404("File not found")
+
+    # ?w=/?h=/?fmt= serve a stored resized variant; GridFS files never change, so it is immutable
+    variant_response = image_variants.serve(
+        request, f'gridfs:{file_id}', lambda: data, content_type, filename=filename,
+    )
+    if variant_response is not None:
+        return variant_response
+
+    entry = file_cache.put(f'file:{file_id}', data, content_type, filename) if file_cache.enabled() else None
+    return file_response(request, data, content_type, filename, cache_status='MISS', entry=entry)
+
+
+def file_response(request, data, content_type, filename, *, cache_status, entry=None):
+    """``data`` as an inline/attachment response, or the disk cache ``entry`` when given.
+
+    None when ``entry``'s file is gone and there is no ``data`` to fall back to.
+    """
+    response = file_cache.response(entry) if entry is not None else None
+    if response is None:
+        if data is None:
+            return None
+        response = HttpResponse(data, content_type=content_type)
     # ?download=1 or ?attachment=1 to force download instead of inline display
     if request.GET.get("download") or request.GET.get("attachment"):
         response["Content-Disposition"] = f"attachment; filename=\"{filename}\""
     else:
         response["Content-Disposition"] = f"inline; filename=\"{filename}\""
+    # Whether a cache (in-process hot files, or the disk cache) answered without Mongo
+    response["X-Cache"] = cache_status
     return response
@@ -0,0 +1,107 @@
+"""Streaming writer for uncompressed (stored) ZIP archives.
+
+Entries are written as they are read, with CRC-32 computed on the fly and
+emitted in a data descriptor after each file, so an archive of any number of
+files is produced in constant memory without a temp file. Photos are already
+compressed, so entries are stored rather than deflated; that also makes the
+archive size a pure function of the entry names and sizes (``archive_size``),
+which lets the response carry an exact ``Content-Length``.
+
+Archives are limited to the classic (non-ZIP64) format: 65535 entries and
+4 GiB.
+"""
+import struct
+import time
+import zlib
+from collections import namedtuple
+from typing import Iterable, Iterator, List
+
+# Bit 3: CRC and sizes follow the data in a data descriptor; bit 11: UTF-8 names
+_FLAGS = 0x0008 | 0x0800
+_VERSION = 20
+_LOCAL = struct.Struct('<4s5H3L2H')
+_DESCRIPTOR = struct.Struct('<4s3L')
+_CENTRAL = struct.Struct('<4s6H3L5H2L')
+_END = struct.Struct('<4s4H2LH')
+_MAX_SIZE = 0xFFFFFFFF
+_MAX_ENTRIES = 0xFFFF
+
+ZipEntry = namedtuple('ZipEntry', 'name size chunks mtime')
+ZipEntry.__doc__ = """A file to add: ``chunks`` is a callable returning an iterable of bytes
+(called only when the entry is written) that must produce exactly ``size`` bytes."""
+
+
+class ZipTooLarge(ValueError):
+    """The archive would need ZIP64."""
+
+
+def _dos_time(mtime: float):
+    t = time.localtime(mtime or time.time())
+    year = max(t.tm_year, 1980)
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+def archive_size(entries: Iterable[ZipEntry]) -> int:
+    """Exact byte size of ``stream_zip(entries)``."""
+    total = _END.size
+    for entry in entries:
+        name_len = len(entry.name.encode('utf-8'))
+        total += _LOCAL.size + name_len + entry.size + _DESCRIPTOR.size + _CENTRAL.size + name_len
+    return total
+
+
+def check_limits(entries: List[ZipEntry]) -> None:
+    if len(entries) > _MAX_ENTRIES or archive_size(entries) > _MAX_SIZE:
+        raise ZipTooLarge('Archive exceeds 65535 entries or 4 GiB')
+
+
+def stream_zip(entries: Iterable[ZipEntry]) -> Iterator[bytes]:
+    """Yield the bytes of a stored ZIP archive of ``entries``.
+
+    Raises ValueError if an entry produces a different number of bytes than its
+    declared size (the archive, and any Content-Length based on it, would be wrong).
+    """
+    entries = list(entries)
+    check_limits(entries)
+    offset = 0
+    central = []
+    for entry in entries:
+        name = entry.name.encode('utf-8')
+        dos_time, dos_date = _dos_time(entry.mtime)
+        header = _LOCAL.pack(b'PK\x03\x04', _VERSION, _FLAGS, 0, dos_time, dos_date, 0, 0, 0, len(name), 0) + name
+        yield header
+        crc = 0
+        written = 0
+        for chunk in entry.chunks():
+            if not chunk:
+                continue
+            crc = zlib.crc32(chunk, crc)
+            written += len(chunk)
+            yield chunk
+        if written != entry.size:
+            raise ValueError(f'{entry.name}: expected {entry.size} bytes, got {written}')
+        yield _DESCRIPTOR.pack(b'PK\x07\x08', crc, written, written)
+        central.append(_CENTRAL.pack(
+            b'PK\x01\x02', _VERSION, _VERSION, _FLAGS, 0, dos_time, dos_date, crc, written, written,
+            len(name), 0, 0, 0, 0, 0o100644 << 16, offset,
+        ) + name)
+        offset += len(header) + written + _DESCRIPTOR.size
+    directory = b''.join(central)
+    yield directory
+    yield _END.pack(b'PK\x05\x06', 0, 0, len(central), len(central), len(directory), offset, 0)
+
+
+def unique_names(names: Iterable[str]) -> List[str]:
+    """Make archive member names unique by suffixing `` (2)``, `` (3)``... before the extension."""
+    seen = set()
+    result = []
+    for name in names:
+        candidate = name
+        n = 1
+        while candidate.lower() in seen:
+            n += 1
+            stem, dot, ext = name.rpartition('.')
+            candidate = f'{stem} ({n}).{ext}' if dot and stem else f'{name} ({n})'
+        seen.add(candidate.lower())
+        result.append(candidate)
+    return result
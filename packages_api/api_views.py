@@ -1,33 +1,91 @@
 import json
-from packages.models import Package
+from packages import cache
+from packages.aml import META_FIELDS
+from packages.models import Package, PackageContent, PackageVersion
 from packages.package_views import _strip_footnote_keys
 from django.forms.models import model_to_dict
-from django.http import HttpRequest, JsonResponse, HttpResponseNotFound
+from django.http import HttpRequest, HttpResponse, JsonResponse, HttpResponseNotFound
 from django.views.decorators.http import require_GET
 
 
 def _package_to_dict(package):
     d = model_to_dict(package)
+    # Content moved to PackageContent; callers load it with select_related('content')
+    for field in Package.CONTENT_FIELDS:
+        d[field] = getattr(package, field)
     if 'data' in d and d['data']:
         d['data'] = _strip_footnote_keys(d['data'])
     return d
 
 
+def _cached_json(key, tags, build) -> HttpResponse:
+    """Serve the JSON body from ``build()`` (payload or None for a 404), cached under ``tags``."""
+    def encode():
+        payload = build()
+        return None if payload is None else JsonResponse(payload).content
+    body = cache.get_or_set(key, encode, tags)
+    if body is None:
+        return JsonResponse({'error': 'Package not found'}, status=404)
+    return HttpResponse(body, content_type='application/json')
+
+
 @require_GET
 def list_packages_from_pset(request: HttpRequest, pset_slug: str) -> JsonResponse:
-    package_list = (
-        Package.objects.filter(category=pset_slug)
-        .order_by('-publish_date')
-        .all()
-    )
-    results = [_package_to_dict(m) for m in package_list]
-    return JsonResponse({'data': results})
+    # ?author=...&articleType=... match the main document's fields (PackageContent.meta)
+    filters = {k: request.GET[k] for k in META_FIELDS if request.GET.get(k)}
+
+    def build():
+        package_list = (
+            Package.objects.filter(category=pset_slug)
+            .select_related('content')
+            .order_by('-publish_date')
+            .all()
+        )
+        if filters:
+            package_list = package_list.filter(PackageContent.meta_filter('content__', **filters))
+        return {'data': [_package_to_dict(m) for m in package_list]}
+    key = cache.make_key('api:list', pset_slug, *(f'{k}={v}' for k, v in sorted(filters.items())))
+    return _cached_json(key, [cache.category_tag(pset_slug)], build)
 
 
 @require_GET
 def show_one(request: HttpRequest, pset_slug: str, id: str) -> JsonResponse:
+    def build():
+        package = Package.objects.select_related('content').filter(category=pset_slug, slug=id).first()
+        return _package_to_dict(package) if package is not None else None
+    return _cached_json(cache.make_key('api:show', pset_slug, id), [cache.package_tag(id)], build)
+
+
+def _version_summary(version):
+    return {
+        'id': version.pk,
+        'created_at': version.created_at,
+        'description': version.version_description,
+        'content_hash': version.content_hash,
+        'is_keyframe': version.is_keyframe,
+    }
+
+
+@require_GET
+def list_versions(request: HttpRequest, pset_slug: str, id: str) -> JsonResponse:
     try:
-        package = Package.objects.get(category=pset_slug, slug=id)
-        return JsonResponse(_package_to_dict(package))
+        package = Package.objects.only('pk').get(category=pset_slug, slug=id)
     except Package.DoesNotExist:
-        return JsonResponse({'error': 'Package not found'}, status=404)
\ No newline at end of file
+        return JsonResponse({'error': 'Package not found'}, status=404)
+    versions = package.versions.only(
+        'pk', 'created_at', 'version_description', 'content_hash', 'is_keyframe'
+    ).order_by('-created_at', '-pk')
+    return JsonResponse({'data': [_version_summary(v) for v in versions]})
+
+
+@require_GET
+def show_version(request: HttpRequest, pset_slug: str, id: str, version_id: int) -> JsonResponse:
+    try:
+        version = PackageVersion.objects.get(pk=version_id, package__category=pset_slug, package__slug=id)
+    except PackageVersion.DoesNotExist:
+        return JsonResponse({'error': 'Version not found'}, status=404)
+    content = version.content()
+    payload = _version_summary(version)
+    payload['article'] = content['article']
+    payload['data'] = _strip_footnote_keys(content['data'])
+    return JsonResponse(payload)
@@ -4,4 +4,6 @@ from packages_api import api_views
 urlpatterns = [
     path('packages/<str:pset_slug>', api_views.list_packages_from_pset, name='list_packages_from_pset'),
     path('packages/<str:pset_slug>/<str:id>', api_views.show_one, name='get'),
+    path('packages/<str:pset_slug>/<str:id>/versions', api_views.list_versions, name='list_versions'),
+    path('packages/<str:pset_slug>/<str:id>/versions/<int:version_id>', api_views.show_version, name='show_version'),
 ]
\ No newline at end of file